@@ -138,6 +138,28 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = "/app/media"
 
 CORS_URLS_REGEX = r"^api/.*$"
+
+# A file cache is shared by every process on the host (gunicorn workers and
+# run_ingest_worker), so generation counters stored in it invalidate the
+# in-process caches of all of them
+CACHE_DIR = getenv("DJANGO_CACHE_DIR", str(BASE_DIR / "cache"))
+CACHE_MAX_ENTRIES = int(getenv("DJANGO_CACHE_MAX_ENTRIES", 20000))
+CACHES = {
+    # Cached reports; culled (a third at a time) once MAX_ENTRIES is reached
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR,
+        "OPTIONS": {"MAX_ENTRIES": CACHE_MAX_ENTRIES},
+    },
+    # Generation tokens only. There are a handful of them, so this one is never
+    # culled: losing a token would leave processes disagreeing about what is stale
+    "generations": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": str(Path(CACHE_DIR) / "generations"),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -162,6 +184,53 @@ LOGGING_CONFIG = None
 
 DATA_UPLOAD_MAX_NUMBER_FILES = 5000
 
+# Spool uploaded workbooks straight to disk instead of buffering them in memory
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+
+# Processes used to parse multi-file uploads in parallel; 1 parses them in-line.
+# Each web or ingest worker process starts one pool of this size on first use and
+# keeps it; its processes come from a fork server (spawned where there is none),
+# never forked from a process that may be running warming threads
+INGEST_PARSE_WORKERS = int(getenv("INGEST_PARSE_WORKERS", 1))
+
+# Dashboard aggregation backend: "sql" (database-side), "pandas" or "columnar"
+# (in-process NumPy copy of the records); ?backend= overrides it
+DASHBOARD_BACKEND = getenv("DASHBOARD_BACKEND", "sql")
+# Memory the columnar backend may use per process before it logs a warning
+DASHBOARD_COLUMNAR_MAX_MB = int(getenv("DASHBOARD_COLUMNAR_MAX_MB", 256))
+# Seconds before the last seen updated_at that each columnar refresh re-reads
+DASHBOARD_COLUMNAR_WATERMARK_OVERLAP = int(getenv("DASHBOARD_COLUMNAR_WATERMARK_OVERLAP", 300))
+# Seconds a computed dashboard stays cached; uploads invalidate it sooner
+DASHBOARD_CACHE_TIMEOUT = int(getenv("DASHBOARD_CACHE_TIMEOUT", 24 * 60 * 60))
+# Rebuild the cached dashboards below in the background after every upload
+DASHBOARD_WARM_AFTER_UPLOAD = str_to_bool(getenv("DASHBOARD_WARM_AFTER_UPLOAD", True))
+# Filters to warm: any of diocese, archdeaconry, parish, congregation (one per node)
+DASHBOARD_WARM_SCOPES = getenv("DASHBOARD_WARM_SCOPES", "diocese,archdeaconry,parish").split(",")
+# Date ranges to warm: "default" (the endpoint's two years) and/or "year" (1 January to today)
+DASHBOARD_WARM_WINDOWS = getenv("DASHBOARD_WARM_WINDOWS", "default,year").split(",")
+# Threads used to build them; kept small so warming never crowds out requests
+DASHBOARD_WARM_WORKERS = int(getenv("DASHBOARD_WARM_WORKERS", 2))
+# At most this many dashboards are warmed per run, coarsest scopes first, so warming
+# fills no more than a quarter of the default cache and never culls its own entries
+DASHBOARD_WARM_MAX_COMBINATIONS = int(getenv("DASHBOARD_WARM_MAX_COMBINATIONS", CACHE_MAX_ENTRIES // 4))
+
+# Parquet/Arrow record exports, one file per data generation and filter
+RECORDS_EXPORT_DIR = getenv("RECORDS_EXPORT_DIR", str(BASE_DIR / "exports"))
+
+# Ingestion flags records further than ANOMALY_THRESHOLD standard deviations from the
+# congregation's baseline, a weighted average of about its last ANOMALY_BASELINE_SUNDAYS
+# Sundays, once it has ANOMALY_MIN_SUNDAYS of them; deviations are measured in at
+# least ANOMALY_MIN_SPREAD times the mean
+ANOMALY_THRESHOLD = float(getenv("ANOMALY_THRESHOLD", 4))
+ANOMALY_BASELINE_SUNDAYS = int(getenv("ANOMALY_BASELINE_SUNDAYS", 12))
+ANOMALY_MIN_SUNDAYS = int(getenv("ANOMALY_MIN_SUNDAYS", 4))
+ANOMALY_MIN_SPREAD = float(getenv("ANOMALY_MIN_SPREAD", 0.1))
+
+# Where chunks of resumable uploads are kept until they are finalized
+CHUNKED_UPLOAD_DIR = getenv("CHUNKED_UPLOAD_DIR", str(BASE_DIR / "chunked_uploads"))
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 10 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY_HOURS = 48
+
 LOGURU_LOGGING = {
     "handlers": [
         {
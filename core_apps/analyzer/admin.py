@@ -1,8 +1,22 @@
 from django.contrib import admin
-from .models import UploadedWorkbook
+from .models import UploadedWorkbook, UploadJob, UploadJobFile
 
 @admin.register(UploadedWorkbook)
 class UploadedWorkbookAdmin(admin.ModelAdmin):
     list_display = ('file_name',)
     list_filter = ('processed',)
     search_fields = ('original_filename',)
+
+
+class UploadJobFileInline(admin.TabularInline):
+    model = UploadJobFile
+    extra = 0
+    fields = ('file_name', 'status', 'processed', 'sheets_done', 'sheets_total', 'rows_written')
+    readonly_fields = fields
+
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    inlines = (UploadJobFileInline,)
@@ -0,0 +1,498 @@
+import hashlib
+import json
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast, TruncMonth
+from django.utils.functional import cached_property
+
+from core_apps.attendance.models import AttendanceRollup
+from core_apps.attendance.rollups import ATTENDANCE_GENERATION, rollup_window
+from core_apps.common.concurrency import gather_in_threads
+from core_apps.common.generations import get_generation
+
+from .columnar import columnar_store
+
+Level = AttendanceRollup.Level
+
+SEGMENTS = ['sunday_school', 'adults', 'youth', 'diff_abled']
+SUM_COLUMNS = ['record_count'] + SEGMENTS + ['total_collection', 'banked']
+NAME_COLUMNS = {
+    'archdeaconry_name': F('archdeaconry__name'),
+    'parish_name': F('parish__name'),
+    'congregation_name': F('congregation__name'),
+}
+TOP_CONGREGATIONS = 5
+# Column dtypes of the pandas backend's frames: compact counts, float money, names as categories
+FRAME_DTYPES = {
+    'period_start': 'datetime64[D]',
+    **{column: np.int32 for column in SUM_COLUMNS},
+    'total_collection': np.float64,
+    'banked': np.float64,
+    **{column: 'category' for column in NAME_COLUMNS},
+}
+FRAME_CHUNK_SIZE = 20000
+DASHBOARD_CACHE_PREFIX = 'dashboard'
+
+
+def dashboard_scope(archdeaconry_id=None, parish_id=None, congregation_id=None):
+    """
+    The rollup level that answers a dashboard filter and the filter itself, most specific first.
+    """
+    if congregation_id:
+        return Level.CONGREGATION, {'congregation_id': congregation_id}
+    if parish_id:
+        return Level.PARISH, {'parish_id': parish_id}
+    if archdeaconry_id:
+        return Level.ARCHDEACONRY, {'archdeaconry_id': archdeaconry_id}
+    return Level.ARCHDEACONRY, {}
+
+
+def dashboard_fingerprint(
+    start_date, end_date, backend, archdeaconry_id=None, parish_id=None, congregation_id=None, sections=None
+):
+    """
+    A digest of the normalized dashboard parameters and the current attendance
+    generation. Requests that resolve to the same range and scope share it, and it
+    changes as soon as an upload changes the data. Used as cache key and ETag.
+    """
+    level, scope = dashboard_scope(archdeaconry_id, parish_id, congregation_id)
+    params = {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'level': level,
+        'scope': {key: str(value).strip() for key, value in scope.items()},
+        'backend': backend,
+        'sections': sorted(sections or DASHBOARD_SECTIONS),
+    }
+    payload = json.dumps([get_generation(ATTENDANCE_GENERATION), params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:40]
+
+
+def dashboard_cache_key(fingerprint):
+    return f"{DASHBOARD_CACHE_PREFIX}:{fingerprint}"
+
+
+class DashboardSource:
+    """
+    Aggregates behind the dashboard for one date range and filter. Subclasses
+    return plain dicts of sums (floats) so ``build_dashboard`` can format either.
+    """
+    def __init__(self, start_date, end_date, archdeaconry_id=None, parish_id=None, congregation_id=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.level, self.scope = dashboard_scope(archdeaconry_id, parish_id, congregation_id)
+
+    def rollups(self, level=None):
+        return AttendanceRollup.objects.filter(
+            rollup_window(self.start_date, self.end_date), level=level or self.level, **self.scope
+        )
+
+    def sundays(self):
+        return AttendanceRollup.objects.filter(
+            period=AttendanceRollup.Period.WEEK, level=self.level,
+            period_start__range=(self.start_date, self.end_date), **self.scope
+        )
+
+
+def _floats(row):
+    return {key: float(value or 0) if key in SUM_COLUMNS else value for key, value in row.items()}
+
+
+class SqlDashboardSource(DashboardSource):
+    """
+    Every aggregate is computed by the database; only aggregate rows are fetched.
+    """
+    def totals(self):
+        return _floats(self.rollups().aggregate(**{column: Sum(column) for column in SUM_COLUMNS}))
+
+    def months(self):
+        rows = (
+            self.rollups().order_by()
+            .values(month=TruncMonth('period_start'))
+            .annotate(**{column: Sum(column) for column in SUM_COLUMNS})
+            .order_by('month')
+        )
+        return [_floats({**row, 'month': row['month'].strftime('%Y-%m')}) for row in rows]
+
+    def congregations(self):
+        return [
+            _floats(row) for row in
+            self.rollups(Level.CONGREGATION).order_by()
+            .values(**NAME_COLUMNS)
+            .annotate(**{column: Sum(column) for column in SUM_COLUMNS})
+        ]
+
+    def top_congregations(self):
+        rows = (
+            self.rollups(Level.CONGREGATION).order_by()
+            .values(name=F('congregation__name'))
+            .annotate(total=Sum('total_collection'))
+            .order_by('-total', 'name')[:TOP_CONGREGATIONS]
+        )
+        return {row['name']: float(row['total']) for row in rows}
+
+    def first_and_last_sunday(self):
+        sundays = self.sundays().order_by().values('period_start').annotate(
+            **{column: Sum(column) for column in SUM_COLUMNS}
+        )
+        first = sundays.order_by('period_start').first()
+        last = sundays.order_by('-period_start').first()
+        return (_floats(first), _floats(last)) if first else (None, None)
+
+
+def typed_frame(queryset, columns):
+    """
+    A DataFrame of ``columns`` from ``queryset``, built from ``values_list`` tuples a
+    chunk at a time straight into ``FRAME_DTYPES`` columns, so no column of Python
+    numbers or repeated name strings is ever held for the whole result.
+    """
+    # Money is cast in SQL so the driver never builds Decimal objects
+    fields = [Cast(column, FloatField()) if FRAME_DTYPES[column] == np.float64 else column for column in columns]
+    chunks, chunk = [], []
+    for row in queryset.values_list(*fields).iterator(chunk_size=FRAME_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == FRAME_CHUNK_SIZE:
+            chunks.append(_typed_columns(chunk, columns))
+            chunk = []
+    if chunk or not chunks:
+        chunks.append(_typed_columns(chunk, columns))
+    data = {}
+    for index, column in enumerate(columns):
+        parts = [part[index] for part in chunks]
+        if FRAME_DTYPES[column] == 'category':
+            data[column] = union_categoricals(parts)
+        else:
+            data[column] = np.concatenate(parts)
+    return pd.DataFrame(data, columns=columns)
+
+
+def _typed_columns(rows, columns):
+    values = zip(*rows) if rows else [()] * len(columns)
+    return [
+        pd.Categorical(items) if FRAME_DTYPES[column] == 'category' else np.array(items, dtype=FRAME_DTYPES[column])
+        for column, items in zip(columns, values)
+    ]
+
+
+class PandasDashboardSource(DashboardSource):
+    """
+    Fetches the rollup rows in range and aggregates them with pandas.
+    Kept as a fallback and as a reference for ``SqlDashboardSource``.
+    """
+    def frame(self, queryset, *columns):
+        return typed_frame(queryset, [*columns, *SUM_COLUMNS])
+
+    def totals(self):
+        df = self.frame(self.rollups())
+        return {column: float(df[column].sum()) for column in SUM_COLUMNS}
+
+    def months(self):
+        df = self.frame(self.rollups(), 'period_start')
+        if df.empty:
+            return []
+        df['month'] = df['period_start'].dt.to_period('M').astype(str)
+        return [
+            _floats(row) for row in df.groupby('month')[SUM_COLUMNS].sum().reset_index().to_dict(orient='records')
+        ]
+
+    def congregation_frame(self):
+        if not hasattr(self, '_congregations'):
+            self._congregations = self.frame(
+                self.rollups(Level.CONGREGATION).annotate(**NAME_COLUMNS), *NAME_COLUMNS
+            )
+        return self._congregations
+
+    def congregations(self):
+        df = self.congregation_frame()
+        if df.empty:
+            return []
+        return [
+            _floats(row) for row in
+            df.groupby(list(NAME_COLUMNS), observed=True)[SUM_COLUMNS].sum().reset_index().to_dict(orient='records')
+        ]
+
+    def top_congregations(self):
+        df = self.congregation_frame()
+        if df.empty:
+            return {}
+        return (
+            df.groupby('congregation_name', observed=True)['total_collection'].sum()
+            .sort_values(ascending=False)
+            .head(TOP_CONGREGATIONS)
+            .to_dict()
+        )
+
+    def first_and_last_sunday(self):
+        df = self.frame(self.sundays(), 'period_start')
+        if df.empty:
+            return None, None
+        weekly = df.groupby('period_start')[SUM_COLUMNS].sum()
+        return _floats(weekly.iloc[0].to_dict()), _floats(weekly.iloc[-1].to_dict())
+
+
+class ColumnarDashboardSource(DashboardSource):
+    """
+    Answers from the process's in-memory ``columnar_store`` without querying the
+    database, except to pick up records changed since the store was last refreshed.
+    """
+    @cached_property
+    def selection(self):
+        return columnar_store.get().select(self.start_date, self.end_date, **self.scope)
+
+    def totals(self):
+        return self.selection.totals()
+
+    def months(self):
+        return self.selection.months()
+
+    def congregations(self):
+        return self.selection.congregations()
+
+    def top_congregations(self):
+        return top_congregations(self.congregations())
+
+    def first_and_last_sunday(self):
+        sundays = list(self.selection.sundays().values())
+        return (sundays[0], sundays[-1]) if sundays else (None, None)
+
+
+DASHBOARD_SOURCES = {
+    'sql': SqlDashboardSource,
+    'pandas': PandasDashboardSource,
+    'columnar': ColumnarDashboardSource,
+}
+
+
+def attendance(row):
+    return sum(row[segment] for segment in SEGMENTS)
+
+
+def percentage(part, whole):
+    return float(part / whole * 100) if whole else 0.0
+
+
+def top_congregations(congregations):
+    """
+    The congregation names with the largest collections in ``congregations`` rows,
+    ordered like ``SqlDashboardSource.top_congregations``.
+    """
+    totals = {}
+    for row in congregations:
+        name = row['congregation_name']
+        totals[name] = totals.get(name, 0.0) + row['total_collection']
+    return dict(sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:TOP_CONGREGATIONS])
+
+
+def calculate_growth_rate(first, last):
+    # Average attendance per congregation on the first Sunday against the last
+    if first is None:
+        return 0.0
+    first_avg = attendance(first) / first['record_count']
+    last_avg = attendance(last) / last['record_count']
+    if first_avg == 0:
+        return 0.0
+    return round(float((last_avg - first_avg) / first_avg * 100), 2)
+
+
+class DashboardGraph:
+    """
+    The intermediate results sections are built from. Each is computed from the
+    source on first use and shared by every section that needs it, so a request
+    only pays for what its sections depend on.
+    """
+    # The source query each node is computed from; nodes sharing a query share its result
+    QUERIES = {
+        'totals': 'totals',
+        'count': 'totals',
+        'total_attendance': 'totals',
+        'banked_percentage': 'totals',
+        'months': 'months',
+        'growth_rate': 'sundays',
+        'congregations': 'congregations',
+        'top_congregations': 'top_congregations',
+    }
+    QUERY_METHODS = {'sundays': 'first_and_last_sunday'}
+
+    def __init__(self, source):
+        self.source = source
+
+    def queries(self, sections):
+        """
+        The source queries ``sections`` need, always including ``totals``.
+        """
+        queries = {'totals'} | {self.QUERIES[need] for name in sections for need in DASHBOARD_SECTIONS[name][0]}
+        if 'congregations' in queries:
+            # Derived from the breakdown instead
+            queries.discard('top_congregations')
+        return sorted(queries)
+
+    def fetch(self, query):
+        return getattr(self.source, self.QUERY_METHODS.get(query, query))()
+
+    def prefill(self, results):
+        """
+        Store query results fetched elsewhere (e.g. concurrently) as computed nodes.
+        """
+        self.__dict__.update(results)
+
+    @cached_property
+    def totals(self):
+        return self.source.totals()
+
+    @cached_property
+    def count(self):
+        return self.totals['record_count']
+
+    @cached_property
+    def total_attendance(self):
+        return attendance(self.totals)
+
+    @cached_property
+    def banked_percentage(self):
+        return percentage(self.totals['banked'], self.totals['total_collection'])
+
+    @cached_property
+    def months(self):
+        return self.source.months()
+
+    @cached_property
+    def sundays(self):
+        return self.source.first_and_last_sunday()
+
+    @cached_property
+    def growth_rate(self):
+        return calculate_growth_rate(*self.sundays)
+
+    @cached_property
+    def congregations(self):
+        return self.source.congregations()
+
+    @cached_property
+    def top_congregations(self):
+        # Reuse the full breakdown when another section already fetched it
+        if 'congregations' in self.__dict__:
+            return top_congregations(self.congregations)
+        return self.source.top_congregations()
+
+
+DASHBOARD_SECTIONS = {}
+
+
+def section(name, *needs):
+    """
+    Register a dashboard section computed from the ``DashboardGraph`` nodes in ``needs``.
+    """
+    def register(func):
+        DASHBOARD_SECTIONS[name] = (needs, func)
+        return func
+    return register
+
+
+@section('overall', 'totals', 'count', 'total_attendance', 'growth_rate', 'banked_percentage')
+def overall_section(totals, count, total_attendance, growth_rate, banked_percentage):
+    return {
+        "total_total_collection": totals['total_collection'],
+        "avg_weekly_attendance": total_attendance / count,
+        "growth_rate": growth_rate,
+        "banked_percentage": banked_percentage,
+    }
+
+
+@section('time_series', 'months')
+def time_series_section(months):
+    return [
+        {
+            'month': month['month'],
+            'total_attendance': round(attendance(month) / month['record_count'], 1),
+            'total_collection': round(month['total_collection'], 2),
+            'sunday_school': month['sunday_school'] / month['record_count'],
+            'adults': month['adults'] / month['record_count'],
+        }
+        for month in months
+    ]
+
+
+@section('hierarchy', 'congregations')
+def hierarchy_section(congregations):
+    return [
+        {
+            'archdeaconry_name': row['archdeaconry_name'],
+            'parish_name': row['parish_name'],
+            'congregation_name': row['congregation_name'],
+            'total_attendance': attendance(row) / row['record_count'],
+            'total_collection': row['total_collection'],
+            'id': int(row['record_count']),
+        }
+        for row in sorted(
+            congregations,
+            key=lambda row: (row['archdeaconry_name'], row['parish_name'], row['congregation_name']),
+        )
+    ]
+
+
+@section('financial', 'banked_percentage', 'top_congregations', 'months')
+def financial_section(banked_percentage, top_congregations, months):
+    return {
+        "banked_percentage": banked_percentage,
+        "top_congregations": top_congregations,
+        "collection_trend": [
+            {'month': month['month'], 'total_collection': month['total_collection']} for month in months
+        ],
+    }
+
+
+@section('attendance_segmentation', 'totals', 'count', 'total_attendance')
+def attendance_segmentation_section(totals, count, total_attendance):
+    return {
+        **{f"{segment}_avg": totals[segment] / count for segment in SEGMENTS},
+        "segmentation_ratio": {
+            segment: percentage(totals[segment], total_attendance) for segment in SEGMENTS
+        },
+    }
+
+
+def parse_sections(value):
+    """
+    The sections named in a comma separated ``sections=`` value, in response order;
+    all of them when it is empty. Raises ``ValueError`` for unknown names.
+    """
+    names = {name.strip() for name in (value or '').split(',') if name.strip()}
+    unknown = names - set(DASHBOARD_SECTIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown section(s): {', '.join(sorted(unknown))}. Choose from: {', '.join(DASHBOARD_SECTIONS)}"
+        )
+    return [name for name in DASHBOARD_SECTIONS if not names or name in names]
+
+
+def build_dashboard(source, sections=None, graph=None):
+    """
+    The dashboard response for a ``DashboardSource`` with only ``sections`` (default:
+    all of them), or ``None`` when there is no data. ``graph`` may carry results
+    that were already fetched.
+    """
+    graph = graph or DashboardGraph(source)
+    if not graph.count:
+        return None
+    data = {}
+    for name in sections or DASHBOARD_SECTIONS:
+        needs, func = DASHBOARD_SECTIONS[name]
+        data[name] = func(**{need: getattr(graph, need) for need in needs})
+    return data
+
+
+async def abuild_dashboard(source, sections=None):
+    """
+    ``build_dashboard`` for async views: the source queries the sections need run
+    concurrently, each on its own connection, so the wait is about that of the
+    slowest query rather than the sum of all of them.
+    """
+    graph = DashboardGraph(source)
+    queries = graph.queries(sections or DASHBOARD_SECTIONS)
+    results = await gather_in_threads(*(partial(graph.fetch, query) for query in queries))
+    graph.prefill(zip(queries, results))
+    return build_dashboard(source, sections, graph)
@@ -0,0 +1,93 @@
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils import timezone
+
+from .models import ChunkedUpload
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def chunk_dir(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, str(upload.pk))
+
+
+def chunk_path(upload, index):
+    return os.path.join(chunk_dir(upload), f"{index}.part")
+
+
+def received_chunks(upload):
+    """
+    Indexes of the chunks already on disk. The directory is the source of truth,
+    so a client can resume by asking which chunks are still missing.
+    """
+    try:
+        names = os.listdir(chunk_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part') and name[:-5].isdigit())
+
+
+def missing_chunks(upload):
+    received = set(received_chunks(upload))
+    return [index for index in range(upload.total_chunks) if index not in received]
+
+
+def write_chunk(upload, index, stream, max_size=None):
+    """
+    Copy a chunk from ``stream`` to disk without buffering it in memory. The chunk
+    is written under a temporary name and renamed, so a dropped connection never
+    leaves a partial chunk behind. Returns the number of bytes written.
+    """
+    max_size = max_size or settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE
+    os.makedirs(chunk_dir(upload), exist_ok=True)
+    final_path = chunk_path(upload, index)
+    tmp_path = f"{final_path}.tmp"
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as fh:
+            while True:
+                data = stream.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                written += len(data)
+                if written > max_size:
+                    raise ValueError(f"Chunk is larger than {max_size} bytes")
+                fh.write(data)
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+
+def assemble(upload):
+    """
+    Concatenate all chunks into a spooled ``TemporaryUploadedFile``, which file
+    storage moves into place instead of copying.
+    """
+    assembled = TemporaryUploadedFile(upload.file_name, 'application/octet-stream', 0, None)
+    for index in range(upload.total_chunks):
+        with open(chunk_path(upload, index), 'rb') as fh:
+            shutil.copyfileobj(fh, assembled, COPY_BUFFER_SIZE)
+    assembled.flush()
+    assembled.size = assembled.tell()
+    assembled.seek(0)
+    return assembled
+
+
+def discard(upload):
+    shutil.rmtree(chunk_dir(upload), ignore_errors=True)
+
+
+def purge_expired():
+    """
+    Remove chunked uploads that were never finalized within CHUNKED_UPLOAD_EXPIRY_HOURS.
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    for upload in ChunkedUpload.objects.filter(created_at__lt=cutoff):
+        discard(upload)
+        upload.delete()
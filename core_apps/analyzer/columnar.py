@@ -0,0 +1,294 @@
+import datetime
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from loguru import logger
+
+from core_apps.attendance.models import AttendanceRecord
+from core_apps.attendance.rollups import ATTENDANCE_GENERATION, ATTENDANCE_RELOAD_GENERATION
+from core_apps.common.generations import get_generation
+from core_apps.common.hierarchy import hierarchy_cache
+from core_apps.common.models import Congregation
+
+COUNT_COLUMNS = ['sunday_school', 'adults', 'youth', 'diff_abled']
+MONEY_COLUMNS = ['total_collection', 'banked']
+ID_COLUMNS = ['archdeaconry_id', 'parish_id', 'congregation_id']
+# Dates are day numbers since 1970-01-01 and money is whole cents, so every sum is exact
+COLUMN_DTYPES = {
+    'id': np.int64,
+    'day': np.int32,
+    **{column: np.int32 for column in ID_COLUMNS},
+    **{column: np.int32 for column in COUNT_COLUMNS},
+    **{column: np.int64 for column in MONEY_COLUMNS},
+}
+FETCH_COLUMNS = ['id', 'sunday_date', *ID_COLUMNS, *COUNT_COLUMNS, *MONEY_COLUMNS, 'updated_at']
+LOAD_CHUNK_SIZE = 20000
+
+
+def day_number(day):
+    return (day - datetime.date(1970, 1, 1)).days
+
+
+def empty_columns():
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+
+def rows_to_columns(rows):
+    """
+    Typed arrays for a list of ``FETCH_COLUMNS`` tuples, and their latest ``updated_at``.
+    """
+    if not rows:
+        return empty_columns(), None
+    values = list(zip(*rows))
+    columns = {
+        'id': np.array(values[0], dtype=np.int64),
+        'day': np.array(values[1], dtype='datetime64[D]').astype(np.int32),
+    }
+    for offset, name in enumerate(ID_COLUMNS + COUNT_COLUMNS, start=2):
+        columns[name] = np.array(values[offset], dtype=COLUMN_DTYPES[name])
+    for offset, name in enumerate(MONEY_COLUMNS, start=2 + len(ID_COLUMNS) + len(COUNT_COLUMNS)):
+        columns[name] = np.rint(np.array(values[offset], dtype=np.float64) * 100).astype(np.int64)
+    return columns, max(values[-1])
+
+
+def fetch_columns(records):
+    """
+    Read ``records`` into typed arrays a chunk at a time, so the row tuples never
+    exist for the whole table at once. Returns ``(columns, watermark)``.
+    """
+    chunks, chunk = [], []
+    for row in records.order_by().values_list(*FETCH_COLUMNS).iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == LOAD_CHUNK_SIZE:
+            chunks.append(rows_to_columns(chunk))
+            chunk = []
+    chunks.append(rows_to_columns(chunk))
+    watermarks = [mark for _, mark in chunks if mark is not None]
+    columns = {name: np.concatenate([part[name] for part, _ in chunks]) for name in COLUMN_DTYPES}
+    return columns, max(watermarks) if watermarks else None
+
+
+def congregation_paths(congregation_ids):
+    """
+    ``{id: (archdeaconry name, parish name, congregation name)}`` for ``congregation_ids``.
+    """
+    hierarchy = hierarchy_cache.get()
+    paths, missing = {}, []
+    for cong_id in map(int, congregation_ids):
+        path = paths[cong_id] = hierarchy.congregation_path(cong_id)
+        if path is None:
+            missing.append(cong_id)
+    if missing:
+        # Added by an upload whose hierarchy change this process has not picked up yet
+        for cong_id, name, parish_name, arch_name in Congregation.objects.filter(id__in=missing).values_list(
+            'id', 'name', 'parish__name', 'parish__archdeaconry__name'
+        ):
+            paths[cong_id] = (arch_name, parish_name, name)
+    return paths
+
+
+class ColumnarSnapshot:
+    """
+    An immutable copy of every AttendanceRecord's figures as one NumPy array per
+    column, sorted by Sunday. A date range is a contiguous slice found by binary
+    search; per-Sunday and per-month groups are contiguous runs within it.
+    """
+    def __init__(self, generation, watermark, columns, loaded_seconds=0.0):
+        self.generation = generation
+        self.watermark = watermark
+        self.loaded_seconds = loaded_seconds
+        order = np.argsort(columns['day'], kind='stable')
+        self.columns = {name: np.ascontiguousarray(columns[name][order]) for name in COLUMN_DTYPES}
+        # Dense congregation codes let np.bincount group without hashing
+        self.congregation_ids, codes = np.unique(self.columns['congregation_id'], return_inverse=True)
+        self.congregation_codes = codes.astype(np.int32)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def merged(self, generation, watermark, changes, loaded_seconds=0.0):
+        """
+        A new snapshot with ``changes`` replacing the rows that share their ids.
+        """
+        keep = ~np.isin(self.columns['id'], changes['id'])
+        columns = {name: np.concatenate([self.columns[name][keep], changes[name]]) for name in COLUMN_DTYPES}
+        marks = [mark for mark in (self.watermark, watermark) if mark is not None]
+        return ColumnarSnapshot(generation, max(marks) if marks else None, columns, loaded_seconds)
+
+    @property
+    def nbytes(self):
+        arrays = [*self.columns.values(), self.congregation_codes, self.congregation_ids]
+        return sum(array.nbytes for array in arrays)
+
+    def memory_report(self):
+        budget_mb = settings.DASHBOARD_COLUMNAR_MAX_MB
+        columns = [
+            {'column': name, 'dtype': str(array.dtype), 'bytes': array.nbytes}
+            for name, array in self.columns.items()
+        ]
+        columns.append({
+            'column': 'congregation_codes', 'dtype': str(self.congregation_codes.dtype),
+            'bytes': self.congregation_codes.nbytes + self.congregation_ids.nbytes,
+        })
+        total_mb = self.nbytes / 1024 / 1024
+        return {
+            'rows': len(self),
+            'columns': columns,
+            'bytes_per_row': round(self.nbytes / len(self), 1) if len(self) else 0,
+            'total_mb': round(total_mb, 2),
+            'budget_mb': budget_mb,
+            'within_budget': total_mb <= budget_mb,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'loaded_seconds': round(self.loaded_seconds, 3),
+        }
+
+    def select(self, start_date, end_date, archdeaconry_id=None, parish_id=None, congregation_id=None):
+        days = self.columns['day']
+        lo = np.searchsorted(days, day_number(start_date), side='left')
+        hi = np.searchsorted(days, day_number(end_date), side='right')
+        rows = slice(lo, hi)
+        scope = {
+            'archdeaconry_id': archdeaconry_id, 'parish_id': parish_id, 'congregation_id': congregation_id,
+        }
+        for column, value in scope.items():
+            if value in (None, ''):
+                continue
+            try:
+                node = int(value)
+            except (TypeError, ValueError):
+                node = -1
+            rows = np.flatnonzero(self.columns[column][lo:hi] == node) + lo if isinstance(rows, slice) else (
+                rows[self.columns[column][rows] == node]
+            )
+        return ColumnarSelection(self, rows)
+
+
+class ColumnarSelection:
+    """
+    The rows of a snapshot matching one dashboard filter, in Sunday order, with
+    the aggregates ``DashboardSource`` needs as dicts of floats.
+    """
+    def __init__(self, snapshot, rows):
+        self.snapshot = snapshot
+        self.rows = rows
+        self.size = rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+    def column(self, name):
+        return self.snapshot.columns[name][self.rows]
+
+    def _sums(self, counts, sums):
+        row = {'record_count': float(counts)}
+        for name in COUNT_COLUMNS:
+            row[name] = float(sums[name])
+        for name in MONEY_COLUMNS:
+            row[name] = float(sums[name]) / 100
+        return row
+
+    def totals(self):
+        return self._sums(self.size, {
+            name: self.column(name).sum(dtype=np.int64) for name in COUNT_COLUMNS + MONEY_COLUMNS
+        })
+
+    def groups(self, keys):
+        """
+        One dict of sums per run of equal ``keys`` (which must be sorted), keyed by the run's key.
+        """
+        if not self.size:
+            return {}
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+        counts = np.diff(np.concatenate([starts, [self.size]]))
+        sums = {
+            name: np.add.reduceat(self.column(name), starts, dtype=np.int64)
+            for name in COUNT_COLUMNS + MONEY_COLUMNS
+        }
+        return {
+            int(keys[start]): self._sums(counts[index], {name: sums[name][index] for name in sums})
+            for index, start in enumerate(starts)
+        }
+
+    def sundays(self):
+        return self.groups(self.column('day'))
+
+    def months(self):
+        months = self.column('day').astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return [
+            {'month': str(np.datetime64(month, 'M')), **row} for month, row in self.groups(months).items()
+        ]
+
+    def congregations(self):
+        """
+        Sums per congregation name path, like grouping the records by their names.
+        """
+        codes = self.snapshot.congregation_codes[self.rows]
+        size = len(self.snapshot.congregation_ids)
+        counts = np.bincount(codes, minlength=size)
+        sums = {
+            name: np.bincount(codes, weights=self.column(name), minlength=size)
+            for name in COUNT_COLUMNS + MONEY_COLUMNS
+        }
+        present = np.flatnonzero(counts)
+        paths = congregation_paths(self.snapshot.congregation_ids[present])
+        by_path = {}
+        for code in present:
+            path = paths.get(int(self.snapshot.congregation_ids[code]))
+            row = self._sums(counts[code], {name: sums[name][code] for name in sums})
+            entry = by_path.get(path)
+            by_path[path] = row if entry is None else {key: entry[key] + row[key] for key in row}
+        return [
+            {'archdeaconry_name': path[0], 'parish_name': path[1], 'congregation_name': path[2], **row}
+            for path, row in by_path.items() if path is not None
+        ]
+
+
+class ColumnarStore:
+    """
+    Process-wide columnar copy of AttendanceRecord for the ``columnar`` dashboard
+    backend. The table is loaded once per process; after that, whenever the
+    ``attendance`` generation changes only records updated since the last
+    watermark are fetched and merged. A row count that no longer matches the
+    table (records were deleted) or a bump of the ``attendance-reload``
+    generation (a bulk import committed) triggers a full reload.
+    """
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        generation = (get_generation(ATTENDANCE_GENERATION), get_generation(ATTENDANCE_RELOAD_GENERATION))
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.generation != generation:
+                self._snapshot = self._refresh(self._snapshot, generation)
+            return self._snapshot
+
+    def clear(self):
+        self._snapshot = None
+
+    def _refresh(self, snapshot, generation):
+        started = time.perf_counter()
+        if snapshot is None or snapshot.watermark is None or snapshot.generation[1] != generation[1]:
+            columns, watermark = fetch_columns(AttendanceRecord.objects.all())
+            snapshot = ColumnarSnapshot(generation, watermark, columns, time.perf_counter() - started)
+        else:
+            # Re-read a margin before the watermark: a transaction that stamped its rows
+            # earlier may have committed after the last refresh
+            since = snapshot.watermark - datetime.timedelta(seconds=settings.DASHBOARD_COLUMNAR_WATERMARK_OVERLAP)
+            changes, watermark = fetch_columns(AttendanceRecord.objects.filter(updated_at__gte=since))
+            snapshot = snapshot.merged(generation, watermark, changes, time.perf_counter() - started)
+            if len(snapshot) != AttendanceRecord.objects.count():
+                return self._refresh(None, generation)
+
+        report = snapshot.memory_report()
+        if not report['within_budget']:
+            logger.warning(
+                f"Columnar attendance store uses {report['total_mb']} MB, "
+                f"over DASHBOARD_COLUMNAR_MAX_MB={report['budget_mb']}"
+            )
+        return snapshot
+
+
+columnar_store = ColumnarStore()
@@ -0,0 +1,140 @@
+import csv
+import io
+from collections import defaultdict
+
+from django.db import connection
+
+from core_apps.attendance.anomalies import RECORD_FIELDS, detect_anomalies
+from core_apps.attendance.models import AttendanceRecord
+from core_apps.attendance.rollups import refresh_rollups
+
+from .ingestion import resolve_hierarchy
+
+STAGING_TABLE = 'attendance_import_staging'
+STAGING_COLUMNS = [
+    'seq', 'workbook_id', 'archdeaconry_id', 'parish_id', 'congregation_id', 'sunday_date',
+    'sunday_school', 'adults', 'diff_abled', 'youth',
+    'total_collection', 'banked', 'unbanked', 'remarks',
+]
+# Columns overwritten when a congregation already has a record for that Sunday
+MERGE_UPDATE_COLUMNS = STAGING_COLUMNS[1:4] + STAGING_COLUMNS[6:] + ['updated_at']
+
+
+class StagingImporter:
+    """
+    Loads parsed sheets into a temporary staging table with ``COPY FROM STDIN``
+    and merges them into AttendanceRecord with a single set-based upsert.
+    PostgreSQL only; must be used inside a transaction, as the staging table
+    is dropped on commit.
+    """
+    def __init__(self):
+        self.seq = 0
+        self.staged = 0
+        # Sundays staged per archdeaconry id, whose rollups need refreshing after the merge
+        self.touched = defaultdict(set)
+        self.workbooks = set()
+
+    def __enter__(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMP TABLE {STAGING_TABLE} (
+                    seq bigint NOT NULL,
+                    workbook_id bigint NOT NULL,
+                    archdeaconry_id bigint NOT NULL,
+                    parish_id bigint NOT NULL,
+                    congregation_id bigint NOT NULL,
+                    sunday_date date NOT NULL,
+                    sunday_school integer NOT NULL,
+                    adults integer NOT NULL,
+                    diff_abled integer NOT NULL,
+                    youth integer NOT NULL,
+                    total_collection numeric(12, 2) NOT NULL,
+                    banked numeric(12, 2) NOT NULL,
+                    unbanked numeric(12, 2) NOT NULL,
+                    remarks text NOT NULL
+                ) ON COMMIT DROP
+            """)
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def stage_sheet(self, upload, sheet_name, parsed_sheet, errors):
+        """
+        A ``writer`` for ``ingest_workbooks``: resolve the sheet's hierarchy and
+        COPY its rows into the staging table. Returns the number of rows staged.
+        """
+        arch_name, sheet_date, parsed_rows = parsed_sheet
+        if not parsed_rows:
+            return 0
+        try:
+            ids = resolve_hierarchy(
+                arch_name,
+                {(fields['parish_name'], fields['cong_name']) for _, fields in parsed_rows},
+            )
+        except Exception as sheet_err:
+            errors.append(f"Sheet '{sheet_name}': {str(sheet_err)}")
+            return 0
+
+        # Every path of a sheet resolves under the same archdeaconry
+        self.touched[next(iter(ids.values()))[0]].add(sheet_date)
+        self.workbooks.add(upload.pk)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for _, fields in parsed_rows:
+            self.seq += 1
+            arch_id, parish_id, cong_id = ids[(fields['parish_name'], fields['cong_name'])]
+            writer.writerow([
+                self.seq, upload.pk, arch_id, parish_id, cong_id, sheet_date.isoformat(),
+                fields['sunday_school'], fields['adults'], fields['diff_abled'], fields['youth'],
+                fields['total_collection'], fields['banked'], fields['unbanked'], fields['remarks'],
+            ])
+        buffer.seek(0)
+        self.copy(buffer)
+        self.staged += len(parsed_rows)
+        return len(parsed_rows)
+
+    def copy(self, buffer):
+        # FORCE_NOT_NULL reads empty remarks as '' rather than NULL
+        sql = (
+            f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (remarks))"
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.read())
+
+    def merge(self):
+        """
+        Upsert the staged rows into AttendanceRecord, refresh the affected rollups
+        and flag anomalies in the merged records.
+        When the same congregation and Sunday was staged more than once, the row
+        staged last wins. Returns the number of records inserted or updated.
+        """
+        table = AttendanceRecord._meta.db_table
+        columns = ', '.join(STAGING_COLUMNS[1:])
+        updates = ', '.join(
+            f"{column} = now()" if column == 'updated_at' else f"{column} = EXCLUDED.{column}"
+            for column in MERGE_UPDATE_COLUMNS
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {table} (created_at, updated_at, {columns})
+                SELECT DISTINCT ON (congregation_id, sunday_date) now(), now(), {columns}
+                FROM {STAGING_TABLE}
+                ORDER BY congregation_id, sunday_date, seq DESC
+                ON CONFLICT (congregation_id, sunday_date) DO UPDATE SET {updates}
+            """)
+            merged = cursor.rowcount
+        for arch_id, dates in self.touched.items():
+            refresh_rollups(arch_id, dates)
+            detect_anomalies(AttendanceRecord.objects.filter(
+                archdeaconry_id=arch_id, sunday_date__in=dates, workbook_id__in=self.workbooks
+            ).only(*RECORD_FIELDS))
+        return merged
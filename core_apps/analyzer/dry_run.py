@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from core_apps.attendance.models import AttendanceRecord
+
+from .pipeline import parse_uploads
+
+DIFF_FIELDS = [
+    'sunday_school', 'youth', 'adults', 'diff_abled',
+    'total_collection', 'banked', 'unbanked', 'remarks',
+]
+MONEY_FIELDS = ['total_collection', 'banked', 'unbanked']
+JOIN_KEYS = ['arch_name', 'parish_name', 'cong_name', 'sunday_date']
+
+
+def sheet_frame(parsed_sheet):
+    """
+    One parsed sheet (from a workbook or an export) as a DataFrame of
+    ``row``, the name path and the stored fields. Duplicate congregations keep
+    their last row, as they would when written.
+    """
+    arch_name, sheet_date, parsed_rows = parsed_sheet
+    columns = ['row', 'parish_name', 'cong_name'] + DIFF_FIELDS
+    if isinstance(parsed_rows, pd.DataFrame):
+        frame = parsed_rows[columns].copy()
+    else:
+        frame = pd.DataFrame([{'row': idx, **fields} for idx, fields in parsed_rows], columns=columns)
+    frame[MONEY_FIELDS] = frame[MONEY_FIELDS].astype(float)
+    frame['arch_name'] = arch_name
+    frame['sunday_date'] = sheet_date
+    return frame.drop_duplicates(['parish_name', 'cong_name'], keep='last')
+
+
+def load_existing(incoming):
+    """
+    The stored records for every archdeaconry and Sunday in ``incoming``, in one query.
+    """
+    columns = JOIN_KEYS + DIFF_FIELDS
+    if incoming.empty:
+        return pd.DataFrame(columns=columns)
+    queryset = AttendanceRecord.objects.filter(
+        archdeaconry__name__in=set(incoming['arch_name']),
+        sunday_date__in=set(incoming['sunday_date']),
+    ).values_list('archdeaconry__name', 'parish__name', 'congregation__name', 'sunday_date', *DIFF_FIELDS)
+    existing = pd.DataFrame.from_records(list(queryset), columns=columns)
+    existing[MONEY_FIELDS] = existing[MONEY_FIELDS].astype(float)
+    return existing
+
+
+def diff_rows(incoming):
+    """
+    Left-join ``incoming`` onto the stored records and classify every row as
+    ``new``, ``changed`` or ``unchanged``. Returns the joined frame, with the stored
+    values suffixed ``_old``, and a boolean frame of which fields changed.
+    """
+    merged = incoming.merge(
+        load_existing(incoming), on=JOIN_KEYS, how='left', suffixes=('', '_old'), indicator=True
+    )
+    is_new = merged['_merge'].eq('left_only')
+    changed = pd.DataFrame({
+        field: (
+            (merged[field] - merged[f'{field}_old']).abs().gt(0.005)
+            if field in MONEY_FIELDS else merged[field].ne(merged[f'{field}_old'])
+        ) & ~is_new
+        for field in DIFF_FIELDS
+    })
+    merged['status'] = np.select([is_new, changed.any(axis=1)], ['new', 'changed'], 'unchanged')
+    return merged, changed
+
+
+def _value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def describe_changes(merged, changed):
+    """
+    Field-level deltas of the changed rows, as JSON-ready dicts.
+    """
+    changes = []
+    rows = merged[merged['status'].eq('changed')]
+    for idx, row in rows.iterrows():
+        fields = {}
+        for field in DIFF_FIELDS:
+            if not changed.at[idx, field]:
+                continue
+            old, new = _value(row[f'{field}_old']), _value(row[field])
+            delta = {'old': old, 'new': new}
+            if field in MONEY_FIELDS:
+                delta['delta'] = round(new - old, 2)
+            elif field != 'remarks':
+                delta['delta'] = int(new - old)
+            fields[field] = delta
+        changes.append({
+            'row': int(row['row']),
+            'parish': row['parish_name'],
+            'congregation': row['cong_name'],
+            'fields': fields,
+        })
+    return changes
+
+
+def dry_run_uploads(files):
+    """
+    Validate uploaded files and report what importing them would change,
+    without storing the files or writing any records. Returns one summary per file
+    with a per-sheet count of new, changed and unchanged rows.
+    """
+    parsed_files = parse_uploads(files)
+
+    frames = []
+    for file_index, parsed in enumerate(parsed_files):
+        for sheet_name, parsed_sheet, _, _ in parsed['sheets']:
+            if parsed_sheet is not None:
+                frame = sheet_frame(parsed_sheet)
+                frame['file_index'] = file_index
+                frame['sheet'] = sheet_name
+                frames.append(frame)
+
+    if frames:
+        # Every sheet of every file is compared in a single join
+        merged, changed = diff_rows(pd.concat(frames, ignore_index=True))
+        over_banked = merged['banked'] > merged['total_collection']
+        by_sheet = dict(iter(merged.groupby(['file_index', 'sheet'], sort=False)))
+    else:
+        by_sheet = {}
+
+    summary = []
+    for file_index, (file, parsed) in enumerate(zip(files, parsed_files)):
+        file_summary = {'file': file.name, 'dry_run': True, 'valid': True, 'errors': [], 'warnings': [], 'sheets': []}
+        if parsed['error']:
+            file_summary['errors'].append(parsed['error'])
+        for sheet_name, parsed_sheet, sheet_errors, _ in parsed['sheets']:
+            file_summary['errors'].extend(sheet_errors)
+            sheet_summary = {
+                'sheet': sheet_name, 'new': 0, 'changed': 0, 'unchanged': 0,
+                'errors': sheet_errors, 'warnings': [], 'new_rows': [], 'changes': [],
+            }
+            rows = by_sheet.get((file_index, sheet_name))
+            if rows is not None:
+                counts = rows['status'].value_counts()
+                for status in ('new', 'changed', 'unchanged'):
+                    sheet_summary[status] = int(counts.get(status, 0))
+                new_rows = rows[rows['status'].eq('new')]
+                sheet_summary['new_rows'] = [
+                    {'row': int(row), 'parish': parish, 'congregation': cong}
+                    for row, parish, cong in zip(new_rows['row'], new_rows['parish_name'], new_rows['cong_name'])
+                ]
+                sheet_summary['changes'] = describe_changes(rows, changed.loc[rows.index])
+                flagged = rows[over_banked[rows.index]]
+                sheet_summary['warnings'] = [
+                    f"Sheet '{sheet_name}', row {row}: banked {banked:.2f} exceeds total collection {total:.2f}"
+                    for row, banked, total in zip(flagged['row'], flagged['banked'], flagged['total_collection'])
+                ]
+                file_summary['warnings'].extend(sheet_summary['warnings'])
+            file_summary['sheets'].append(sheet_summary)
+        file_summary['valid'] = not file_summary['errors'] and not file_summary['warnings']
+        summary.append(file_summary)
+    return summary
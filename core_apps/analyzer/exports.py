@@ -0,0 +1,169 @@
+import csv
+import hashlib
+import json
+import os
+import tempfile
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from core_apps.attendance.rollups import ATTENDANCE_GENERATION
+from core_apps.common.generations import get_generation
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows a worksheet can hold, less the header
+XLSX_MAX_ROWS = 1048576 - 1
+
+
+class Echo:
+    """
+    A file-like object whose ``write`` returns what it was given, so ``csv.writer``
+    can format one line at a time for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_csv(columns, rows):
+    """
+    Yield the CSV lines of a header and ``rows``, one line per item.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(columns, rows, title='Records'):
+    """
+    Write a header and ``rows`` to an anonymous temporary .xlsx file with
+    openpyxl's write-only mode, which keeps memory flat whatever the row count.
+    Returns the file, rewound.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+    fh = tempfile.TemporaryFile()
+    wb.save(fh)
+    fh.seek(0)
+    return fh
+
+
+# Columnar exports keep the database types: dates, integer counts and exact decimals
+ARROW_COLUMNS = [
+    ('id', pa.int64()),
+    ('sunday_date', pa.date32()),
+    ('archdeaconry_name', pa.string()),
+    ('parish_name', pa.string()),
+    ('congregation_name', pa.string()),
+    ('sunday_school', pa.int32()),
+    ('adults', pa.int32()),
+    ('youth', pa.int32()),
+    ('diff_abled', pa.int32()),
+    ('total_attendance', pa.int32()),
+    ('total_collection', pa.decimal128(12, 2)),
+    ('banked', pa.decimal128(12, 2)),
+    ('unbanked', pa.decimal128(12, 2)),
+    ('remarks', pa.string()),
+]
+ARROW_SCHEMA = pa.schema(ARROW_COLUMNS)
+ARROW_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+ARROW_BATCH_SIZE = 50000
+EXPORT_FILE_PREFIX = 'records'
+
+
+def iter_record_batches(rows, batch_size=ARROW_BATCH_SIZE):
+    """
+    Group ``ARROW_COLUMNS`` tuples into Arrow record batches of ``batch_size`` rows.
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield _record_batch(batch)
+            batch = []
+    if batch:
+        yield _record_batch(batch)
+
+
+def _record_batch(rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=dtype) for values, (_, dtype) in zip(columns, ARROW_COLUMNS)], schema=ARROW_SCHEMA
+    )
+
+
+def write_arrow(rows, path, export_format):
+    """
+    Write ``rows`` to ``path`` as Parquet or an Arrow IPC file, one batch at a time.
+    """
+    if export_format == 'parquet':
+        writer = pq.ParquetWriter(path, ARROW_SCHEMA, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(path, ARROW_SCHEMA)
+    with writer:
+        for batch in iter_record_batches(rows):
+            writer.write_batch(batch)
+
+
+def export_file_name(generation, filters, export_format):
+    """
+    ``records-<generation>-<filters digest>.<ext>``: a new attendance generation
+    gives every filter a new file, so a stored file never goes stale.
+    """
+    digest = hashlib.sha256(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{EXPORT_FILE_PREFIX}-{generation}-{digest}.{ARROW_FORMATS[export_format][0]}"
+
+
+def arrow_export(queryset, filters, export_format, directory=None):
+    """
+    The export of ``queryset`` (selected by ``filters``) for the current
+    attendance generation, opened for reading, writing it first if it does not
+    exist yet. Files of older generations are removed when a new one is written;
+    the returned handle stays readable even if its own file is removed later.
+    """
+    directory = directory or settings.RECORDS_EXPORT_DIR
+    while True:
+        generation = get_generation(ATTENDANCE_GENERATION)
+        path = os.path.join(directory, export_file_name(generation, filters, export_format))
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(directory, exist_ok=True)
+        rows = queryset.values_list(*[name for name, _ in ARROW_COLUMNS]).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        fd, partial_path = tempfile.mkstemp(dir=directory, suffix='.partial')
+        os.close(fd)
+        try:
+            write_arrow(rows, partial_path, export_format)
+            # Readers only ever see complete files
+            os.replace(partial_path, path)
+        except BaseException:
+            os.unlink(partial_path)
+            raise
+        try:
+            # Opened before anything is pruned, so no request's own file goes missing under it
+            export = open(path, 'rb')
+        except FileNotFoundError:
+            # A newer generation's export pruned it already; export that one instead
+            continue
+        remove_stale_exports(directory, generation)
+        return export
+
+
+def remove_stale_exports(directory, generation):
+    current = f"{EXPORT_FILE_PREFIX}-{generation}-"
+    for name in os.listdir(directory):
+        if name.startswith(f"{EXPORT_FILE_PREFIX}-") and not name.startswith(current):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
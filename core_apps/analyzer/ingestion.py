@@ -0,0 +1,271 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from core_apps.common.hierarchy import hierarchy_cache, invalidate_hierarchy, smart_title
+from core_apps.common.models import Archdeaconry, Parish, Congregation
+from core_apps.attendance.models import AttendanceRecord
+from core_apps.attendance.anomalies import detect_anomalies
+from core_apps.attendance.rollups import refresh_rollups
+
+# Sheets are named ARCHNAME-dd-mm-yy and the data starts on row 8
+SHEET_DATE_FORMAT = '%d-%m-%y'
+DATA_START_ROW = 8
+# Columns A-K: parish, congregation, sunday school, youth, adults, diff abled,
+# (G unused), total collection, banked, (J unused), remarks
+ROW_WIDTH = 11
+NAME_MAX_LENGTH = 100
+BULK_BATCH_SIZE = 1000
+# Largest values the attendance columns can hold: counts are int4 and amounts NUMERIC(12, 2)
+COUNT_MAX = 2 ** 31 - 1
+_MONEY_FIELD = AttendanceRecord._meta.get_field('total_collection')
+CENT = Decimal('0.01')
+MONEY_MAX = Decimal(10) ** (_MONEY_FIELD.max_digits - _MONEY_FIELD.decimal_places) - CENT
+
+ATTENDANCE_UPDATE_FIELDS = [
+    'workbook', 'archdeaconry', 'parish',
+    'sunday_school', 'adults', 'diff_abled', 'youth',
+    'total_collection', 'banked', 'unbanked', 'remarks',
+    'updated_at',
+]
+# The values of a record that come from its row
+RECORD_VALUE_FIELDS = [
+    'sunday_school', 'adults', 'diff_abled', 'youth',
+    'total_collection', 'banked', 'unbanked', 'remarks',
+]
+
+
+def parse_sheet_name(sheet_name):
+    """
+    Split a sheet name such as ``MUTIRA-05-01-25`` into ``('MUTIRA', date(2025, 1, 5))``.
+    Raises ``ValueError`` when the name does not follow the ARCHNAME-dd-mm-yy layout.
+    """
+    parts = sheet_name.rsplit('-', 3)
+    arch_name = parts[0].strip().upper()
+    if not arch_name:
+        raise ValueError(f"sheet name {sheet_name!r} has no archdeaconry")
+    sheet_date = datetime.datetime.strptime('-'.join(parts[1:]), SHEET_DATE_FORMAT).date()
+    return arch_name, sheet_date
+
+
+def _clean_name(value):
+    name = smart_title(str(value if value is not None else '').strip())
+    if len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f"name '{name[:20]}...' is longer than {NAME_MAX_LENGTH} characters")
+    return name
+
+
+def _to_count(value, label):
+    try:
+        count = int(value or 0)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{label} must be a whole number, got {value!r}")
+    if count < 0:
+        raise ValueError(f"{label} cannot be negative")
+    if count > COUNT_MAX:
+        raise ValueError(f"{label} cannot be more than {COUNT_MAX}")
+    return count
+
+
+def _check_money(amount, label):
+    if abs(amount) > MONEY_MAX:
+        raise ValueError(f"{label} must be between -{MONEY_MAX:,} and {MONEY_MAX:,}")
+    return amount
+
+
+def _to_money(value, label):
+    try:
+        amount = Decimal(str(value or 0))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"{label} must be a number, got {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"{label} must be a number, got {value!r}")
+    # Rounding fails outright for very large amounts, and they are refused anyway
+    if abs(amount) <= MONEY_MAX + CENT:
+        amount = amount.quantize(CENT)
+    return _check_money(amount, label)
+
+
+def parse_row(values):
+    """
+    Turn one row of cell values (columns A-K) into a dict of cleaned fields.
+    Returns ``None`` for rows without a parish or congregation name and raises
+    ``ValueError`` for rows whose values cannot be stored, including numbers
+    too large for their column, so one bad row never fails its whole sheet.
+    """
+    values = tuple(values)[:ROW_WIDTH]
+    values += (None,) * (ROW_WIDTH - len(values))
+
+    parish_name = _clean_name(values[0])
+    cong_name = _clean_name(values[1])
+    if not (parish_name and cong_name):
+        return None
+
+    total_col = _to_money(values[7], 'total collection')
+    banked = _to_money(values[8], 'banked')
+    return {
+        'parish_name': parish_name,
+        'cong_name': cong_name,
+        'sunday_school': _to_count(values[2], 'sunday school'),
+        'youth': _to_count(values[3], 'youth'),
+        'adults': _to_count(values[4], 'adults'),
+        'diff_abled': _to_count(values[5], 'diff abled'),
+        'total_collection': total_col,
+        'banked': banked,
+        'unbanked': _check_money(total_col - banked, 'unbanked'),
+        'remarks': str(values[10] or ''),
+    }
+
+
+def parse_sheet_rows(sheet_name, rows, errors, start_row=DATA_START_ROW):
+    """
+    Parse an iterable of row value tuples, appending one message to ``errors``
+    for every row that cannot be parsed. Returns a list of ``(row_number, fields)``.
+    """
+    parsed = []
+    for idx, values in enumerate(rows, start=start_row):
+        try:
+            fields = parse_row(values)
+        except Exception as row_err:
+            errors.append(f"Sheet '{sheet_name}', row {idx}: {str(row_err)}")
+            continue
+        if fields is not None:
+            parsed.append((idx, fields))
+    return parsed
+
+
+def resolve_hierarchy(arch_name, cong_paths):
+    """
+    Resolve ``(parish_name, cong_name)`` pairs under one archdeaconry to
+    ``(arch_id, parish_id, cong_id)`` tuples, keyed by pair.
+
+    Known paths are plain dictionary hits on the process-wide hierarchy cache;
+    anything missing is resolved (and created) with a fixed number of set-based queries.
+    """
+    cong_paths = set(cong_paths)
+    snapshot = hierarchy_cache.get()
+    ids = {path: snapshot.lookup(arch_name, *path) for path in cong_paths}
+    if all(ids.values()):
+        return ids
+
+    arch, _ = Archdeaconry.objects.get_or_create(name=arch_name)
+
+    parish_names = {parish_name for parish_name, _ in cong_paths}
+    parishes = {p.name: p.id for p in Parish.objects.filter(archdeaconry=arch, name__in=parish_names)}
+    missing = parish_names - parishes.keys()
+    if missing:
+        Parish.objects.bulk_create(
+            [Parish(archdeaconry=arch, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        parishes = {p.name: p.id for p in Parish.objects.filter(archdeaconry=arch, name__in=parish_names)}
+
+    parish_names_by_id = {pk: name for name, pk in parishes.items()}
+
+    def load_congregations():
+        queryset = Congregation.objects.filter(
+            parish_id__in=parish_names_by_id.keys(),
+            name__in={cong_name for _, cong_name in cong_paths},
+        ).values_list('id', 'name', 'parish_id')
+        return {(parish_names_by_id[parish_id], name): pk for pk, name, parish_id in queryset}
+
+    congregations = load_congregations()
+    missing = cong_paths - congregations.keys()
+    if missing:
+        Congregation.objects.bulk_create(
+            [Congregation(parish_id=parishes[parish_name], name=cong_name) for parish_name, cong_name in missing],
+            ignore_conflicts=True,
+        )
+        congregations = load_congregations()
+        # bulk_create sends no signals, so tell the cache ourselves
+        invalidate_hierarchy()
+
+    return {
+        path: (arch.id, parishes[path[0]], congregations[path])
+        for path in cong_paths
+    }
+
+
+def save_records(upload, arch_name, sheet_date, values_by_path):
+    """
+    Write one sheet's records in a single transaction: resolve the hierarchy of the
+    ``(parish_name, cong_name)`` keys of ``values_by_path`` in bulk, upsert a record
+    per key from its values with one ``INSERT ... ON CONFLICT (congregation, sunday_date)
+    DO UPDATE`` per batch, refresh the sheet's rollups and flag anomalies against the
+    congregations' baselines. Returns the number of records written.
+    """
+    if not values_by_path:
+        return 0
+
+    with transaction.atomic():
+        ids = resolve_hierarchy(arch_name, values_by_path.keys())
+        records = []
+        for path, values in values_by_path.items():
+            arch_id, parish_id, cong_id = ids[path]
+            records.append(AttendanceRecord(
+                workbook=upload,
+                archdeaconry_id=arch_id,
+                parish_id=parish_id,
+                congregation_id=cong_id,
+                sunday_date=sheet_date,
+                **{field: values[field] for field in RECORD_VALUE_FIELDS},
+            ))
+        AttendanceRecord.objects.bulk_create(
+            records,
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['congregation', 'sunday_date'],
+            update_fields=ATTENDANCE_UPDATE_FIELDS,
+        )
+        refresh_rollups(records[0].archdeaconry_id, [sheet_date])
+        detect_anomalies(records)
+    return len(records)
+
+
+def upsert_sheet(upload, arch_name, sheet_date, parsed_rows):
+    """
+    Write the parsed rows of one sheet with ``save_records``. Returns the number of records written.
+    """
+    # A congregation listed twice in a sheet keeps its last row, as update_or_create did
+    latest = {}
+    for _, fields in parsed_rows:
+        latest[(fields['parish_name'], fields['cong_name'])] = fields
+    return save_records(upload, arch_name, sheet_date, latest)
+
+
+def parse_sheet(sheet_name, rows, errors):
+    """
+    Parse one worksheet without touching the database, so it can run in a worker process.
+    Returns ``(arch_name, sheet_date, parsed_rows)``, or ``None`` for a bad sheet name.
+    """
+    try:
+        arch_name, sheet_date = parse_sheet_name(sheet_name)
+    except ValueError:
+        errors.append(f"Invalid sheet name format: '{sheet_name}'")
+        return None
+    return arch_name, sheet_date, parse_sheet_rows(sheet_name, rows, errors)
+
+
+def write_sheet(upload, sheet_name, parsed_sheet, errors):
+    """
+    Store a sheet returned by ``parse_sheet``. Returns the number of records written.
+    """
+    arch_name, sheet_date, parsed_rows = parsed_sheet
+    try:
+        return upsert_sheet(upload, arch_name, sheet_date, parsed_rows)
+    except Exception as sheet_err:
+        errors.append(f"Sheet '{sheet_name}': {str(sheet_err)}")
+        return 0
+
+
+def ingest_sheet(upload, sheet_name, rows, errors):
+    """
+    Parse and store one worksheet. ``rows`` yields the cell values of each row
+    starting at ``DATA_START_ROW``. Problems are appended to ``errors``;
+    returns ``(sheet_date, rows_written)`` or ``(None, 0)`` for a bad sheet name.
+    """
+    parsed_sheet = parse_sheet(sheet_name, rows, errors)
+    if parsed_sheet is None:
+        return None, 0
+    return parsed_sheet[1], write_sheet(upload, sheet_name, parsed_sheet, errors)
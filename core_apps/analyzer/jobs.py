@@ -0,0 +1,163 @@
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from loguru import logger
+
+from core_apps.common.concurrency import closing_connections
+
+from .models import UploadJob, UploadJobFile
+from .pipeline import ingest_workbooks, new_file_summary, register_upload
+
+# A running job whose worker has not renewed it for this long is assumed orphaned
+STALE_JOB_AFTER = timedelta(minutes=15)
+# How often a worker renews the job it runs, whatever it is busy with
+JOB_HEARTBEAT_EVERY = timedelta(minutes=1)
+
+
+def enqueue_upload(files):
+    """
+    Store the uploaded files and queue them as one UploadJob for the ingest worker.
+    """
+    with transaction.atomic():
+        job = UploadJob.objects.create()
+        for file in files:
+            upload, created, unchanged = register_upload(file)
+            job_file = UploadJobFile(
+                job=job,
+                workbook=upload,
+                file_name=file.name,
+                new_upload=created,
+            )
+            # Identical re-uploads need no work from the worker
+            if unchanged:
+                job_file.status = UploadJob.Status.DONE
+                job_file.processed = True
+                job_file.sheets_total = len(upload.sheet_hashes)
+                job_file.sheets_done = len(upload.sheet_hashes)
+                job_file.sheets = [
+                    {'sheet': sheet_name, 'rows_written': 0, 'errors': [], 'skipped': True}
+                    for sheet_name in upload.sheet_hashes
+                ]
+            job_file.save()
+        if not job.files.exclude(status=UploadJob.Status.DONE).exists():
+            job.status = UploadJob.Status.DONE
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return job
+
+
+def claim_next_job(stale_after=STALE_JOB_AFTER):
+    """
+    Atomically take the oldest pending job (or a running job whose worker went quiet).
+    ``SKIP LOCKED`` lets several workers poll the same table without a broker.
+    """
+    stale_before = timezone.now() - stale_after
+    with transaction.atomic():
+        job = (
+            UploadJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=UploadJob.Status.PENDING)
+                | Q(status=UploadJob.Status.RUNNING, updated_at__lt=stale_before)
+            )
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = UploadJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+    return job
+
+
+def touch_job(job_pk):
+    """
+    Renew a running job's ``updated_at``, which ``claim_next_job`` reads as the worker's heartbeat.
+    """
+    UploadJob.objects.filter(pk=job_pk, status=UploadJob.Status.RUNNING).update(updated_at=timezone.now())
+
+
+@contextmanager
+def job_heartbeat(job, every=JOB_HEARTBEAT_EVERY):
+    """
+    Touch ``job`` every ``every`` from a background thread while the block runs.
+    Parsing many files in the process pool or writing one very large sheet reports
+    no progress for a long time, and must not look like a dead worker meanwhile.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(every.total_seconds()):
+            try:
+                touch_job(job.pk)
+            except Exception:
+                logger.exception(f"Heartbeat of upload job {job.pk} failed")
+
+    thread = threading.Thread(target=closing_connections(beat), name=f'upload-job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    """
+    Ingest every file of a claimed job, saving per-file and per-sheet progress as it goes
+    and renewing the job's heartbeat until it is done.
+    """
+    job_files = job.files.select_related('workbook').exclude(status=UploadJob.Status.DONE)
+    try:
+        with job_heartbeat(job):
+            ingest_workbooks(job_file_entry(job, job_file) for job_file in job_files)
+    except Exception as e:
+        logger.exception(f"Upload job {job.pk} failed")
+        job.status = UploadJob.Status.FAILED
+        job.error_message = str(e)
+    else:
+        job.status = UploadJob.Status.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+    return job
+
+
+def job_file_entry(job, job_file):
+    """
+    Build the ``ingest_workbooks`` entry for one file, with hooks that save its progress.
+    """
+    file_summary = new_file_summary(job_file.file_name, job_file.new_upload)
+
+    def on_open(sheet_names):
+        job_file.status = UploadJob.Status.RUNNING
+        job_file.sheets = []
+        job_file.sheets_done = 0
+        job_file.rows_written = 0
+        job_file.sheets_total = len(sheet_names)
+        job_file.save()
+        touch_job(job.pk)
+
+    def on_sheet(sheet_name, rows_written, sheet_errors, skipped):
+        job_file.sheets.append({
+            'sheet': sheet_name,
+            'rows_written': rows_written,
+            'errors': sheet_errors,
+            'skipped': skipped,
+        })
+        job_file.sheets_done += 1
+        job_file.rows_written += rows_written
+        job_file.errors = file_summary['errors']
+        job_file.save(update_fields=['sheets', 'sheets_done', 'rows_written', 'errors', 'updated_at'])
+        touch_job(job.pk)
+
+    def on_done(summary):
+        job_file.status = UploadJob.Status.DONE
+        job_file.processed = summary['processed']
+        job_file.errors = summary['errors']
+        job_file.save()
+
+    return job_file.workbook, file_summary, {'on_open': on_open, 'on_sheet': on_sheet, 'on_done': on_done}
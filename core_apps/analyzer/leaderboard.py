@@ -0,0 +1,121 @@
+import datetime
+
+import numpy as np
+
+from .columnar import COUNT_COLUMNS, columnar_store, congregation_paths
+
+LEADERBOARD_WEEKS = 26
+LEADERBOARD_MAX_WEEKS = 520
+LEADERBOARD_LIMIT = 20
+# A line through two Sundays is exact whatever happened; ask for a few more
+LEADERBOARD_MIN_SUNDAYS = 4
+# Slopes are per week; trends are the slope as a percentage of the congregation's average
+LEADERBOARD_SORTS = ['attendance_slope', 'collection_slope', 'attendance_trend', 'collection_trend']
+
+
+def least_squares_slopes(starts, x, *ys):
+    """
+    For rows grouped into runs beginning at ``starts``, the number of rows in each
+    run and, for each of ``ys``, the slope and mean of a least-squares line
+    through ``(x, y)`` per run. Runs whose ``x`` are all equal get a NaN slope.
+    """
+    counts = np.diff(np.append(starts, len(x)))
+    sum_x = np.add.reduceat(x, starts)
+    denominator = counts * np.add.reduceat(x * x, starts) - sum_x * sum_x
+    fits = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for y in ys:
+            sum_y = np.add.reduceat(y, starts)
+            numerator = counts * np.add.reduceat(x * y, starts) - sum_x * sum_y
+            fits.append((np.where(denominator > 0, numerator / denominator, np.nan), sum_y / counts))
+    return counts, fits
+
+
+def top_k(values, ids, k, descending=True):
+    """
+    Positions of the ``k`` best ``values``, best first; ties go to the lowest id.
+    """
+    keys = -values if descending else values
+    if k < len(keys):
+        # Only the k best need sorting
+        candidates = np.argpartition(keys, k - 1)[:k]
+    else:
+        candidates = np.arange(len(keys))
+    return candidates[np.lexsort((ids[candidates], keys[candidates]))]
+
+
+def congregation_trends(selection):
+    """
+    Per congregation in ``selection``: its id, the number of Sundays it reported
+    and the slope and mean of its attendance and collection over them.
+    """
+    codes = selection.snapshot.congregation_codes[selection.rows]
+    # Stable, so each congregation's run stays in Sunday order
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1])
+    weeks = selection.column('day')[order].astype(np.float64) / 7
+    # Centred on the window so the sums of squares stay small
+    weeks -= weeks.mean()
+    attendance = sum(selection.column(name)[order].astype(np.float64) for name in COUNT_COLUMNS)
+    collection = selection.column('total_collection')[order].astype(np.float64) / 100
+    counts, ((attendance_slope, attendance_mean), (collection_slope, collection_mean)) = least_squares_slopes(
+        starts, weeks, attendance, collection
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'id': selection.snapshot.congregation_ids[codes[starts]],
+            'sundays': counts,
+            'average_attendance': attendance_mean,
+            'average_collection': collection_mean,
+            'attendance_slope': attendance_slope,
+            'collection_slope': collection_slope,
+            'attendance_trend': np.where(attendance_mean > 0, attendance_slope / attendance_mean * 100, np.nan),
+            'collection_trend': np.where(collection_mean > 0, collection_slope / collection_mean * 100, np.nan),
+        }
+
+
+def build_leaderboard(end_date, weeks=LEADERBOARD_WEEKS, sort='attendance_slope', descending=True,
+                      limit=LEADERBOARD_LIMIT, min_sundays=LEADERBOARD_MIN_SUNDAYS, archdeaconry_id=None,
+                      parish_id=None):
+    """
+    Congregations ranked by the trend of their attendance or giving over the
+    ``weeks`` weeks up to ``end_date``: the slope of a least-squares line through
+    every Sunday they reported, computed for all congregations at once from the
+    columnar store. Congregations with fewer than ``min_sundays`` Sundays are not
+    ranked. Returns ``None`` when there is no data.
+    """
+    start_date = end_date - datetime.timedelta(days=7 * weeks - 1)
+    selection = columnar_store.get().select(start_date, end_date, archdeaconry_id=archdeaconry_id, parish_id=parish_id)
+    if not selection.size:
+        return None
+
+    trends = congregation_trends(selection)
+    ranked = np.flatnonzero((trends['sundays'] >= max(min_sundays, 2)) & ~np.isnan(trends[sort]))
+    positions = ranked[top_k(trends[sort][ranked], trends['id'][ranked], limit, descending)]
+    paths = congregation_paths(trends['id'][positions])
+
+    congregations = []
+    for rank, position in enumerate(positions, start=1):
+        arch_name, parish_name, name = paths.get(int(trends['id'][position])) or (None, None, None)
+        row = {
+            'rank': rank,
+            'id': int(trends['id'][position]),
+            'name': name,
+            'parish_name': parish_name,
+            'archdeaconry_name': arch_name,
+            'sundays': int(trends['sundays'][position]),
+        }
+        for key in ['average_attendance', 'average_collection', *LEADERBOARD_SORTS]:
+            value = trends[key][position]
+            row[key] = None if np.isnan(value) else round(float(value), 2)
+        congregations.append(row)
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'weeks': weeks,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+        'ranked': len(ranked),
+        'congregations': congregations,
+    }
@@ -0,0 +1,84 @@
+import datetime
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core_apps.analyzer.analytics import DASHBOARD_SOURCES, build_dashboard, parse_sections
+from core_apps.analyzer.columnar import columnar_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Time building the dashboard with each aggregation backend against the current "
+        "database, bypassing the response cache, and report the columnar store's memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+        parser.add_argument('--start-date', help="YYYY-MM-DD (default: the endpoint's two years)")
+        parser.add_argument('--end-date', help="YYYY-MM-DD (default: today)")
+        parser.add_argument('--archdeaconry')
+        parser.add_argument('--parish')
+        parser.add_argument('--congregation')
+        parser.add_argument(
+            '--trace-memory', action='store_true',
+            help="Also report peak Python heap per build with tracemalloc (slows the runs down)",
+        )
+        parser.add_argument('--sections', help="Comma separated sections to build (default: all)")
+        parser.add_argument(
+            '--backend', action='append', choices=list(DASHBOARD_SOURCES),
+            help="Backend to time; repeat for several (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end_date = datetime.date.fromisoformat(options['end_date']) if options['end_date'] else (
+                timezone.now().date()
+            )
+            start_date = datetime.date.fromisoformat(options['start_date']) if options['start_date'] else (
+                end_date - datetime.timedelta(days=730)
+            )
+            sections = parse_sections(options['sections'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        filters = {
+            'archdeaconry_id': options['archdeaconry'],
+            'parish_id': options['parish'],
+            'congregation_id': options['congregation'],
+        }
+        backends = options['backend'] or list(DASHBOARD_SOURCES)
+
+        if 'columnar' in backends:
+            # The first request in a process pays for loading the store; report it separately
+            columnar_store.clear()
+            report = columnar_store.get().memory_report()
+            self.stdout.write(
+                f"columnar store: {report['rows']} rows loaded in {report['loaded_seconds']}s, "
+                f"{report['total_mb']} MB ({report['bytes_per_row']} bytes/row), "
+                f"budget {report['budget_mb']} MB{'' if report['within_budget'] else ' EXCEEDED'}"
+            )
+            for column in report['columns']:
+                self.stdout.write(f"  {column['column']:<20} {column['dtype']:<8} {column['bytes'] / 1024:,.1f} KiB")
+
+        for backend in backends:
+            timings, peaks = [], []
+            for _ in range(options['runs']):
+                if options['trace_memory']:
+                    tracemalloc.start()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    data = build_dashboard(DASHBOARD_SOURCES[backend](start_date, end_date, **filters), sections)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if options['trace_memory']:
+                    peaks.append(tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+                    tracemalloc.stop()
+            self.stdout.write(
+                f"{backend}: {'no data' if data is None else 'ok'}, median {statistics.median(timings):.2f} ms, "
+                f"min {min(timings):.2f} ms, {len(queries.captured_queries)} queries"
+                + (f", peak heap {max(peaks):.1f} MB" if peaks else '')
+            )
@@ -0,0 +1,158 @@
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from core_apps.analyzer.synthetic import SyntheticDiocese
+from core_apps.analyzer.views import WorkbookUploadView
+from core_apps.common.hierarchy import hierarchy_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark workbook ingestion: generate synthetic workbooks, post them to "
+        "upload-workbook/ and report rows/s, query count and, with --trace-memory, peak heap per run. "
+        "Each run is rolled back unless --keep-data is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archdeaconries', type=int, default=4)
+        parser.add_argument('--parishes', type=int, default=5)
+        parser.add_argument('--congregations', type=int, default=6, help="Congregations per parish")
+        parser.add_argument('--sundays', type=int, default=4, help="Sheets per workbook")
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--workers', type=int, default=settings.INGEST_PARSE_WORKERS,
+            help="INGEST_PARSE_WORKERS to use for the runs",
+        )
+        parser.add_argument(
+            '--trace-memory', action='store_true',
+            help="Also report each run's peak Python heap with tracemalloc (slows the runs down)",
+        )
+        parser.add_argument('--keep-data', action='store_true', help="Commit the imported rows")
+        parser.add_argument(
+            '--output', default='ingestion_benchmarks.json',
+            help="JSON file the results are appended to (default: ingestion_benchmarks.json)",
+        )
+
+    def handle(self, *args, **options):
+        diocese = SyntheticDiocese(
+            archdeaconries=options['archdeaconries'],
+            parishes=options['parishes'],
+            congregations=options['congregations'],
+            sundays=options['sundays'],
+            seed=options['seed'],
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            self.stdout.write(f"Generating {diocese.row_count} rows in {options['archdeaconries']} workbook(s)...")
+            paths = diocese.write_workbooks(directory)
+            files = []
+            for path in paths:
+                with open(path, 'rb') as fh:
+                    files.append((os.path.basename(path), fh.read()))
+
+            runs = []
+            for run in range(options['runs']):
+                result = self.run_once(files, options)
+                result['rows'] = diocese.row_count
+                result['rows_per_second'] = round(diocese.row_count / result['seconds'], 1)
+                runs.append(result)
+                self.stdout.write(
+                    f"Run {run + 1}: {result['seconds']:.2f}s, {result['rows_per_second']:.0f} rows/s, "
+                    f"{result['queries']} queries"
+                    + (f", peak heap {result['peak_traced_mb']} MB" if 'peak_traced_mb' in result else '')
+                )
+            # The high-water mark of the whole process, generation and every run included
+            process_peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            self.stdout.write(f"Process peak RSS over all runs: {process_peak_rss_mb} MB")
+
+        record = {
+            'timestamp': timezone.now().isoformat(),
+            'commit': self.git_commit(),
+            'database': connection.vendor,
+            'params': {
+                key: options[key]
+                for key in ('archdeaconries', 'parishes', 'congregations', 'sundays', 'seed', 'workers')
+            },
+            'runs': runs,
+            # ru_maxrss is in kilobytes on Linux; not attributable to any one run
+            'process_peak_rss_mb': process_peak_rss_mb,
+            'best_rows_per_second': max(r['rows_per_second'] for r in runs) if runs else None,
+        }
+        self.save(options['output'], record)
+        self.stdout.write(self.style.SUCCESS(f"Results appended to {options['output']}"))
+
+    def run_once(self, files, options):
+        request = APIRequestFactory().post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile(name, content) for name, content in files]},
+            format='multipart',
+        )
+        view = WorkbookUploadView.as_view()
+        # Rolled-back runs leave ids behind in the in-process cache
+        hierarchy_cache.clear()
+
+        overrides = {'INGEST_PARSE_WORKERS': options['workers']}
+        media_dir = None
+        if not options['keep_data']:
+            # Stored workbooks would outlive the rolled-back rows
+            media_dir = tempfile.TemporaryDirectory()
+            overrides['MEDIA_ROOT'] = media_dir.name
+
+        if options['trace_memory']:
+            tracemalloc.start()
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = view(request)
+                    seconds = time.perf_counter() - started
+                if not options['keep_data']:
+                    transaction.set_rollback(True)
+        finally:
+            # The request handler normally closes spooled uploads after the response
+            for uploaded in request.FILES.getlist('files'):
+                uploaded.close()
+            if media_dir:
+                media_dir.cleanup()
+
+        result = {
+            'seconds': round(seconds, 3),
+            'queries': len(queries.captured_queries),
+            'errors': sum(len(item['errors']) for item in response.data),
+        }
+        if options['trace_memory']:
+            # Started for this run only, so the peak is this run's
+            result['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            tracemalloc.stop()
+        return result
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def save(self, output, record):
+        history = []
+        if os.path.exists(output):
+            with open(output) as fh:
+                history = json.load(fh)
+        history.append(record)
+        with open(output, 'w') as fh:
+            json.dump(history, fh, indent=2)
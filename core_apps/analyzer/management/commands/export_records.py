@@ -0,0 +1,39 @@
+import shutil
+import time
+
+from django.core.management.base import BaseCommand
+
+from core_apps.analyzer.exports import ARROW_FORMATS, arrow_export
+from core_apps.analyzer.views import records_filters, records_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Export attendance records with their hierarchy names as Parquet or an Arrow IPC "
+        "file. The export is stored like records/export/ stores it, so the endpoint can "
+        "serve it until the data changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(ARROW_FORMATS), default='parquet')
+        parser.add_argument('--archdeaconry')
+        parser.add_argument('--parish')
+        parser.add_argument('--congregation')
+        parser.add_argument('--start-date', help="YYYY-MM-DD")
+        parser.add_argument('--end-date', help="YYYY-MM-DD")
+        parser.add_argument('--output', help="Also copy the export to this path")
+
+    def handle(self, *args, **options):
+        params = {
+            name: options[name]
+            for name in ('archdeaconry', 'parish', 'congregation', 'start_date', 'end_date')
+            if options[name]
+        }
+        started = time.perf_counter()
+        with arrow_export(records_queryset(params), records_filters(params), options['format']) as export:
+            path = export.name
+            if options['output']:
+                with open(options['output'], 'wb') as output:
+                    shutil.copyfileobj(export, output)
+                path = options['output']
+        self.stdout.write(self.style.SUCCESS(f"Exported to {path} in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,100 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core_apps.analyzer.copy_import import StagingImporter
+from core_apps.analyzer.pipeline import (
+    ingest_workbooks, new_file_summary, register_upload, unchanged_file_summary,
+)
+from core_apps.attendance.rollups import invalidate_attendance
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load a directory of attendance workbooks. Rows are parsed exactly like "
+        "upload-workbook/, loaded into a staging table with COPY and merged in one statement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory containing .xlsx workbooks")
+        parser.add_argument(
+            '--recursive', action='store_true',
+            help="Also import workbooks from subdirectories",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.INGEST_PARSE_WORKERS,
+            help="Processes used to parse workbooks (default: INGEST_PARSE_WORKERS)",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f"'{directory}' is not a directory")
+        pattern = '**/*.xlsx' if options['recursive'] else '*.xlsx'
+        paths = sorted(p for p in directory.glob(pattern) if not p.name.startswith('~$'))
+        if not paths:
+            raise CommandError(f"No .xlsx workbooks found in '{directory}'")
+
+        use_copy = connection.vendor == 'postgresql'
+        if not use_copy:
+            self.stdout.write(self.style.WARNING(
+                f"COPY needs PostgreSQL; falling back to bulk upserts on {connection.vendor}"
+            ))
+
+        started = time.perf_counter()
+        summaries = []
+        unchanged_files = 0
+        with transaction.atomic():
+            # Everything commits at once, however long ago its rows were stamped
+            invalidate_attendance(reload=True)
+            entries = []
+            for path in paths:
+                # With --recursive, folders often hold workbooks of the same name
+                file_name = path.relative_to(directory).as_posix()
+                with path.open('rb') as fh:
+                    upload, created, unchanged = register_upload(File(fh, name=file_name))
+                if unchanged:
+                    unchanged_files += 1
+                    summaries.append(unchanged_file_summary(upload))
+                    continue
+                file_summary = new_file_summary(file_name, created)
+                summaries.append(file_summary)
+                entries.append((upload, file_summary, {}))
+
+            if use_copy:
+                with StagingImporter() as importer:
+                    ingest_workbooks(entries, workers=options['workers'], writer=importer.stage_sheet)
+                    rows = importer.staged
+                    merged = importer.merge()
+            else:
+                rows = 0
+
+                def count_sheet(sheet_name, rows_written, sheet_errors, skipped):
+                    nonlocal rows
+                    rows += rows_written
+
+                for _, _, hooks in entries:
+                    hooks['on_sheet'] = count_sheet
+                ingest_workbooks(entries, workers=options['workers'])
+                merged = rows
+
+        elapsed = time.perf_counter() - started
+
+        for file_summary in summaries:
+            if file_summary['errors']:
+                self.stdout.write(self.style.WARNING(
+                    f"{file_summary['file']}: {len(file_summary['errors'])} error(s)"
+                ))
+                for error in file_summary['errors']:
+                    self.stdout.write(f"  {error}")
+
+        skipped_sheets = sum(len(s['skipped_sheets']) for s in summaries)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows} rows ({merged} records merged) from {len(paths)} workbook(s) "
+            f"in {elapsed:.1f}s: {rows / elapsed if elapsed else 0:.0f} rows/s. "
+            f"Skipped {unchanged_files} unchanged workbook(s) and {skipped_sheets} unchanged sheet(s)."
+        ))
@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from loguru import logger
+
+from core_apps.analyzer.jobs import JOB_HEARTBEAT_EVERY, STALE_JOB_AFTER, claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued workbook upload jobs, polling the job table for new work."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to sleep when the queue is empty (default: 2)",
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=int(STALE_JOB_AFTER.total_seconds()),
+            help="Reclaim running jobs whose worker has not renewed them for this many seconds "
+                 f"(keep it well above the {int(JOB_HEARTBEAT_EVERY.total_seconds())} second heartbeat)",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Drain the queue and exit instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        self.stdout.write("Ingest worker started")
+        while True:
+            job = claim_next_job(stale_after=stale_after)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            logger.info(f"Processing upload job {job.pk}")
+            run_job(job)
+            self.stdout.write(f"Upload job {job.pk} finished: {job.status}")
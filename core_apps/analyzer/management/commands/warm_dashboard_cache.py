@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core_apps.analyzer.analytics import DASHBOARD_SOURCES
+from core_apps.analyzer.warming import WARM_SCOPES, WARM_WINDOWS, warm_combinations, warm_dashboard_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute the dashboard/ responses for the common filter combinations so the "
+        "first request after an upload is served from the cache. Defaults come from the "
+        "DASHBOARD_WARM_* settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scope', action='append', choices=WARM_SCOPES,
+            help="Filters to warm; repeat for several (default: DASHBOARD_WARM_SCOPES)",
+        )
+        parser.add_argument(
+            '--window', action='append', choices=WARM_WINDOWS,
+            help="Date ranges to warm; repeat for several (default: DASHBOARD_WARM_WINDOWS)",
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help="Most combinations to warm, coarsest first (default: DASHBOARD_WARM_MAX_COMBINATIONS)",
+        )
+        parser.add_argument('--workers', type=int, help="Threads to use (default: DASHBOARD_WARM_WORKERS)")
+        parser.add_argument('--backend', choices=list(DASHBOARD_SOURCES))
+        parser.add_argument('--force', action='store_true', help="Rebuild entries that are already cached")
+
+    def handle(self, *args, **options):
+        try:
+            combinations = warm_combinations(options['scope'], options['window'], options['limit'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        summary = warm_dashboard_cache(
+            combinations, workers=options['workers'], backend=options['backend'], force=options['force'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {summary['combinations']} combination(s) in {summary['seconds']}s: "
+            f"{summary['built']} built, {summary['cached']} already cached, {summary['empty']} without data, "
+            f"{summary['failed']} failed."
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedworkbook',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadedworkbook',
+            name='sheet_hashes',
+            field=models.JSONField(blank=True, default=dict, help_text="SHA-256 of each cleanly imported sheet's values, by sheet name"),
+        ),
+    ]
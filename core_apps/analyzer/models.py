@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from core_apps.common.models import TimeStampedModel
 
@@ -10,9 +12,79 @@ class UploadedWorkbook(TimeStampedModel):
     sheet_date = models.DateField(help_text="Sunday date parsed from filename or sheet name",null=True)
     processed = models.BooleanField(default=False)
     error_message = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the file")
+    sheet_hashes = models.JSONField(
+        default=dict, blank=True, help_text="SHA-256 of each cleanly imported sheet's values, by sheet name"
+    )
 
     class Meta:
         ordering = ['-sheet_date', '-created_at']
 
     def __str__(self):
-        return f"Workbook {self.file.name} ({self.sheet_date})"
\ No newline at end of file
+        return f"Workbook {self.file.name} ({self.sheet_date})"
+
+
+class UploadJob(TimeStampedModel):
+    """
+    A batch of uploaded workbooks waiting to be ingested by ``run_ingest_worker``.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload job {self.pk} ({self.status})"
+
+
+class UploadJobFile(TimeStampedModel):
+    """
+    Progress of one workbook within an UploadJob, including a per-sheet breakdown.
+    """
+    job = models.ForeignKey(UploadJob, related_name='files', on_delete=models.CASCADE)
+    workbook = models.ForeignKey(UploadedWorkbook, related_name='job_files', on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=UploadJob.Status.choices, default=UploadJob.Status.PENDING)
+    new_upload = models.BooleanField(default=False)
+    processed = models.BooleanField(default=False)
+    sheets_total = models.PositiveIntegerField(default=0)
+    sheets_done = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    sheets = models.JSONField(default=list, blank=True, help_text="One entry per processed sheet")
+
+    class Meta:
+        ordering = ['job', 'id']
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
+
+
+class ChunkedUpload(TimeStampedModel):
+    """
+    A workbook being uploaded in numbered chunks. Chunks live on disk under
+    ``CHUNKED_UPLOAD_DIR/<id>/`` until the upload is finalized.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    total_chunks = models.PositiveIntegerField()
+    total_size = models.PositiveBigIntegerField(null=True, blank=True)
+    finalized_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Chunked upload {self.file_name} ({self.id})"
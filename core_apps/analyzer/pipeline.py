@@ -0,0 +1,277 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.utils import timezone
+
+from .ingestion import parse_sheet, write_sheet
+from .models import UploadedWorkbook
+from .readers import file_sha256, hash_rows, iter_workbook_sheets, open_workbook, workbook_source
+from .tabular import is_tabular, parse_table, write_table_sheet
+from .warming import schedule_dashboard_warming
+
+
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+
+def parse_pool(workers):
+    """
+    The process pool of ``workers`` parsers, created on first use and kept for the
+    life of this process, so an upload does not pay for starting processes and
+    ``django.setup()`` in each. Workers come from a fork server (or are spawned where
+    there is none): forking a web worker whose warming threads may hold a lock is unsafe.
+    """
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        # A worker that died (e.g. killed for memory) breaks its pool for good
+        if pool is None or pool._broken:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = _parse_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(method), initializer=django.setup,
+            )
+        return pool
+
+
+def register_upload(file):
+    """
+    Store an uploaded file as an UploadedWorkbook, replacing the stored file when
+    a workbook with the same name was uploaded before.
+
+    Returns ``(upload, created, unchanged)``; ``unchanged`` means the same content
+    was already imported cleanly, so the file is not stored or parsed again.
+    """
+    content_hash = file_sha256(file)
+    upload, created = UploadedWorkbook.objects.get_or_create(
+        file_name=file.name,
+        defaults={'file': file, 'content_hash': content_hash}
+    )
+    if created:
+        return upload, True, False
+    if upload.processed and upload.content_hash == content_hash:
+        return upload, False, True
+
+    upload.file = file
+    upload.content_hash = content_hash
+    upload.processed = False
+    upload.save()
+    return upload, False, False
+
+
+def new_file_summary(file_name, new_upload=False):
+    return {
+        'file': file_name,
+        'new_upload': new_upload,
+        'processed': False,
+        'errors': [],
+        'skipped_sheets': []
+    }
+
+
+def unchanged_file_summary(upload):
+    """
+    Summary of a re-upload identical to an already imported workbook.
+    """
+    file_summary = new_file_summary(upload.file_name)
+    file_summary['processed'] = True
+    file_summary['skipped_sheets'] = list(upload.sheet_hashes)
+    return file_summary
+
+
+def iter_parsed_sheets(wb):
+    """
+    Lazily parse each sheet of an open workbook, yielding
+    ``(sheet_name, parsed_sheet, sheet_errors, sheet_hash)``.
+    """
+    for sheet_name, rows in iter_workbook_sheets(wb):
+        sheet_errors = []
+        digest = hashlib.sha256()
+        parsed_sheet = parse_sheet(sheet_name, hash_rows(rows, digest), sheet_errors)
+        yield sheet_name, parsed_sheet, sheet_errors, digest.hexdigest()
+
+
+def parse_workbook(source):
+    """
+    Parse a whole workbook into plain Python values without touching the database.
+    Used as the process pool task of parallel ingestion, so it must stay picklable.
+    """
+    try:
+        wb = open_workbook(source)
+    except Exception as e:
+        return {'error': f"Failed to read file: {str(e)}", 'sheet_names': [], 'sheets': []}
+    try:
+        return {'error': None, 'sheet_names': wb.sheetnames, 'sheets': list(iter_parsed_sheets(wb))}
+    finally:
+        wb.close()
+
+
+def parse_upload(source, file_name):
+    """
+    Parse an upload with the parser its extension calls for: CSV and Parquet
+    exports are read column-wise by ``parse_table``, anything else as a workbook.
+    """
+    if is_tabular(file_name):
+        return parse_table(source, file_name)
+    return parse_workbook(source)
+
+
+def parse_uploads(files, workers=None):
+    """
+    Parse uploaded files without storing them, in a process pool when
+    ``workers`` (default INGEST_PARSE_WORKERS) allows. Returns one ``parse_upload``
+    result per file, in order.
+    """
+    if workers is None:
+        workers = settings.INGEST_PARSE_WORKERS
+    sources = [workbook_source(file) for file in files]
+    file_names = [file.name for file in files]
+    if workers <= 1 or len(files) <= 1 or not all(isinstance(s, str) for s in sources):
+        return [parse_upload(source, file_name) for source, file_name in zip(sources, file_names)]
+    return list(parse_pool(workers).map(parse_upload, sources, file_names))
+
+
+def ingest_workbook(upload, file_summary, on_open=None, on_sheet=None, on_done=None, parsed=None, writer=None):
+    """
+    Ingest every sheet of a stored workbook and finalize the UploadedWorkbook.
+
+    Sheets are streamed from storage unless ``parsed`` holds the result of
+    ``parse_upload`` for this upload, in which case only the writes happen here.
+    CSV and Parquet exports are always parsed whole, as one pseudo-sheet per
+    archdeaconry and Sunday.
+    ``on_open(sheet_names)`` is called once the workbook is open,
+    ``on_sheet(sheet_name, rows_written, sheet_errors, skipped)`` after each sheet and
+    ``on_done(file_summary)`` at the end, so callers can report progress.
+    ``writer`` stores one parsed sheet and defaults to the bulk upsert of ``write_sheet``
+    (``write_table_sheet`` for exports). Returns ``file_summary``.
+    """
+    hooks = {'open': on_open, 'sheet': on_sheet, 'done': on_done}
+    for event, args in iter_ingest_workbook(upload, file_summary, parsed=parsed, writer=writer):
+        if hooks[event]:
+            hooks[event](*args)
+    return file_summary
+
+
+def iter_ingest_workbook(upload, file_summary, parsed=None, writer=None):
+    """
+    Generator form of ``ingest_workbook``: the work happens as it is iterated, and
+    each hook call is yielded as an ``(event, args)`` pair instead, with ``event``
+    one of ``'open'``, ``'sheet'`` and ``'done'``.
+    """
+    tabular = is_tabular(upload.file_name)
+    if writer is None:
+        writer = write_table_sheet if tabular else write_sheet
+    if parsed is None and tabular:
+        parsed = parse_table(workbook_source(upload.file), upload.file_name)
+
+    if parsed is None:
+        # The spooled upload was moved into storage on save; stream it from there
+        try:
+            wb = open_workbook(workbook_source(upload.file))
+        except Exception as e:
+            file_summary['errors'].append(f"Failed to read file: {str(e)}")
+        else:
+            try:
+                yield from write_workbook(upload, file_summary, wb.sheetnames, iter_parsed_sheets(wb), writer)
+            finally:
+                wb.close()
+    elif parsed['error']:
+        file_summary['errors'].append(parsed['error'])
+    else:
+        yield from write_workbook(upload, file_summary, parsed['sheet_names'], parsed['sheets'], writer)
+
+    yield 'done', (file_summary,)
+
+
+def write_workbook(upload, file_summary, sheet_names, sheets, writer=write_sheet):
+    """
+    Write parsed sheets and finalize the upload, yielding ``('open', ...)`` and
+    one ``('sheet', ...)`` event per sheet as it goes.
+    """
+    errors = file_summary['errors']
+    previous_hashes = upload.sheet_hashes or {}
+    sheet_hashes = {}
+    sheet_date = None
+
+    yield 'open', (sheet_names,)
+
+    # Each changed sheet is written in one transaction; unchanged sheets are skipped
+    for sheet_name, parsed_sheet, sheet_errors, sheet_hash in sheets:
+        written = 0
+        skipped = False
+        if parsed_sheet is not None:
+            sheet_date = parsed_sheet[1]
+            if not sheet_errors and previous_hashes.get(sheet_name) == sheet_hash:
+                skipped = True
+                file_summary['skipped_sheets'].append(sheet_name)
+            else:
+                written = writer(upload, sheet_name, parsed_sheet, sheet_errors)
+            # Only a cleanly imported sheet may be skipped next time
+            if not sheet_errors:
+                sheet_hashes[sheet_name] = sheet_hash
+        errors.extend(sheet_errors)
+        yield 'sheet', (sheet_name, written, sheet_errors, skipped)
+
+    # Finalize upload record
+    upload.sheet_hashes = sheet_hashes
+    upload.sheet_date = sheet_date or timezone.now().date()
+    # Only set upload.processed=True if there were no errors
+    upload.processed = len(errors) == 0
+    upload.save()
+
+    # Mark processed in summary only if no errors
+    file_summary['processed'] = upload.processed
+
+
+def ingest_workbooks(entries, workers=None, writer=None):
+    """
+    Ingest a batch of ``(upload, file_summary, hooks)`` entries, where ``hooks``
+    holds optional ``on_open``/``on_sheet``/``on_done`` callbacks for ``ingest_workbook``.
+
+    With more than one worker, workbooks are parsed concurrently in a process
+    pool and the parsed sheets are written back in upload order from this process,
+    so database writes stay on one connection and in a predictable order.
+    ``writer`` is passed through to ``ingest_workbook``.
+    """
+    entries = list(entries)
+    for index, event, args in iter_ingest_workbooks(entries, workers=workers, writer=writer):
+        hook = entries[index][2].get(f'on_{event}')
+        if hook:
+            hook(*args)
+    return [file_summary for _, file_summary, _ in entries]
+
+
+def iter_ingest_workbooks(entries, workers=None, writer=None):
+    """
+    Generator form of ``ingest_workbooks`` yielding ``(entry_index, event, args)``
+    as each workbook is opened, each sheet written and each workbook finished.
+    The hooks of the entries are not called. When the batch ends, or the caller
+    stops iterating (a streaming client that disconnects), the dashboard cache
+    is warmed in the background for whatever was committed.
+    """
+    try:
+        yield from _iter_ingest_workbooks(entries, workers, writer)
+    finally:
+        schedule_dashboard_warming()
+
+
+def _iter_ingest_workbooks(entries, workers, writer):
+    entries = list(entries)
+    if workers is None:
+        workers = settings.INGEST_PARSE_WORKERS
+    sources = [workbook_source(upload.file) for upload, _, _ in entries]
+
+    # Only files with a path on disk can be handed to another process
+    if workers <= 1 or len(entries) <= 1 or not all(isinstance(s, str) for s in sources):
+        for index, (upload, file_summary, _) in enumerate(entries):
+            for event, args in iter_ingest_workbook(upload, file_summary, writer=writer):
+                yield index, event, args
+        return
+
+    file_names = [upload.file_name for upload, _, _ in entries]
+    results = parse_pool(workers).map(parse_upload, sources, file_names)
+    for index, ((upload, file_summary, _), parsed) in enumerate(zip(entries, results)):
+        for event, args in iter_ingest_workbook(upload, file_summary, parsed=parsed, writer=writer):
+            yield index, event, args
@@ -0,0 +1,64 @@
+import hashlib
+
+import openpyxl
+
+from .ingestion import DATA_START_ROW
+
+
+def workbook_source(file):
+    """
+    Return something openpyxl can open without copying the upload into memory:
+    the path of a spooled upload or of a stored ``FieldFile``, else the file itself.
+    """
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    try:
+        return file.path
+    except (AttributeError, NotImplementedError):
+        pass
+    file.seek(0)
+    return file
+
+
+def file_sha256(file):
+    """
+    SHA-256 hex digest of an uploaded file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_rows(rows, digest):
+    """
+    Pass rows through unchanged while feeding their values into ``digest``.
+    """
+    for values in rows:
+        digest.update(repr(values).encode())
+        yield values
+
+
+def open_workbook(source):
+    """
+    Open a workbook in streaming mode. Read-only workbooks parse each sheet's XML
+    lazily while it is iterated, so memory stays flat however many rows there are.
+    ``data_only`` returns the cached result of formula cells rather than the formula.
+    The caller must ``close()`` the workbook to release the underlying file.
+    """
+    return openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+
+def iter_sheet_rows(ws, min_row=DATA_START_ROW):
+    """
+    Lazily yield the cell values of each row as a tuple, starting at ``min_row``.
+    """
+    return ws.iter_rows(min_row=min_row, values_only=True)
+
+
+def iter_workbook_sheets(wb, min_row=DATA_START_ROW):
+    """
+    Yield ``(sheet_name, rows)`` for every sheet, where ``rows`` is a lazy row generator.
+    """
+    for ws in wb.worksheets:
+        yield ws.title, iter_sheet_rows(ws, min_row=min_row)
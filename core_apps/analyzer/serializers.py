@@ -1,4 +1,9 @@
 from rest_framework import serializers
+from .models import UploadJob, UploadJobFile, ChunkedUpload
+from .tabular import TABULAR_EXTENSIONS
+
+UPLOAD_EXTENSIONS = ('.xlsx',) + TABULAR_EXTENSIONS
+UPLOAD_EXTENSIONS_MESSAGE = "Only .xlsx workbooks and .csv or .parquet exports are accepted."
 
 class WorkbookUploadSerializer(serializers.Serializer):
     files = serializers.ListField(
@@ -6,8 +11,40 @@ class WorkbookUploadSerializer(serializers.Serializer):
         allow_empty=False
     )
 
-    def validate_file(self, value):
-        name = value.name.lower()
-        if not name.endswith('.xlsx'):
-            raise serializers.ValidationError("Only .xlsx Excel files are accepted.")
-        return value
\ No newline at end of file
+    def validate_files(self, value):
+        for file in value:
+            if not file.name.lower().endswith(UPLOAD_EXTENSIONS):
+                raise serializers.ValidationError(UPLOAD_EXTENSIONS_MESSAGE)
+        return value
+
+
+class ChunkedUploadInitSerializer(serializers.ModelSerializer):
+    total_chunks = serializers.IntegerField(min_value=1, max_value=100000)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ('file_name', 'total_chunks', 'total_size')
+
+    def validate_file_name(self, value):
+        if not value.lower().endswith(UPLOAD_EXTENSIONS):
+            raise serializers.ValidationError(UPLOAD_EXTENSIONS_MESSAGE)
+        return value
+
+
+class UploadJobFileSerializer(serializers.ModelSerializer):
+    file = serializers.CharField(source='file_name')
+
+    class Meta:
+        model = UploadJobFile
+        fields = (
+            'file', 'workbook', 'status', 'new_upload', 'processed',
+            'sheets_total', 'sheets_done', 'rows_written', 'errors', 'sheets',
+        )
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    files = UploadJobFileSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = UploadJob
+        fields = ('id', 'status', 'created_at', 'started_at', 'finished_at', 'error_message', 'files')
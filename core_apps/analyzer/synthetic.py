@@ -0,0 +1,88 @@
+import datetime
+import os
+import random
+
+import openpyxl
+
+from .ingestion import DATA_START_ROW, SHEET_DATE_FORMAT
+
+HEADER_ROW = DATA_START_ROW - 1
+COLUMN_HEADERS = [
+    'PARISH', 'CONGREGATION', 'SUNDAY SCHOOL', 'YOUTH', 'ADULTS', 'DIFF. ABLED',
+    'TOTAL ATTENDANCE', 'TOTAL COLLECTION', 'BANKED', 'UNBANKED', 'REMARKS',
+]
+SYLLABLES = ['ki', 'ri', 'nya', 'ga', 'mu', 'tu', 'gu', 'ba', 'cho', 'ka', 'ndi', 'ne', 'thi', 'ru', 'ma', 'we']
+
+
+class SyntheticDiocese:
+    """
+    A randomly named diocese of ``archdeaconries x parishes x congregations``
+    that can be written out as workbooks in the layout ``upload-workbook/`` expects:
+    one workbook per archdeaconry, one ``ARCH-dd-mm-yy`` sheet per Sunday,
+    column headers on row 7 and one congregation per row from row 8, columns A-K.
+    """
+    def __init__(self, archdeaconries=4, parishes=5, congregations=6, sundays=4,
+                 first_sunday=datetime.date(2025, 1, 5), seed=0):
+        self.random = random.Random(seed)
+        self.sundays = [first_sunday + datetime.timedelta(weeks=week) for week in range(sundays)]
+        used = set()
+        self.tree = {}
+        for _ in range(archdeaconries):
+            arch = self._unique_name(used).upper()
+            self.tree[arch] = {
+                self._unique_name(used): [self._unique_name(used) for _ in range(congregations)]
+                for _ in range(parishes)
+            }
+
+    @property
+    def row_count(self):
+        """
+        Number of attendance rows across all generated workbooks.
+        """
+        per_sunday = sum(len(congs) for parishes in self.tree.values() for congs in parishes.values())
+        return per_sunday * len(self.sundays)
+
+    def _unique_name(self, used):
+        while True:
+            name = ''.join(self.random.choice(SYLLABLES) for _ in range(self.random.randint(2, 4))).capitalize()
+            if name not in used:
+                used.add(name)
+                return name
+
+    def _row(self, parish, cong):
+        sunday_school = self.random.randint(0, 120)
+        youth = self.random.randint(0, 80)
+        adults = self.random.randint(5, 300)
+        diff_abled = self.random.randint(0, 5)
+        total = round(self.random.uniform(500, 60000), 2)
+        banked = round(total * self.random.uniform(0.5, 1), 2)
+        return [
+            parish, cong, sunday_school, youth, adults, diff_abled,
+            sunday_school + youth + adults + diff_abled,
+            total, banked, round(total - banked, 2), '',
+        ]
+
+    def write_workbook(self, arch, path):
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        for sunday in self.sundays:
+            ws = wb.create_sheet(f"{arch}-{sunday.strftime(SHEET_DATE_FORMAT)}")
+            ws.cell(row=1, column=1, value='ACK DIOCESE OF KIRINYAGA')
+            ws.cell(row=3, column=1, value=f"{arch} ARCHDEACONRY - {sunday.isoformat()}")
+            for col, header in enumerate(COLUMN_HEADERS, start=1):
+                ws.cell(row=HEADER_ROW, column=col, value=header)
+            for parish, congs in self.tree[arch].items():
+                for cong in congs:
+                    ws.append(self._row(parish, cong))
+        wb.save(path)
+
+    def write_workbooks(self, directory):
+        """
+        Write one workbook per archdeaconry into ``directory`` and return their paths.
+        """
+        paths = []
+        for arch in self.tree:
+            path = os.path.join(directory, f"{arch.lower()}.xlsx")
+            self.write_workbook(arch, path)
+            paths.append(path)
+        return paths
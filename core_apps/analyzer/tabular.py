@@ -0,0 +1,232 @@
+import hashlib
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from core_apps.common.hierarchy import smart_title
+
+from .ingestion import (
+    COUNT_MAX, MONEY_MAX, NAME_MAX_LENGTH, RECORD_VALUE_FIELDS, SHEET_DATE_FORMAT, save_records,
+)
+
+TABULAR_EXTENSIONS = ('.csv', '.parquet')
+# Flat exports carry the archdeaconry and Sunday on every row instead of in the sheet name
+TABLE_COLUMNS = [
+    'archdeaconry', 'sunday_date', 'parish', 'congregation',
+    'sunday_school', 'youth', 'adults', 'diff_abled',
+    'total_collection', 'banked', 'remarks',
+]
+COUNT_COLUMNS = ['sunday_school', 'youth', 'adults', 'diff_abled']
+MONEY_COLUMNS = ['total_collection', 'banked']
+AMOUNT_COLUMNS = MONEY_COLUMNS + ['unbanked']
+OPTIONAL_COLUMNS = {'remarks': ''}
+
+
+def is_tabular(file_name):
+    return file_name.lower().endswith(TABULAR_EXTENSIONS)
+
+
+def read_table(source, file_name):
+    """
+    Read a CSV or Parquet export into a DataFrame. CSV cells are read as text
+    so that bad values can be reported exactly as they appear in the file.
+    """
+    if file_name.lower().endswith('.parquet'):
+        return pd.read_parquet(source)
+    return pd.read_csv(source, dtype=str, keep_default_na=False, skipinitialspace=True)
+
+
+def _column_key(name):
+    return '_'.join(str(name).strip().lower().replace('.', ' ').split())
+
+
+def _title_names(values):
+    # Names repeat on every Sunday, so smart_title runs once per distinct name
+    codes, uniques = pd.factorize(values.fillna('').astype(str).str.strip())
+    titled = np.array([smart_title(name) for name in uniques], dtype=object)
+    return pd.Series(titled[codes] if len(uniques) else '', index=values.index, dtype=object)
+
+
+def _numbers(values):
+    """
+    Coerce a column to finite floats. Blank cells become 0, as do invalid ones,
+    which are flagged in ``invalid_mask``; returns ``(numbers, invalid_mask)``.
+    """
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        text = values.fillna('').astype(str).str.strip()
+        blank = text.eq('')
+        text = text.where(~blank, '0')
+        try:
+            # Clean columns convert in one go; only dirty ones pay for coercion
+            numbers = text.astype('float64')
+        except ValueError:
+            numbers = pd.to_numeric(text, errors='coerce')
+    else:
+        blank = values.isna()
+        numbers = pd.to_numeric(values, errors='coerce')
+    numbers = numbers.astype(float)
+    # 'inf' and 'nan' parse as floats but are no more a number of people or shillings than 'lots'
+    invalid = ~np.isfinite(numbers) & ~blank
+    return numbers.where(np.isfinite(numbers), 0.0), invalid
+
+
+def sheet_name_for(arch_name, sheet_date):
+    return f"{arch_name}-{sheet_date.strftime(SHEET_DATE_FORMAT)}"
+
+
+def normalize_table(frame, first_row=2):
+    """
+    Clean an exported table with column-at-a-time operations, mirroring ``parse_row``:
+    names are title-cased, blank counts and amounts become zero and
+    ``unbanked = total_collection - banked``. ``first_row`` is the file row number of
+    the first data row and is only used in messages.
+
+    Returns ``(rows, row_errors, file_errors)`` where ``rows`` holds the valid rows
+    and ``row_errors`` maps each ``ARCH-dd-mm-yy`` sheet name to the messages of its
+    rejected rows.
+    """
+    frame = frame.rename(columns=_column_key)
+    missing = [c for c in TABLE_COLUMNS if c not in frame.columns and c not in OPTIONAL_COLUMNS]
+    if missing:
+        return None, {}, [f"Missing column(s): {', '.join(missing)}"]
+    for column, default in OPTIONAL_COLUMNS.items():
+        if column not in frame.columns:
+            frame[column] = default
+
+    frame = frame.reset_index(drop=True)
+    row_numbers = pd.Series(np.arange(first_row, first_row + len(frame)), index=frame.index)
+    rows = pd.DataFrame({
+        'row': row_numbers,
+        'arch_name': frame['archdeaconry'].fillna('').astype(str).str.strip().str.upper(),
+        'parish_name': _title_names(frame['parish']),
+        'cong_name': _title_names(frame['congregation']),
+        'remarks': frame['remarks'].fillna('').astype(str),
+    })
+
+    # Rows without a parish or congregation are skipped, as blank sheet rows are
+    rows = rows[rows['parish_name'].ne('') & rows['cong_name'].ne('')]
+    frame = frame.loc[rows.index]
+
+    file_errors = []
+    dates = pd.to_datetime(frame['sunday_date'], errors='coerce', format='ISO8601')
+    bad_date = dates.isna()
+    for row, value in zip(rows['row'][bad_date], frame['sunday_date'][bad_date]):
+        file_errors.append(f"Row {row}: sunday date must be a YYYY-MM-DD date, got {value!r}")
+    no_arch = rows['arch_name'].eq('') & ~bad_date
+    for row in rows['row'][no_arch]:
+        file_errors.append(f"Row {row}: archdeaconry is required")
+    rows = rows[~(bad_date | no_arch)]
+    frame = frame.loc[rows.index]
+    rows['sunday_date'] = dates[rows.index].dt.date
+
+    # Messages are only built for the rows that fail a check
+    messages = {}
+
+    def reject(mask, describe):
+        for idx in mask[mask].index:
+            messages.setdefault(idx, []).append(describe(idx))
+
+    for column in ('parish_name', 'cong_name'):
+        names = rows[column]
+        reject(
+            names.str.len() > NAME_MAX_LENGTH,
+            lambda idx, names=names: f"name '{names[idx][:20]}...' is longer than {NAME_MAX_LENGTH} characters",
+        )
+    for column in COUNT_COLUMNS:
+        label = column.replace('_', ' ')
+        numbers, invalid = _numbers(frame[column])
+        reject(invalid, lambda idx, c=column, label=label: f"{label} must be a whole number, got {frame[c][idx]!r}")
+        reject(numbers < 0, lambda idx, label=label: f"{label} cannot be negative")
+        counts = np.trunc(numbers)
+        too_large = counts > COUNT_MAX
+        reject(too_large, lambda idx, label=label: f"{label} cannot be more than {COUNT_MAX}")
+        rows[column] = counts.where(~too_large, 0).astype('int64')
+
+    def reject_too_large(column):
+        label = column.replace('_', ' ')
+        too_large = rows[column].abs() > float(MONEY_MAX)
+        reject(too_large, lambda idx: f"{label} must be between -{MONEY_MAX:,} and {MONEY_MAX:,}")
+        rows[column] = rows[column].where(~too_large, 0.0)
+
+    for column in MONEY_COLUMNS:
+        label = column.replace('_', ' ')
+        numbers, invalid = _numbers(frame[column])
+        reject(invalid, lambda idx, c=column, label=label: f"{label} must be a number, got {frame[c][idx]!r}")
+        rows[column] = numbers.round(2)
+        reject_too_large(column)
+    rows['unbanked'] = (rows['total_collection'] - rows['banked']).round(2)
+    reject_too_large('unbanked')
+
+    row_errors = {}
+    for idx in sorted(messages):
+        sheet_name = sheet_name_for(rows.at[idx, 'arch_name'], rows.at[idx, 'sunday_date'])
+        row_errors.setdefault(sheet_name, []).append(
+            f"Sheet '{sheet_name}', row {rows.at[idx, 'row']}: {'; '.join(messages[idx])}"
+        )
+    return rows.drop(index=list(messages)), row_errors, file_errors
+
+
+def frame_hash(rows):
+    """
+    SHA-256 of a sheet's cleaned values, so an unchanged Sunday can be skipped on re-upload.
+    """
+    values = rows.drop(columns=['row']).reset_index(drop=True)
+    return hashlib.sha256(pd.util.hash_pandas_object(values, index=False).values.tobytes()).hexdigest()
+
+
+def parse_table(source, file_name):
+    """
+    Parse a CSV or Parquet export into the same structure as ``parse_workbook``,
+    with one pseudo-sheet per archdeaconry and Sunday. Each parsed sheet is
+    ``(arch_name, sheet_date, rows)`` where ``rows`` is a DataFrame for ``write_table_sheet``.
+    """
+    try:
+        frame = read_table(source, file_name)
+    except Exception as e:
+        return {'error': f"Failed to read file: {str(e)}", 'sheet_names': [], 'sheets': []}
+
+    first_row = 1 if file_name.lower().endswith('.parquet') else 2
+    rows, row_errors, file_errors = normalize_table(frame, first_row=first_row)
+    if rows is None:
+        return {'error': file_errors[0], 'sheet_names': [], 'sheets': []}
+
+    sheets = []
+    for (arch_name, sheet_date), sheet_rows in rows.groupby(['arch_name', 'sunday_date'], sort=True):
+        sheet_name = sheet_name_for(arch_name, sheet_date)
+        sheet_errors = row_errors.pop(sheet_name, [])
+        sheets.append((sheet_name, (arch_name, sheet_date, sheet_rows), sheet_errors, frame_hash(sheet_rows)))
+    # Sheets whose every row was rejected still report their errors
+    for sheet_name, sheet_errors in row_errors.items():
+        sheets.append((sheet_name, None, sheet_errors, None))
+    if file_errors:
+        sheets.append((file_name, None, file_errors, None))
+    return {'error': None, 'sheet_names': [sheet[0] for sheet in sheets], 'sheets': sheets}
+
+
+def upsert_frame(upload, arch_name, sheet_date, rows):
+    """
+    Write the cleaned rows of one archdeaconry and Sunday with ``save_records``,
+    reading straight from the DataFrame columns.
+    """
+    columns = []
+    for column in RECORD_VALUE_FIELDS:
+        values = rows[column].tolist()
+        if column in AMOUNT_COLUMNS:
+            values = [Decimal(f"{amount:.2f}") for amount in values]
+        columns.append(values)
+    # A congregation listed twice keeps its last row
+    paths = zip(rows['parish_name'], rows['cong_name'])
+    values_by_path = {path: dict(zip(RECORD_VALUE_FIELDS, values)) for path, values in zip(paths, zip(*columns))}
+    return save_records(upload, arch_name, sheet_date, values_by_path)
+
+
+def write_table_sheet(upload, sheet_name, parsed_sheet, errors):
+    """
+    The ``writer`` for sheets returned by ``parse_table``.
+    """
+    arch_name, sheet_date, rows = parsed_sheet
+    try:
+        return upsert_frame(upload, arch_name, sheet_date, rows)
+    except Exception as sheet_err:
+        errors.append(f"Sheet '{sheet_name}': {str(sheet_err)}")
+        return 0
@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core_apps.attendance.models import AttendanceRecord, AttendanceRollup
+from core_apps.attendance.rollups import ATTENDANCE_GENERATION, invalidate_attendance
+from core_apps.common.generations import bump_generation
+from core_apps.common.hierarchy import hierarchy_cache
+from core_apps.common.models import Archdeaconry, Congregation
+
+from .analytics import NAME_COLUMNS, SUM_COLUMNS, typed_frame
+from .columnar import columnar_store
+from .exports import arrow_export
+from .jobs import claim_next_job, job_heartbeat, run_job
+from .leaderboard import least_squares_slopes
+from .models import UploadedWorkbook, UploadJob
+from .pipeline import iter_ingest_workbooks, new_file_summary, parse_pool
+from .readers import iter_workbook_sheets, open_workbook
+from .views import records_queryset
+from .warming import warm_combinations, warming_scheduler
+from .synthetic import SyntheticDiocese
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def build_workbook(sheets):
+    """
+    Build an .xlsx upload from ``{sheet_name: [row, ...]}`` where each row holds
+    the values of columns A-K starting at row 8.
+    """
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for sheet_name, rows in sheets.items():
+        ws = wb.create_sheet(sheet_name)
+        for idx, row in enumerate(rows, start=8):
+            for col, value in enumerate(row, start=1):
+                ws.cell(row=idx, column=col, value=value)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def congregation_rows(count, parishes=3):
+    return [
+        [f"parish {i % parishes}", f"congregation {i}", 10, 5, 20, 1, None, 1000, 800, None, '']
+        for i in range(count)
+    ]
+
+
+def write_workbook_file(path, sheet_name, row_count):
+    """
+    Write ``row_count`` data rows to an .xlsx file on disk. A regular (not write-only)
+    workbook is used so the sheet carries a ``<dimension>`` element like Excel's own
+    files do; names come from a fixed pool, as in real workbooks.
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = sheet_name
+    for _ in range(7):
+        ws.append([])
+    for i in range(row_count):
+        ws.append([f"parish {i % 10}", f"congregation {i % 200}", 10, 5, 20, 1, None, 1000, 800, None, 'ok'])
+    wb.save(path)
+
+
+def table_rows(sunday_date, count, arch='mutira'):
+    return [
+        {
+            'Archdeaconry': arch, 'Sunday Date': sunday_date,
+            'Parish': f"parish {i % 3}", 'Congregation': f"CONGREGATION {i}",
+            'Sunday School': 10, 'Youth': 5, 'Adults': 20, 'Diff. Abled': '',
+            'Total Collection': 1000, 'Banked': 800, 'Remarks': '',
+        }
+        for i in range(count)
+    ]
+
+
+def build_csv(rows):
+    return pd.DataFrame(rows).to_csv(index=False).encode()
+
+
+def round_floats(value, places=6):
+    if isinstance(value, float):
+        return round(value, places)
+    if isinstance(value, dict):
+        return {key: round_floats(item, places) for key, item in value.items()}
+    if isinstance(value, list):
+        return [round_floats(item, places) for item in value]
+    return value
+
+
+class TempMediaMixin:
+    def setUp(self):
+        super().setUp()
+        # Test transactions roll back without telling the process-wide caches
+        hierarchy_cache.clear()
+        columnar_store.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        # A private cache keeps generation tokens and cached reports out of the real one
+        media_override = override_settings(
+            MEDIA_ROOT=media_root,
+            DASHBOARD_WARM_AFTER_UPLOAD=False,
+            CACHES={
+                alias: {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'{media_root}-{alias}',
+                }
+                for alias in ('default', 'generations')
+            },
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+
+class WorkbookUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def upload(self, name, content):
+        return self.client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile(name, content, content_type=XLSX_CONTENT_TYPE)]},
+            format='multipart',
+        )
+
+    def test_upload_creates_hierarchy_and_records(self):
+        response = self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(6)}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['errors'], [])
+        self.assertTrue(response.data[0]['processed'])
+        self.assertEqual(AttendanceRecord.objects.count(), 6)
+        record = AttendanceRecord.objects.get(congregation__name='Congregation 4')
+        self.assertEqual(record.parish.name, 'Parish 1')
+        self.assertEqual(record.archdeaconry.name, 'MUTIRA')
+        self.assertEqual(record.unbanked, 200)
+
+    def test_reupload_updates_existing_records(self):
+        self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(4)}))
+        rows = congregation_rows(4)
+        rows[0][7] = 5000
+        self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': rows}))
+
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        self.assertEqual(Congregation.objects.count(), 4)
+        record = AttendanceRecord.objects.get(congregation__name='Congregation 0')
+        self.assertEqual(record.total_collection, 5000)
+        self.assertEqual(record.unbanked, 4200)
+
+    def test_row_errors_are_reported_per_row(self):
+        rows = congregation_rows(3)
+        rows[1][2] = 'many'
+        response = self.upload(
+            'jan.xlsx', build_workbook({'MUTIRA-05-01-25': rows, 'BADNAME': rows, '-12-01-25': rows})
+        )
+
+        errors = response.data[0]['errors']
+        self.assertIn("Sheet 'MUTIRA-05-01-25', row 9: sunday school must be a whole number, got 'many'", errors)
+        self.assertIn("Invalid sheet name format: 'BADNAME'", errors)
+        self.assertIn("Invalid sheet name format: '-12-01-25'", errors)
+        self.assertFalse(response.data[0]['processed'])
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+        self.assertFalse(Archdeaconry.objects.filter(name='').exists())
+
+    def test_values_too_large_for_their_column_reject_only_their_row(self):
+        rows = congregation_rows(4)
+        rows[1][7] = 10 ** 10
+        rows[2][4] = 2 ** 31
+        response = self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': rows}))
+
+        self.assertEqual(response.data[0]['errors'], [
+            "Sheet 'MUTIRA-05-01-25', row 9: total collection must be between -9,999,999,999.99 and 9,999,999,999.99",
+            "Sheet 'MUTIRA-05-01-25', row 10: adults cannot be more than 2147483647",
+        ])
+        self.assertEqual(
+            sorted(AttendanceRecord.objects.values_list('congregation__name', flat=True)),
+            ['Congregation 0', 'Congregation 3'],
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.upload('small.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(5)}))
+        with CaptureQueriesContext(connection) as small:
+            self.upload('small.xlsx', build_workbook({'MUTIRA-12-01-25': congregation_rows(5)}))
+        self.upload('large.xlsx', build_workbook({'MUTIRA-19-01-25': congregation_rows(60)}))
+        with CaptureQueriesContext(connection) as large:
+            self.upload('large.xlsx', build_workbook({'MUTIRA-26-01-25': congregation_rows(60)}))
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_identical_reupload_is_skipped(self):
+        content = build_workbook({'MUTIRA-05-01-25': congregation_rows(4), 'MUTIRA-12-01-25': congregation_rows(4)})
+        self.upload('jan.xlsx', content)
+        AttendanceRecord.objects.update(adults=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload('jan.xlsx', content)
+
+        self.assertEqual(response.data[0]['skipped_sheets'], ['MUTIRA-05-01-25', 'MUTIRA-12-01-25'])
+        self.assertTrue(response.data[0]['processed'])
+        self.assertFalse(AttendanceRecord.objects.exclude(adults=0).exists())
+        self.assertLessEqual(len(queries.captured_queries), 1)
+
+    def test_changed_workbook_reimports_only_changed_sheets(self):
+        rows = congregation_rows(4)
+        self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': rows, 'MUTIRA-12-01-25': rows}))
+        AttendanceRecord.objects.update(adults=0)
+
+        changed = congregation_rows(4)
+        changed[0][2] = 99
+        response = self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': rows, 'MUTIRA-12-01-25': changed}))
+
+        self.assertEqual(response.data[0]['skipped_sheets'], ['MUTIRA-05-01-25'])
+        self.assertFalse(AttendanceRecord.objects.filter(sunday_date='2025-01-05').exclude(adults=0).exists())
+        self.assertEqual(AttendanceRecord.objects.filter(sunday_date='2025-01-12', adults=20).count(), 4)
+
+    @override_settings(INGEST_PARSE_WORKERS=2)
+    def test_parallel_parsing_keeps_summary_format_and_order(self):
+        bad_rows = congregation_rows(2)
+        bad_rows[0][8] = 'lots'
+        response = self.client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [
+                SimpleUploadedFile('a.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(4)})),
+                SimpleUploadedFile('b.xlsx', build_workbook({'MUTIRA-12-01-25': bad_rows})),
+                SimpleUploadedFile('c.xlsx', b'not a workbook'),
+            ]},
+            format='multipart',
+        )
+
+        self.assertEqual([item['file'] for item in response.data], ['a.xlsx', 'b.xlsx', 'c.xlsx'])
+        self.assertEqual(
+            response.data[0],
+            {'file': 'a.xlsx', 'new_upload': True, 'processed': True, 'errors': [], 'skipped_sheets': []},
+        )
+        self.assertEqual(
+            response.data[1]['errors'], ["Sheet 'MUTIRA-12-01-25', row 8: banked must be a number, got 'lots'"]
+        )
+        self.assertTrue(response.data[2]['errors'][0].startswith('Failed to read file'))
+        self.assertEqual(AttendanceRecord.objects.count(), 5)
+        # Later uploads reuse the worker processes
+        self.assertIs(parse_pool(2), parse_pool(2))
+
+
+class TabularUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def upload(self, name, content):
+        return self.client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile(name, content)]},
+            format='multipart',
+        )
+
+    def test_csv_rows_match_workbook_rows(self):
+        self.upload('jan.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(6)}))
+        response = self.upload('export.csv', build_csv(table_rows('2025-01-12', 6)))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['errors'], [])
+        self.assertTrue(response.data[0]['processed'])
+        # Names are normalized like workbook cells, so no new congregations appear
+        self.assertEqual(Congregation.objects.count(), 6)
+        record = AttendanceRecord.objects.get(congregation__name='Congregation 4', sunday_date='2025-01-12')
+        self.assertEqual(record.parish.name, 'Parish 1')
+        self.assertEqual(record.archdeaconry.name, 'MUTIRA')
+        self.assertEqual(record.diff_abled, 0)
+        self.assertEqual(record.unbanked, 200)
+
+    def test_csv_errors_are_reported_per_row(self):
+        rows = table_rows('2025-01-05', 5)
+        rows[1]['Youth'] = 'many'
+        rows[2]['Sunday Date'] = '5th Jan'
+        rows[3]['Total Collection'] = 'inf'
+        rows[4]['Adults'] = 'nan'
+        response = self.upload('export.csv', build_csv(rows))
+
+        errors = response.data[0]['errors']
+        self.assertIn("Sheet 'MUTIRA-05-01-25', row 3: youth must be a whole number, got 'many'", errors)
+        self.assertIn("Sheet 'MUTIRA-05-01-25', row 5: total collection must be a number, got 'inf'", errors)
+        self.assertIn("Sheet 'MUTIRA-05-01-25', row 6: adults must be a whole number, got 'nan'", errors)
+        self.assertIn("Row 4: sunday date must be a YYYY-MM-DD date, got '5th Jan'", errors)
+        self.assertFalse(response.data[0]['processed'])
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+        response = self.upload('other.csv', b'parish,congregation\nA,B\n')
+        self.assertEqual(
+            response.data[0]['errors'],
+            ['Missing column(s): archdeaconry, sunday_date, sunday_school, youth, adults, diff_abled, '
+             'total_collection, banked'],
+        )
+
+    def test_csv_values_too_large_for_their_column_reject_only_their_row(self):
+        rows = table_rows('2025-01-05', 5)
+        rows[1]['Total Collection'] = '10000000000'
+        rows[2]['Youth'] = str(2 ** 31)
+        rows[3]['Banked'] = '-9999999999'
+        response = self.upload('export.csv', build_csv(rows))
+
+        self.assertEqual(response.data[0]['errors'], [
+            "Sheet 'MUTIRA-05-01-25', row 3: total collection must be between -9,999,999,999.99 and 9,999,999,999.99",
+            "Sheet 'MUTIRA-05-01-25', row 4: youth cannot be more than 2147483647",
+            "Sheet 'MUTIRA-05-01-25', row 5: unbanked must be between -9,999,999,999.99 and 9,999,999,999.99",
+        ])
+        self.assertEqual(
+            sorted(AttendanceRecord.objects.values_list('congregation__name', flat=True)),
+            ['Congregation 0', 'Congregation 4'],
+        )
+        record = AttendanceRecord.objects.get(congregation__name='Congregation 4')
+        self.assertEqual((record.youth, record.unbanked), (5, 200))
+
+    def test_parquet_upload_skips_unchanged_sundays(self):
+        rows = table_rows('2025-01-05', 4) + table_rows('2025-01-12', 4)
+        buffer = io.BytesIO()
+        pd.DataFrame(rows).to_parquet(buffer)
+        self.upload('export.parquet', buffer.getvalue())
+        self.assertEqual(AttendanceRecord.objects.count(), 8)
+
+        rows[-1]['Banked'] = 1000
+        buffer = io.BytesIO()
+        pd.DataFrame(rows).to_parquet(buffer)
+        response = self.upload('export.parquet', buffer.getvalue())
+
+        self.assertEqual(response.data[0]['skipped_sheets'], ['MUTIRA-05-01-25'])
+        self.assertEqual(AttendanceRecord.objects.filter(unbanked=0).count(), 1)
+
+    def test_unknown_extension_is_rejected(self):
+        response = self.upload('notes.txt', b'hello')
+        self.assertEqual(response.status_code, 400)
+
+
+class StreamingUploadTests(TempMediaMixin, TestCase):
+    def test_stream_emits_a_line_per_sheet_and_file(self):
+        rows = congregation_rows(3)
+        rows[1][2] = 'many'
+        files = [
+            SimpleUploadedFile(
+                'a.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(4), 'MUTIRA-12-01-25': rows})
+            ),
+            SimpleUploadedFile('b.xlsx', b'not a workbook'),
+        ]
+        response = APIClient().post(
+            '/api/v1/analyzer/upload-workbook/?stream=true', {'files': files}, format='multipart'
+        )
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [(line['type'], line.get('sheet')) for line in lines],
+            [
+                ('sheet', 'MUTIRA-05-01-25'), ('sheet', 'MUTIRA-12-01-25'),
+                ('file', None), ('file', None), ('batch', None),
+            ],
+        )
+        self.assertEqual(lines[0]['rows_written'], 4)
+        self.assertEqual(
+            lines[1]['errors'], ["Sheet 'MUTIRA-12-01-25', row 9: sunday school must be a whole number, got 'many'"]
+        )
+        self.assertEqual((lines[2]['rows_written'], lines[2]['error_count'], lines[2]['errors']), (6, 1, []))
+        self.assertTrue(lines[3]['errors'][0].startswith('Failed to read file'))
+        self.assertEqual((lines[4]['files'], lines[4]['rows_written'], lines[4]['errors']), (2, 6, 2))
+        self.assertEqual(AttendanceRecord.objects.count(), 6)
+
+
+class DryRunTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def upload(self, files, dry_run=True):
+        return self.client.post(
+            '/api/v1/analyzer/upload-workbook/' + ('?dry_run=true' if dry_run else ''),
+            {'files': [SimpleUploadedFile(name, content) for name, content in files]},
+            format='multipart',
+        )
+
+    def test_dry_run_reports_changes_without_writing(self):
+        self.upload([('jan.xlsx', build_workbook({'MUTIRA-05-01-25': congregation_rows(4)}))], dry_run=False)
+        rows = congregation_rows(6)
+        rows[0][7] = 1500
+        rows[1][8] = 1200
+        rows[2][3] = 'lots'
+        csv_rows = table_rows('2025-01-05', 2)
+        for row in csv_rows:
+            row['Diff. Abled'] = 1
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload([
+                ('jan.xlsx', build_workbook({'MUTIRA-05-01-25': rows, 'BADNAME': rows})),
+                ('export.csv', build_csv(csv_rows)),
+            ])
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        workbook, export = response.data
+        self.assertFalse(workbook['valid'])
+        self.assertIn("Invalid sheet name format: 'BADNAME'", workbook['errors'])
+        self.assertIn("Sheet 'MUTIRA-05-01-25', row 10: youth must be a whole number, got 'lots'", workbook['errors'])
+        self.assertEqual(
+            workbook['warnings'], ["Sheet 'MUTIRA-05-01-25', row 9: banked 1200.00 exceeds total collection 1000.00"]
+        )
+
+        sheet = workbook['sheets'][0]
+        self.assertEqual((sheet['new'], sheet['changed'], sheet['unchanged']), (2, 2, 1))
+        self.assertEqual([row['congregation'] for row in sheet['new_rows']], ['Congregation 4', 'Congregation 5'])
+        self.assertEqual(sheet['changes'][0]['congregation'], 'Congregation 0')
+        self.assertEqual(sheet['changes'][0]['fields'], {
+            'total_collection': {'old': 1000.0, 'new': 1500.0, 'delta': 500.0},
+            'unbanked': {'old': 200.0, 'new': 700.0, 'delta': 500.0},
+        })
+
+        # The export matches what is stored, name casing aside
+        self.assertTrue(export['valid'])
+        self.assertEqual(
+            [(s['sheet'], s['new'], s['changed'], s['unchanged']) for s in export['sheets']],
+            [('MUTIRA-05-01-25', 0, 0, 2)],
+        )
+        self.assertFalse(UploadedWorkbook.objects.filter(file_name='export.csv').exists())
+
+
+class DashboardTests(TempMediaMixin, TestCase):
+    def test_dashboard_reads_rollups_only(self):
+        client = APIClient()
+        rows = congregation_rows(4)
+        rows[0][4] = 60
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({
+                'MUTIRA-26-01-25': congregation_rows(4), 'MUTIRA-02-02-25': rows,
+            }))]},
+            format='multipart',
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/analyzer/dashboard/?start_date=2025-01-01&end_date=2025-02-10')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if AttendanceRecord._meta.db_table in q['sql']])
+        data = response.json()
+        self.assertEqual(data['overall']['total_total_collection'], 8000.0)
+        self.assertEqual(data['overall']['avg_weekly_attendance'], 41.0)
+        self.assertEqual(data['overall']['growth_rate'], 27.78)
+        self.assertEqual(
+            [(month['month'], month['total_attendance']) for month in data['time_series']],
+            [('2025-01', 36.0), ('2025-02', 46.0)],
+        )
+        self.assertEqual(data['hierarchy'][0], {
+            'archdeaconry_name': 'MUTIRA', 'parish_name': 'Parish 0', 'congregation_name': 'Congregation 0',
+            'total_attendance': 56.0, 'total_collection': 2000.0, 'id': 2,
+        })
+        self.assertEqual(client.get('/api/v1/analyzer/dashboard/?end_date=2024-01-01').status_code, 404)
+
+    def test_backends_agree(self):
+        client = APIClient()
+        diocese = SyntheticDiocese(archdeaconries=2, parishes=2, congregations=3, sundays=9)
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for path in diocese.write_workbooks(tmp):
+                with open(path, 'rb') as fh:
+                    files.append(SimpleUploadedFile(os.path.basename(path), fh.read()))
+        client.post('/api/v1/analyzer/upload-workbook/', {'files': files}, format='multipart')
+        parish = Congregation.objects.first().parish_id
+
+        for params in ['start_date=2025-01-10&end_date=2025-02-20', f'parish={parish}&end_date=2025-03-31']:
+            sql = client.get(f'/api/v1/analyzer/dashboard/?{params}&backend=sql').json()
+            pandas = client.get(f'/api/v1/analyzer/dashboard/?{params}&backend=pandas').json()
+            columnar = client.get(f'/api/v1/analyzer/dashboard/?{params}&backend=columnar').json()
+            self.assertEqual(round_floats(sql), round_floats(pandas))
+            self.assertEqual(round_floats(sql), round_floats(columnar))
+
+        response = client.get('/api/v1/analyzer/dashboard/?backend=spark')
+        self.assertEqual(response.status_code, 400)
+
+    def test_dashboard_is_cached_until_an_upload_changes_the_data(self):
+        client = APIClient()
+
+        def upload(rows):
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(
+                    '/api/v1/analyzer/upload-workbook/',
+                    {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({'MUTIRA-26-01-25': rows}))]},
+                    format='multipart',
+                )
+
+        upload(congregation_rows(4))
+        url = '/api/v1/analyzer/dashboard/?start_date=2025-01-01&end_date=2025-01-31'
+        first = client.get(url)
+        etag = first['ETag']
+
+        # Repeated and equivalent requests are served from the cache without touching the database
+        parish = Congregation.objects.first().parish_id
+        by_parish = client.get(f'{url}&parish={parish}&archdeaconry=999')
+        with CaptureQueriesContext(connection) as queries:
+            again = client.get(url)
+            same_parish = client.get(f'{url}&parish={parish}')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual((again.json(), again['ETag']), (first.json(), etag))
+        self.assertEqual(same_parish['ETag'], by_parish['ETag'])
+
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+        rows = congregation_rows(4)
+        rows[0][7] = 5000
+        upload(rows)
+        changed = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.json()['overall']['total_total_collection'], 8000.0)
+
+    def test_pandas_frames_are_typed(self):
+        client = APIClient()
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({'MUTIRA-26-01-25': congregation_rows(4)}))]},
+            format='multipart',
+        )
+        frame = typed_frame(
+            AttendanceRollup.objects.filter(period='week', level='congregation').annotate(**NAME_COLUMNS),
+            ['period_start', *NAME_COLUMNS, *SUM_COLUMNS],
+        )
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(str(frame['period_start'].dtype), 'datetime64[s]')
+        self.assertEqual(frame['congregation_name'].dtype, 'category')
+        self.assertEqual(frame['adults'].dtype, 'int32')
+        self.assertEqual(frame['total_collection'].dtype, 'float64')
+        self.assertEqual(frame['total_collection'].sum(), 4000.0)
+
+    def test_sections_compute_only_what_they_need(self):
+        client = APIClient()
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({
+                'MUTIRA-26-01-25': congregation_rows(4), 'MUTIRA-02-02-25': congregation_rows(3),
+            }))]},
+            format='multipart',
+        )
+        url = '/api/v1/analyzer/dashboard/?start_date=2025-01-01&end_date=2025-02-28'
+        full = client.get(url).json()
+
+        with CaptureQueriesContext(connection) as queries:
+            overall = client.get(f'{url}&sections=overall').json()
+        self.assertEqual(overall, {'overall': full['overall']})
+        self.assertFalse([q for q in queries if 'congregation' in q['sql'] and 'GROUP BY' in q['sql']])
+
+        both = client.get(f'{url}&sections=financial, hierarchy').json()
+        self.assertEqual(list(both), ['hierarchy', 'financial'])
+        self.assertEqual(both, {'hierarchy': full['hierarchy'], 'financial': full['financial']})
+
+        response = client.get(f'{url}&sections=overall,charts')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('charts', response.json()['detail'])
+
+    @override_settings(DASHBOARD_COLUMNAR_WATERMARK_OVERLAP=0)
+    def test_columnar_store_merges_changed_records(self):
+        client = APIClient()
+
+        def upload(sheets):
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(
+                    '/api/v1/analyzer/upload-workbook/',
+                    {'files': [SimpleUploadedFile('jan.xlsx', build_workbook(sheets))]},
+                    format='multipart',
+                )
+
+        def dashboards():
+            url = '/api/v1/analyzer/dashboard/?start_date=2025-01-01&end_date=2025-02-28&backend='
+            return round_floats(client.get(url + 'columnar').json()), round_floats(client.get(url + 'sql').json())
+
+        upload({'MUTIRA-26-01-25': congregation_rows(4)})
+        columnar, sql = dashboards()
+        self.assertEqual(columnar, sql)
+        loaded = columnar_store.get()
+        self.assertEqual(loaded.memory_report()['rows'], 4)
+
+        # A corrected Sunday and a new one are merged into the loaded arrays
+        rows = congregation_rows(5)
+        rows[0][4] = 70
+        upload({'MUTIRA-26-01-25': rows, 'MUTIRA-02-02-25': congregation_rows(3)})
+        columnar, sql = dashboards()
+        self.assertEqual(columnar, sql)
+        self.assertEqual(len(columnar_store.get()), 8)
+        self.assertIsNot(columnar_store.get(), loaded)
+
+        # Nothing changed: the snapshot is reused without touching the records table
+        with CaptureQueriesContext(connection) as queries:
+            columnar_store.get()
+        self.assertFalse([q for q in queries if AttendanceRecord._meta.db_table in q['sql']])
+
+        # A bulk import commits rows stamped long before the watermark; it asks for a full reload
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.update(adults=90, updated_at=timezone.now() - datetime.timedelta(days=1))
+            invalidate_attendance(reload=True)
+        self.assertEqual(columnar_store.get().columns['adults'].tolist(), [90] * 8)
+
+
+class AsyncEndpointTests(TempMediaMixin, TransactionTestCase):
+    # Concurrent queries run on other connections, which only see committed data
+    def test_async_views_match_sync_views(self):
+        client = APIClient()
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({
+                'MUTIRA-26-01-25': congregation_rows(4), 'MUTIRA-02-02-25': congregation_rows(3),
+            }))]},
+            format='multipart',
+        )
+        for params in ['start_date=2025-01-01&end_date=2025-02-28', 'sections=financial,overall&backend=pandas']:
+            sync = client.get(f'/api/v1/analyzer/dashboard/?{params}')
+            concurrent = client.get(f'/api/v1/analyzer/async/dashboard/?{params}')
+            self.assertEqual(concurrent.status_code, 200)
+            self.assertEqual(concurrent.json(), sync.json())
+            self.assertEqual(concurrent['ETag'], sync['ETag'])
+        self.assertEqual(client.get('/api/v1/analyzer/async/dashboard/?backend=spark').status_code, 400)
+
+        for params in ['pageSize=3&page=2', 'pageSize=3&page=9', 'pageSize=5&parish=999']:
+            sync = client.get(f'/api/v1/analyzer/records/?{params}').json()
+            concurrent = client.get(f'/api/v1/analyzer/async/records/?{params}').json()
+            self.assertEqual(concurrent, sync, params)
+
+
+class RecordsExportTests(TempMediaMixin, TestCase):
+    def test_exports_match_the_records_filters(self):
+        client = APIClient()
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({
+                'MUTIRA-26-01-25': congregation_rows(4), 'MUTIRA-02-02-25': congregation_rows(3),
+            }))]},
+            format='multipart',
+        )
+        listed = client.get('/api/v1/analyzer/records/?pageSize=100&start_date=2025-02-01').json()['data']
+
+        response = client.get('/api/v1/analyzer/records/export/?start_date=2025-02-01')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="attendance-records-', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'sunday_date', 'sunday_school'])
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]], [row['id'] for row in listed])
+
+        response = client.get('/api/v1/analyzer/records/export/?type=xlsx')
+        ws = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(ws.values)
+        self.assertEqual(len(rows), 1 + 7)
+        self.assertEqual(rows[1][rows[0].index('total_collection')], 1000)
+
+        self.assertEqual(client.get('/api/v1/analyzer/records/export/?type=pdf').status_code, 400)
+
+    def test_columnar_exports_are_typed_and_stored_per_generation(self):
+        client = APIClient()
+
+        def upload(rows):
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(
+                    '/api/v1/analyzer/upload-workbook/',
+                    {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({'MUTIRA-26-01-25': rows}))]},
+                    format='multipart',
+                )
+
+        upload(congregation_rows(4))
+        with tempfile.TemporaryDirectory() as export_dir, override_settings(RECORDS_EXPORT_DIR=export_dir):
+            response = client.get('/api/v1/analyzer/records/export/?type=parquet&start_date=2025-01-01')
+            self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+            frame = pd.read_parquet(io.BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(len(frame), 4)
+            self.assertEqual(str(frame['adults'].dtype), 'int32')
+            self.assertEqual(frame['total_collection'].iloc[0], Decimal('1000.00'))
+            self.assertEqual(frame['sunday_date'].iloc[0], datetime.date(2025, 1, 26))
+            stored = os.listdir(export_dir)
+            self.assertEqual(len(stored), 1)
+
+            # Served from disk until an upload changes the data
+            with CaptureQueriesContext(connection) as queries:
+                client.get('/api/v1/analyzer/records/export/?type=parquet&start_date=2025-01-01').close()
+            self.assertEqual(len(queries), 0)
+
+            upload(congregation_rows(5))
+            call_command('export_records', '--format', 'parquet', '--start-date', '2025-01-01', stdout=io.StringIO())
+            [path] = os.listdir(export_dir)
+            self.assertNotEqual([path], stored)
+            self.assertEqual(pq.read_metadata(os.path.join(export_dir, path)).num_rows, 5)
+
+            response = client.get('/api/v1/analyzer/records/export/?type=arrow')
+            table = pa.ipc.open_file(io.BytesIO(b''.join(response.streaming_content))).read_all()
+            self.assertEqual(table.schema.field('sunday_date').type, pa.date32())
+
+    def test_an_export_stays_readable_when_a_newer_one_prunes_it(self):
+        upload_rows = congregation_rows(3)
+        APIClient().post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({'MUTIRA-26-01-25': upload_rows}))]},
+            format='multipart',
+        )
+        with tempfile.TemporaryDirectory() as export_dir:
+            old = arrow_export(records_queryset({}), {}, 'arrow', directory=export_dir)
+            bump_generation(ATTENDANCE_GENERATION)
+            with arrow_export(records_queryset({}), {}, 'arrow', directory=export_dir) as new:
+                self.assertEqual(os.listdir(export_dir), [os.path.basename(new.name)])
+            with old:
+                self.assertEqual(pa.ipc.open_file(old).read_all().num_rows, 3)
+
+
+class DashboardWarmingTests(TempMediaMixin, TransactionTestCase):
+    def test_warmed_dashboards_are_served_from_the_cache(self):
+        client = APIClient()
+        # Inside the warmed windows whenever the test runs
+        today = timezone.now().date()
+        sunday = (today - datetime.timedelta(days=(today.weekday() + 1) % 7)).strftime('%d-%m-%y')
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({
+                f'MUTIRA-{sunday}': congregation_rows(4), f'KIANYAGA-{sunday}': congregation_rows(2),
+            }))]},
+            format='multipart',
+        )
+        out = io.StringIO()
+        call_command('warm_dashboard_cache', '--window', 'default', stdout=out)
+        # The diocese, two archdeaconries and their 3 + 2 parishes
+        self.assertIn('Warmed 8 combination(s)', out.getvalue())
+        self.assertIn('8 built', out.getvalue())
+
+        parish = Congregation.objects.first().parish_id
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/v1/analyzer/dashboard/?parish={parish}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+        out = io.StringIO()
+        call_command('warm_dashboard_cache', '--window', 'default', stdout=out)
+        self.assertIn('0 built, 8 already cached', out.getvalue())
+
+        # The cap keeps the coarsest scopes: the diocese and archdeaconries in both windows
+        with override_settings(DASHBOARD_WARM_MAX_COMBINATIONS=6):
+            combinations = warm_combinations()
+        self.assertEqual(len(combinations), 6)
+        self.assertEqual({tuple(filters) for _, _, filters in combinations}, {(), ('archdeaconry_id',)})
+
+    def test_upload_schedules_a_background_run(self):
+        with override_settings(DASHBOARD_WARM_AFTER_UPLOAD=True), \
+                mock.patch.object(warming_scheduler, 'request') as request:
+            APIClient().post(
+                '/api/v1/analyzer/upload-workbook/',
+                {'files': [SimpleUploadedFile('jan.xlsx', build_workbook({'MUTIRA-26-01-25': congregation_rows(2)}))]},
+                format='multipart',
+            )
+        request.assert_called_once_with()
+
+    def test_an_abandoned_stream_still_schedules_a_run(self):
+        upload = UploadedWorkbook.objects.create(
+            file=SimpleUploadedFile('jan.xlsx', build_workbook({
+                'MUTIRA-19-01-25': congregation_rows(2), 'MUTIRA-26-01-25': congregation_rows(2),
+            })),
+            file_name='jan.xlsx',
+        )
+        with override_settings(DASHBOARD_WARM_AFTER_UPLOAD=True), \
+                mock.patch.object(warming_scheduler, 'request') as request:
+            events = iter_ingest_workbooks([(upload, new_file_summary('jan.xlsx'), {})])
+            # The client goes away after the first sheet is written
+            for _, event, _ in events:
+                if event == 'sheet':
+                    break
+            events.close()
+        request.assert_called_once_with()
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+
+
+class TrendsTests(TempMediaMixin, TestCase):
+    def test_period_changes_and_rolling_averages(self):
+        client = APIClient()
+        rows = congregation_rows(4)
+        for row in rows:
+            row[4] = 29
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('trends.xlsx', build_workbook({
+                'MUTIRA-07-01-24': congregation_rows(4), 'MUTIRA-05-01-25': rows,
+                'MUTIRA-02-02-25': congregation_rows(2),
+            }))]},
+            format='multipart',
+        )
+        url = '/api/v1/analyzer/trends/?start_date=2025-01-01&end_date=2025-02-28'
+
+        monthly = client.get(url).json()
+        self.assertEqual(monthly['level'], 'archdeaconry')
+        [series] = monthly['series']
+        self.assertEqual(series['name'], 'MUTIRA')
+        self.assertEqual(
+            [(p['period_start'], p['attendance'], p['attendance_change'], p['attendance_yoy_change'])
+             for p in series['points']],
+            # January's previous row is January 2024, which is not the previous month
+            [('2025-01-01', 180, None, 25.0), ('2025-02-01', 72, -20.0, None)],
+        )
+
+        weekly = client.get(f'{url}&period=week').json()
+        first, second = weekly['series'][0]['points']
+        self.assertEqual((first['period_start'], first['attendance_yoy_change']), ('2025-01-05', 25.0))
+        # Its last 4 rows go back a year, so there is no 4-week average
+        self.assertIsNone(second['attendance_avg_4w'])
+
+        parishes = client.get(f'{url}&level=parish').json()
+        self.assertEqual(len(parishes['series']), 3)
+        parish = parishes['series'][0]['id']
+        self.assertEqual(client.get(f'{url}&parish={parish}&level=archdeaconry').status_code, 400)
+        self.assertEqual(client.get(f'{url}&period=day').status_code, 400)
+        self.assertEqual(client.get('/api/v1/analyzer/trends/?end_date=2020-01-01').status_code, 404)
+        self.assertEqual(client.get('/api/v1/analyzer/trends/?end_date=someday').status_code, 400)
+        self.assertEqual(client.get('/api/v1/analyzer/trends/?start_date=2025-13-01').status_code, 400)
+
+    def test_rolling_averages_need_every_sunday_of_their_window(self):
+        sheets = {}
+        for week, adults in enumerate([10, 20, 30, 40, 50, 60]):
+            sunday = datetime.date(2025, 1, 5) + datetime.timedelta(weeks=week)
+            rows = congregation_rows(1)
+            rows[0][2:6] = [0, 0, adults, 0]
+            # The fifth Sunday is missing
+            if week != 4:
+                sheets[f"MUTIRA-{sunday.strftime('%d-%m-%y')}"] = rows
+        APIClient().post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('weeks.xlsx', build_workbook(sheets))]},
+            format='multipart',
+        )
+
+        data = APIClient().get(
+            '/api/v1/analyzer/trends/?period=week&start_date=2025-01-19&end_date=2025-02-28'
+        ).json()
+        points = data['series'][0]['points']
+        self.assertEqual(
+            [(p['period_start'], p['attendance_avg_4w'], p['attendance_avg_12w']) for p in points],
+            [('2025-01-19', None, None), ('2025-01-26', 25.0, None), ('2025-02-09', None, None)],
+        )
+
+
+class LeaderboardTests(TempMediaMixin, TestCase):
+    def test_slopes_match_a_least_squares_fit(self):
+        rng = np.random.default_rng(7)
+        x = np.tile(np.arange(10, dtype=np.float64), 3)
+        y = rng.normal(100, 10, 30)
+        counts, [(slopes, means)] = least_squares_slopes(np.array([0, 10, 20]), x, y)
+        self.assertEqual(counts.tolist(), [10, 10, 10])
+        for index in range(3):
+            run = slice(index * 10, index * 10 + 10)
+            self.assertAlmostEqual(slopes[index], np.polyfit(x[run], y[run], 1)[0])
+            self.assertAlmostEqual(means[index], y[run].mean())
+
+    def test_congregations_are_ranked_by_slope(self):
+        sheets = {}
+        for week, day in enumerate(['05', '12', '19', '26']):
+            rows = congregation_rows(3)
+            rows[0][4] = 20 + 10 * week
+            rows[1][4] = 50 - 5 * week
+            sheets[f'MUTIRA-{day}-01-25'] = rows
+        APIClient().post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('leaders.xlsx', build_workbook(sheets))]},
+            format='multipart',
+        )
+        url = '/api/v1/analyzer/leaderboard/?end_date=2025-01-31&weeks=8'
+
+        data = APIClient().get(url).json()
+        self.assertEqual(data['ranked'], 3)
+        growing, steady, shrinking = data['congregations']
+        self.assertEqual(
+            (growing['name'], growing['attendance_slope'], growing['sundays']), ('Congregation 0', 10.0, 4)
+        )
+        self.assertEqual((steady['attendance_slope'], steady['collection_slope']), (0.0, 0.0))
+        self.assertEqual(shrinking['attendance_slope'], -5.0)
+        self.assertEqual(growing['parish_name'], 'Parish 0')
+
+        data = APIClient().get(f'{url}&order=asc&limit=1&sort=attendance_trend').json()
+        [first] = data['congregations']
+        self.assertEqual((first['rank'], first['id']), (1, shrinking['id']))
+        self.assertEqual(first['attendance_trend'], round(-5 / 58.5 * 100, 2))
+        self.assertEqual(APIClient().get(f'{url}&min_sundays=5').json()['ranked'], 0)
+        self.assertEqual(APIClient().get(f'{url}&sort=name').status_code, 400)
+        self.assertEqual(APIClient().get(f'{url}&weeks=100000').status_code, 400)
+        self.assertEqual(APIClient().get('/api/v1/analyzer/leaderboard/?end_date=soon').status_code, 400)
+        self.assertEqual(APIClient().get('/api/v1/analyzer/leaderboard/?end_date=2020-01-01').status_code, 404)
+
+
+class AnomaliesTests(TempMediaMixin, TestCase):
+    def test_flagged_rows_are_listed(self):
+        sheets = {f'MUTIRA-{day}-01-25': congregation_rows(3) for day in ['05', '12', '19', '26']}
+        typo = congregation_rows(3)
+        typo[0][7] = 100000
+        typo[1][8] = 5000
+        sheets['MUTIRA-02-02-25'] = typo
+        client = APIClient()
+        client.post(
+            '/api/v1/analyzer/upload-workbook/',
+            {'files': [SimpleUploadedFile('typos.xlsx', build_workbook(sheets))]},
+            format='multipart',
+        )
+
+        data = client.get('/api/v1/analyzer/anomalies/').json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(
+            {(row['congregation_name'], row['kind'], row['value']) for row in data['data']},
+            {('Congregation 0', 'collection', 100000.0), ('Congregation 1', 'banked', 5000.0)},
+        )
+        self.assertEqual(data['data'][0]['file_name'], 'typos.xlsx')
+        self.assertEqual(client.get('/api/v1/analyzer/anomalies/?kind=banked').json()['total'], 1)
+        self.assertEqual(client.get('/api/v1/analyzer/anomalies/?end_date=2025-01-31').json()['total'], 0)
+        self.assertEqual(client.get('/api/v1/analyzer/anomalies/?kind=remarks').status_code, 400)
+
+
+class UploadJobTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_background_upload_is_processed_by_worker(self):
+        content = build_workbook({'MUTIRA-05-01-25': congregation_rows(3), 'MUTIRA-12-01-25': congregation_rows(2)})
+        response = self.client.post(
+            '/api/v1/analyzer/upload-workbook/?background=true',
+            {'files': [SimpleUploadedFile('jan.xlsx', content, content_type=XLSX_CONTENT_TYPE)]},
+            format='multipart',
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], UploadJob.Status.PENDING)
+        self.assertEqual(AttendanceRecord.objects.count(), 0)
+
+        job = claim_next_job()
+        self.assertEqual(job.pk, response.data['id'])
+        self.assertIsNone(claim_next_job())
+        run_job(job)
+
+        progress = self.client.get(f"/api/v1/analyzer/upload-jobs/{job.pk}/").data
+        self.assertEqual(progress['status'], UploadJob.Status.DONE)
+        file_progress = progress['files'][0]
+        self.assertEqual(file_progress['file'], 'jan.xlsx')
+        self.assertTrue(file_progress['processed'])
+        self.assertEqual((file_progress['sheets_done'], file_progress['sheets_total']), (2, 2))
+        self.assertEqual(file_progress['rows_written'], 5)
+        self.assertEqual([sheet['rows_written'] for sheet in file_progress['sheets']], [3, 2])
+        self.assertEqual(AttendanceRecord.objects.count(), 5)
+
+
+class UploadJobHeartbeatTests(TransactionTestCase):
+    def test_a_job_whose_worker_is_alive_is_not_reclaimed(self):
+        job = UploadJob.objects.create(status=UploadJob.Status.RUNNING)
+        long_ago = timezone.now() - datetime.timedelta(hours=1)
+        UploadJob.objects.filter(pk=job.pk).update(updated_at=long_ago)
+
+        with job_heartbeat(job, every=datetime.timedelta(milliseconds=10)):
+            for _ in range(500):
+                if UploadJob.objects.get(pk=job.pk).updated_at > long_ago:
+                    break
+                time.sleep(0.01)
+            self.assertIsNone(claim_next_job(stale_after=datetime.timedelta(minutes=1)))
+
+        UploadJob.objects.filter(pk=job.pk).update(updated_at=long_ago)
+        self.assertEqual(claim_next_job(stale_after=datetime.timedelta(minutes=1)).pk, job.pk)
+
+
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        chunk_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, chunk_root, ignore_errors=True)
+        chunk_override = override_settings(CHUNKED_UPLOAD_DIR=chunk_root)
+        chunk_override.enable()
+        self.addCleanup(chunk_override.disable)
+
+    def test_resumed_chunked_upload_is_ingested(self):
+        content = build_workbook({'MUTIRA-05-01-25': congregation_rows(4)})
+        middle = len(content) // 2
+        chunks = [content[:middle], content[middle:]]
+
+        init = self.client.post(
+            '/api/v1/analyzer/upload-chunks/',
+            {'file_name': 'jan.xlsx', 'total_chunks': 2, 'total_size': len(content)},
+            format='json',
+        )
+        self.assertEqual(init.status_code, 201)
+        base = f"/api/v1/analyzer/upload-chunks/{init.data['id']}/"
+
+        self.client.put(f"{base}1/", chunks[1], content_type='application/octet-stream')
+        early = self.client.post(f"{base}finalize/")
+        self.assertEqual(early.status_code, 409)
+        self.assertEqual(self.client.get(base).data['missing'], [0])
+
+        self.client.put(f"{base}0/", chunks[0], content_type='application/octet-stream')
+        response = self.client.post(f"{base}finalize/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['file'], 'jan.xlsx')
+        self.assertTrue(response.data[0]['processed'])
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        self.assertEqual(self.client.get(base).status_code, 404)
+
+    def test_dry_run_finalize_leaves_the_upload_open(self):
+        content = build_workbook({'MUTIRA-05-01-25': congregation_rows(4)})
+        init = self.client.post(
+            '/api/v1/analyzer/upload-chunks/',
+            {'file_name': 'jan.xlsx', 'total_chunks': 1, 'total_size': len(content)},
+            format='json',
+        )
+        base = f"/api/v1/analyzer/upload-chunks/{init.data['id']}/"
+        self.client.put(f"{base}0/", content, content_type='application/octet-stream')
+
+        dry_run = self.client.post(f"{base}finalize/?dry_run=true")
+        self.assertEqual(dry_run.status_code, 200)
+        self.assertEqual(dry_run.data[0]['sheets'][0]['new'], 4)
+        self.assertEqual(AttendanceRecord.objects.count(), 0)
+        self.assertEqual(self.client.get(base).data['missing'], [])
+
+        response = self.client.post(f"{base}finalize/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        self.assertEqual(self.client.get(base).status_code, 404)
+
+
+class ImportWorkbooksCommandTests(TempMediaMixin, TestCase):
+    def test_imports_every_workbook_in_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'mutira.xlsx'), 'wb') as fh:
+                fh.write(build_workbook({'MUTIRA-05-01-25': congregation_rows(5)}))
+            with open(os.path.join(tmp, 'baricho.xlsx'), 'wb') as fh:
+                fh.write(build_workbook({'BARICHO-05-01-25': congregation_rows(3), 'BARICHO-12-01-25': []}))
+            out = io.StringIO()
+            call_command('import_workbooks', tmp, stdout=out)
+
+        self.assertIn('Imported 8 rows', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(AttendanceRecord.objects.filter(archdeaconry__name='BARICHO').count(), 3)
+        self.assertEqual(AttendanceRecord.objects.count(), 8)
+
+    def test_workbooks_of_the_same_name_in_different_folders_are_kept_apart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for arch in ('mutira', 'baricho'):
+                os.mkdir(os.path.join(tmp, arch))
+                with open(os.path.join(tmp, arch, '2025.xlsx'), 'wb') as fh:
+                    fh.write(build_workbook({f'{arch.upper()}-05-01-25': congregation_rows(2)}))
+            call_command('import_workbooks', tmp, '--recursive', stdout=io.StringIO())
+            out = io.StringIO()
+            call_command('import_workbooks', tmp, '--recursive', stdout=out)
+
+        self.assertEqual(
+            sorted(UploadedWorkbook.objects.values_list('file_name', flat=True)),
+            ['baricho/2025.xlsx', 'mutira/2025.xlsx'],
+        )
+        self.assertEqual(AttendanceRecord.objects.filter(archdeaconry__name='BARICHO').count(), 2)
+        self.assertEqual(AttendanceRecord.objects.filter(archdeaconry__name='MUTIRA').count(), 2)
+        self.assertIn('Skipped 2 unchanged workbook(s)', out.getvalue())
+
+
+class BenchmarkIngestionTests(TempMediaMixin, TestCase):
+    def test_synthetic_workbooks_ingest_cleanly(self):
+        diocese = SyntheticDiocese(archdeaconries=2, parishes=2, congregations=3, sundays=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            diocese.write_workbooks(tmp)
+            call_command('import_workbooks', tmp, stdout=io.StringIO())
+        self.assertEqual(AttendanceRecord.objects.count(), diocese.row_count)
+        self.assertEqual(Congregation.objects.count(), 2 * 2 * 3)
+
+    def test_benchmark_appends_results_and_rolls_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            for _ in range(2):
+                call_command(
+                    'benchmark_ingestion', archdeaconries=1, parishes=2, congregations=2, sundays=2,
+                    runs=1, output=output, stdout=io.StringIO(),
+                )
+            with open(output) as fh:
+                results = json.load(fh)
+
+        self.assertEqual(len(results), 2)
+        run = results[-1]['runs'][0]
+        self.assertEqual(run['rows'], 8)
+        self.assertEqual(run['errors'], 0)
+        self.assertGreater(run['queries'], 0)
+        self.assertGreater(run['rows_per_second'], 0)
+        self.assertNotIn('peak_rss_mb', run)
+        self.assertGreater(results[-1]['process_peak_rss_mb'], 0)
+        self.assertEqual(AttendanceRecord.objects.count(), 0)
+
+
+class StreamingReaderMemoryTests(SimpleTestCase):
+    def peak_memory_reading(self, row_count, streaming=True):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'book.xlsx')
+            write_workbook_file(path, 'MUTIRA-05-01-25', row_count)
+
+            tracemalloc.start()
+            wb = open_workbook(path) if streaming else openpyxl.load_workbook(path)
+            read = 0
+            try:
+                for _, rows in iter_workbook_sheets(wb):
+                    read += sum(1 for _ in rows)
+            finally:
+                wb.close()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.assertEqual(read, row_count)
+        return peak
+
+    def test_peak_memory_stays_flat_as_rows_grow(self):
+        fully_loaded = self.peak_memory_reading(1000, streaming=False)
+        small = self.peak_memory_reading(1000)
+        large = self.peak_memory_reading(10000)
+
+        # Streaming ten times the rows costs less than fully loading the small workbook
+        self.assertLess(large, fully_loaded)
+        # Only the XML parser's emptied row elements remain, a few dozen bytes per row
+        self.assertLess((large - small) / 9000, 100)
@@ -0,0 +1,164 @@
+import datetime
+
+from django.db.models import Avg, F, FloatField, Max, RowRange, Window
+from django.db.models.functions import Cast, ExtractMonth, ExtractWeek, Lag
+
+from core_apps.attendance.models import AttendanceRollup
+from core_apps.attendance.rollups import month_start
+
+from .analytics import dashboard_scope
+
+Period = AttendanceRollup.Period
+Level = AttendanceRollup.Level
+
+LEVELS = [Level.ARCHDEACONRY, Level.PARISH, Level.CONGREGATION]
+ROLLING_WEEKS = (4, 12)
+# Partitioning by the month or week of the year makes the previous row of a
+# node the same period in the latest earlier year it reported, however many
+# periods are missing in between
+SAME_PERIOD = {Period.MONTH: ExtractMonth('period_start'), Period.WEEK: ExtractWeek('period_start')}
+ATTENDANCE = F('sunday_school') + F('adults') + F('youth') + F('diff_abled')
+# Changes compare averages per reporting congregation and Sunday, so a month with
+# five Sundays or a congregation that did not report does not show up as growth
+ATTENDANCE_PER_RECORD = Cast(ATTENDANCE, FloatField()) / F('record_count')
+COLLECTION_PER_RECORD = Cast('total_collection', FloatField()) / F('record_count')
+
+
+def node_window(expression, *partition, **kwargs):
+    return Window(expression, partition_by=[F('node_id'), *partition], order_by=F('period_start').asc(), **kwargs)
+
+
+def year_before(day):
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        # 29 February
+        return day.replace(year=day.year - 1, day=28)
+
+
+def change(current, previous):
+    """
+    Percentage change from ``previous`` to ``current``; ``None`` when there is nothing to compare with.
+    """
+    if previous is None or not previous:
+        return None
+    return round(float((current - previous) / previous * 100), 2)
+
+
+def trend_rows(period, level, start_date, end_date, scope):
+    """
+    The rollup rows of ``level`` between ``start_date`` and ``end_date`` with their
+    window values. The windows look back over a year of earlier rows, so the
+    first rows in range still have a previous period, a year-ago period and a
+    full rolling window; only the rows in range are returned.
+    """
+    if period == Period.MONTH:
+        start_date = month_start(start_date)
+        lookback = year_before(start_date)
+    else:
+        lookback = start_date - datetime.timedelta(weeks=52)
+
+    annotations = {
+        'attendance': ATTENDANCE,
+        'attendance_per_record': ATTENDANCE_PER_RECORD,
+        'collection_per_record': COLLECTION_PER_RECORD,
+        'previous_start': node_window(Lag('period_start')),
+        'previous_attendance': node_window(Lag(ATTENDANCE_PER_RECORD)),
+        'previous_collection': node_window(Lag(COLLECTION_PER_RECORD)),
+        'year_start': node_window(Lag('period_start'), SAME_PERIOD[period]),
+        'year_attendance': node_window(Lag(ATTENDANCE_PER_RECORD), SAME_PERIOD[period]),
+        'year_collection': node_window(Lag(COLLECTION_PER_RECORD), SAME_PERIOD[period]),
+        # The running maximum of the ordered dates is the row's own date. Filtering on
+        # a window value makes Django wrap the window query in a subquery, so the
+        # lookback rows still feed the windows but never leave the database
+        'in_range_start': node_window(Max('period_start')),
+    }
+    if period == Period.WEEK:
+        for weeks in ROLLING_WEEKS:
+            frame = RowRange(start=-(weeks - 1), end=0)
+            annotations[f'attendance_avg_{weeks}w'] = node_window(Avg(ATTENDANCE), frame=frame)
+            annotations[f'collection_avg_{weeks}w'] = node_window(Avg('total_collection'), frame=frame)
+            annotations[f'window_start_{weeks}w'] = node_window(Lag('period_start', weeks - 1))
+
+    return (
+        AttendanceRollup.objects
+        .filter(period=period, level=level, period_start__range=(lookback, end_date), **scope)
+        .annotate(**annotations)
+        .filter(in_range_start__gte=start_date)
+        .order_by('node_id', 'period_start')
+        .values(
+            'node_id', 'period_start', 'record_count', 'total_collection', *annotations,
+            name=F(f'{level}__name'),
+        )
+    )
+
+
+def trend_point(period, row):
+    previous = month_start(row['period_start'] - datetime.timedelta(days=1)) if period == Period.MONTH else (
+        row['period_start'] - datetime.timedelta(weeks=1)
+    )
+    year_ago = year_before(row['period_start']) if period == Period.MONTH else (
+        row['period_start'] - datetime.timedelta(weeks=52)
+    )
+    # LAG returns the previous reported row; only compare when it is the right period
+    has_previous = row['previous_start'] == previous
+    has_year = row['year_start'] == year_ago
+    point = {
+        'period_start': row['period_start'].isoformat(),
+        'record_count': row['record_count'],
+        'attendance': row['attendance'],
+        'total_collection': float(row['total_collection']),
+        'attendance_per_record': round(row['attendance_per_record'], 2),
+        'collection_per_record': round(row['collection_per_record'], 2),
+        'attendance_change': change(
+            row['attendance_per_record'], row['previous_attendance'] if has_previous else None
+        ),
+        'collection_change': change(
+            row['collection_per_record'], row['previous_collection'] if has_previous else None
+        ),
+        'attendance_yoy_change': change(row['attendance_per_record'], row['year_attendance'] if has_year else None),
+        'collection_yoy_change': change(row['collection_per_record'], row['year_collection'] if has_year else None),
+    }
+    if period == Period.WEEK:
+        for weeks in ROLLING_WEEKS:
+            # The last ``weeks`` rows only span that many Sundays when none is missing
+            full = row[f'window_start_{weeks}w'] == row['period_start'] - datetime.timedelta(weeks=weeks - 1)
+            for name in (f'attendance_avg_{weeks}w', f'collection_avg_{weeks}w'):
+                point[name] = round(float(row[name]), 2) if full else None
+    return point
+
+
+def build_trends(period, start_date, end_date, level=None, archdeaconry_id=None, parish_id=None,
+                 congregation_id=None):
+    """
+    Per-node attendance and collection series for ``level`` (default: the level of
+    the filter), with changes in the per-record averages against the previous
+    period and the same period a year earlier and, for weekly series, rolling
+    averages of the totals over the last 4 and 12 Sundays, which are ``None``
+    unless the node reported every one of them. All window
+    values are computed by the database. Returns ``None`` when there is no data.
+    Raises ``ValueError`` for a ``level`` coarser than the filter.
+    """
+    scope_level, scope = dashboard_scope(archdeaconry_id, parish_id, congregation_id)
+    level = level or scope_level
+    if LEVELS.index(level) < LEVELS.index(scope_level):
+        raise ValueError(f"level must be {scope_level} or finer for this filter")
+
+    rows = list(trend_rows(period, level, start_date, end_date, scope))
+    if not rows:
+        return None
+    series = {}
+    for row in rows:
+        entry = series.get(row['node_id'])
+        if entry is None:
+            entry = series[row['node_id']] = {
+                'id': row['node_id'], 'name': row['name'], 'points': [],
+            }
+        entry['points'].append(trend_point(period, row))
+    return {
+        'period': period,
+        'level': level,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'series': sorted(series.values(), key=lambda entry: (entry['name'] or '', entry['id'])),
+    }
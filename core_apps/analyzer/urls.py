@@ -1,12 +1,24 @@
 from django.urls import path
-from .views import WorkbookUploadView,DashboardAnalytics,ArchdeaconryListView,CongregationListView,ParishListView,CongregationsByArchdeaconryView,RecordsListView
+from .views import WorkbookUploadView,UploadJobDetailView,ChunkedUploadView,ChunkedUploadDetailView,ChunkedUploadChunkView,ChunkedUploadFinalizeView,DashboardAnalytics,AsyncDashboardAnalytics,TrendsView,LeaderboardView,ArchdeaconryListView,CongregationListView,ParishListView,CongregationsByArchdeaconryView,RecordsListView,RecordsExportView,AnomaliesListView,AsyncRecordsListView
 
 urlpatterns = [
     path('upload-workbook/', WorkbookUploadView.as_view(), name='upload-workbook'),
+    path('upload-jobs/<int:pk>/', UploadJobDetailView.as_view(), name='upload-job-detail'),
+    path('upload-chunks/', ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('upload-chunks/<uuid:pk>/', ChunkedUploadDetailView.as_view(), name='chunked-upload-detail'),
+    path('upload-chunks/<uuid:pk>/<int:index>/', ChunkedUploadChunkView.as_view(), name='chunked-upload-chunk'),
+    path('upload-chunks/<uuid:pk>/finalize/', ChunkedUploadFinalizeView.as_view(), name='chunked-upload-finalize'),
     path('dashboard/', DashboardAnalytics.as_view(), name='dashboard-analytics'),
+    path('trends/', TrendsView.as_view(), name='trends'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    # Async variants for ASGI deployments (SERVER_INTERFACE=asgi)
+    path('async/dashboard/', AsyncDashboardAnalytics.as_view(), name='async-dashboard-analytics'),
+    path('async/records/', AsyncRecordsListView.as_view(), name='async-records'),
     path('archdeaconries/', ArchdeaconryListView.as_view()),
     path('parishes/', ParishListView.as_view()),
     path('records/', RecordsListView.as_view()),
+    path('records/export/', RecordsExportView.as_view(), name='records-export'),
+    path('anomalies/', AnomaliesListView.as_view(), name='anomalies'),
     path('congregations/', CongregationListView.as_view()),
     path('congregations/by_archdeaconry/', CongregationsByArchdeaconryView.as_view()),
 ]
@@ -1,261 +1,346 @@
-import datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import openpyxl
 from rest_framework.parsers import MultiPartParser, FormParser
-from core_apps.attendance.models import AttendanceRecord
+from core_apps.attendance.models import AttendanceAnomaly, AttendanceRecord
 from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder
+from django.utils.http import parse_etags, quote_etag
+import json
+import math
+import time
+from functools import partial
 import pandas as pd
 import numpy as np
 from django.db.models import Sum, Count, F, ExpressionWrapper, FloatField, Avg
 from datetime import timedelta
 from django.utils import timezone
+from django.shortcuts import get_object_or_404
+from django.conf import settings
 from loguru import logger
 from django.core.paginator import Paginator
 
-from .serializers import WorkbookUploadSerializer
-from .models import UploadedWorkbook
-from core_apps.common.models import Archdeaconry, Parish, Congregation
+from . import chunked
+from .serializers import WorkbookUploadSerializer, UploadJobSerializer, ChunkedUploadInitSerializer
+from .models import UploadJob, ChunkedUpload
+from .ingestion import smart_title
+from .jobs import enqueue_upload
+from .dry_run import dry_run_uploads
+from .exports import ARROW_FORMATS, EXPORT_CHUNK_SIZE, XLSX_MAX_ROWS, arrow_export, iter_csv, write_xlsx
+from .analytics import (
+    DASHBOARD_SOURCES, abuild_dashboard, build_dashboard, dashboard_cache_key, dashboard_fingerprint,
+    parse_sections,
+)
+from .trends import LEVELS, build_trends
+from .leaderboard import (
+    LEADERBOARD_LIMIT, LEADERBOARD_MAX_WEEKS, LEADERBOARD_MIN_SUNDAYS, LEADERBOARD_SORTS, LEADERBOARD_WEEKS,
+    build_leaderboard,
+)
+from .pipeline import (
+    ingest_workbooks, iter_ingest_workbooks, new_file_summary, register_upload, unchanged_file_summary,
+)
+from core_apps.common.concurrency import gather_in_threads
+from core_apps.common.hierarchy import hierarchy_cache
 from core_apps.attendance.models import AttendanceRecord
 
+
+def query_flag(request, name):
+    return str(request.query_params.get(name, '')).lower() in ['true', '1', 'yes']
+
+
+def ingest_uploaded_files(request, files):
+    """
+    Ingest uploaded files in-line, or queue them for run_ingest_worker with ``?background=true``.
+    ``?dry_run=true`` only validates the files and reports what they would change.
+    """
+    if query_flag(request, 'dry_run'):
+        return Response(dry_run_uploads(files), status=status.HTTP_200_OK)
+
+    # One NDJSON line per sheet and per file, written as they finish
+    if query_flag(request, 'stream'):
+        # Files are stored before the response starts, as the request's uploads are closed after it
+        registered = [(file.name, *register_upload(file)) for file in files]
+        response = StreamingHttpResponse(stream_ingest(registered), content_type='application/x-ndjson')
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    # Hand the batch to run_ingest_worker and return straight away
+    if query_flag(request, 'background'):
+        job = enqueue_upload(files)
+        return Response(UploadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    summary = []
+    entries = []
+    for file in files:
+        upload, created, unchanged = register_upload(file)
+        # An identical re-upload is answered from the stored hashes alone
+        if unchanged:
+            summary.append(unchanged_file_summary(upload))
+            continue
+        file_summary = new_file_summary(file.name, created)
+        summary.append(file_summary)
+        entries.append((upload, file_summary, {}))
+
+    # Parses in a process pool when INGEST_PARSE_WORKERS > 1
+    ingest_workbooks(entries)
+
+    return Response(summary, status=status.HTTP_200_OK)
+
+
+def ndjson_line(data):
+    return json.dumps(data, default=str) + '\n'
+
+
+def stream_ingest(registered):
+    """
+    Ingest ``(file_name, upload, created, unchanged)`` entries from ``register_upload``,
+    yielding NDJSON progress lines: a ``sheet`` line after
+    each sheet, a ``file`` line after each file and a closing ``batch`` line.
+    Sheet errors go out with their sheet line; a file line only repeats errors
+    that no sheet line carried, so no summary of the whole batch is kept.
+    """
+    started = time.perf_counter()
+    totals = {'files': len(registered), 'rows_written': 0, 'errors': 0}
+
+    def elapsed():
+        return round(time.perf_counter() - started, 3)
+
+    def file_line(file_summary, rows_written, reported_errors):
+        totals['errors'] += len(file_summary['errors'])
+        return ndjson_line({
+            'type': 'file',
+            'file': file_summary['file'],
+            'new_upload': file_summary['new_upload'],
+            'processed': file_summary['processed'],
+            'rows_written': rows_written,
+            'error_count': len(file_summary['errors']),
+            'errors': file_summary['errors'][reported_errors:],
+            'skipped_sheets': file_summary['skipped_sheets'],
+            'elapsed': elapsed(),
+        })
+
+    entries = []
+    for file_name, upload, created, unchanged in registered:
+        if unchanged:
+            yield file_line(unchanged_file_summary(upload), 0, 0)
+            continue
+        entries.append((upload, new_file_summary(file_name, created), {}))
+
+    rows_written = 0
+    reported_errors = 0
+    for index, event, args in iter_ingest_workbooks(entries):
+        file_summary = entries[index][1]
+        if event == 'sheet':
+            sheet_name, written, sheet_errors, skipped = args
+            rows_written += written
+            reported_errors += len(sheet_errors)
+            yield ndjson_line({
+                'type': 'sheet',
+                'file': file_summary['file'],
+                'sheet': sheet_name,
+                'rows_written': written,
+                'skipped': skipped,
+                'errors': sheet_errors,
+                'elapsed': elapsed(),
+            })
+        elif event == 'done':
+            yield file_line(file_summary, rows_written, reported_errors)
+            totals['rows_written'] += rows_written
+            rows_written = 0
+            reported_errors = 0
+
+    yield ndjson_line({'type': 'batch', **totals, 'elapsed': elapsed()})
+
+
 class WorkbookUploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)
 
     def post(self, request, *args, **kwargs):
         serializer = WorkbookUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        files = serializer.validated_data['files']
-
-        summary = []
-
-        for file in files:
-            file_name = file.name
-            file_summary = {
-                'file': file_name,
-                'new_upload': False,
-                'processed': False,
-                'errors': []
-            }
-
-            # Get or create the UploadedWorkbook record
-            upload, created = UploadedWorkbook.objects.get_or_create(
-                file_name=file_name,
-                defaults={'file': file}
-            )
-            file_summary['new_upload'] = created
-
-            if not created:
-                upload.file = file
-                upload.processed = False
-                upload.save()
-
-            # Try to open workbook
-            try:
-                wb = openpyxl.load_workbook(file)
-            except Exception as e:
-                file_summary['errors'].append(f"Failed to read file: {str(e)}")
-                summary.append(file_summary)
-                continue
-
-            sheet_date = None
-
-            # Process each sheet
-            for sheet_name in wb.sheetnames:
-                try:
-                    # Extract archname
-                    arch_name = sheet_name.rsplit('-', 3)[0].strip().upper()
-
-                    # Extract date part and convert to date object
-                    date_part = '-'.join(sheet_name.rsplit('-', 3)[1:])
-                    sheet_date = datetime.datetime.strptime(date_part, '%d-%m-%y').date()
-                except ValueError:
-                    file_summary['errors'].append(f"Invalid sheet name format: '{sheet_name}'")
-                    continue
-
-                ws = wb[sheet_name]
-
-                # Process each row
-                for idx, row in enumerate(ws.iter_rows(min_row=8), start=8):
-                    try:
-                        parish_name = self.smart_title((row[0].value or '').strip())
-                        cong_name = self.smart_title((row[1].value or '').strip())
-                        if not (arch_name and parish_name and cong_name):
-                            continue
-
-                        ss = row[2].value or 0
-                        youth = row[3].value or 0
-                        adults = row[4].value or 0
-                        diff_abled = row[5].value or 0
-                        total_col = row[7].value or 0
-                        banked = row[8].value or 0
-                        unbanked = total_col-banked or 0
-                        remarks = row[10].value or ''
-
-                        arch, _ = Archdeaconry.objects.get_or_create(name=arch_name)
-                        parish, _ = Parish.objects.get_or_create(name=parish_name, archdeaconry=arch)
-                        cong, _ = Congregation.objects.get_or_create(name=cong_name, parish=parish)
-
-                        AttendanceRecord.objects.update_or_create(
-                            archdeaconry=arch,
-                            parish=parish,
-                            congregation=cong,
-                            sunday_date=sheet_date,
-                            defaults={
-                                'workbook': upload,
-                                'sunday_school': ss,
-                                'adults': adults,
-                                'diff_abled': diff_abled,
-                                'youth': youth,
-                                'total_collection': total_col,
-                                'banked': banked,
-                                'unbanked': unbanked,
-                                'remarks': remarks,
-                            }
-                        )
-
-
-                    except Exception as row_err:
-                        file_summary['errors'].append(
-                            f"Sheet '{sheet_name}', row {idx}: {str(row_err)}"
-                        )
-                        # continue processing the rest of the rows
-
-            # Finalize upload record
-            upload.sheet_date = sheet_date or timezone.now().date()
-            # Only set upload.processed=True if there were no errors
-            upload.processed = len(file_summary['errors']) == 0
-            upload.save()
-
-            # Mark processed in summary only if no errors
-            file_summary['processed'] = upload.processed
-            summary.append(file_summary)
-
-        return Response(summary, status=status.HTTP_200_OK)
+        return ingest_uploaded_files(request, serializer.validated_data['files'])
 
     def smart_title(self,name: str) -> str:
-        # Split on spaces for multi-word names
-        words = name.split()
-        fixed_words = []
-        for word in words:
-            if "'" in word:
-                # Capitalize first letter, keep rest lowercase except after apostrophe
-                parts = word.split("'")
-                parts[0] = parts[0].capitalize()
-                # Keep the part after apostrophe lowercase
-                parts[1:] = [p.lower() for p in parts[1:]]
-                fixed_words.append("'".join(parts))
-            else:
-                fixed_words.append(word.capitalize())
-        return " ".join(fixed_words)
+        return smart_title(name)
     
     
-class DashboardAnalytics(APIView):
-    def get(self, request):
-        try:
-            start_date_str = request.query_params.get('start_date')
-            end_date_str = request.query_params.get('end_date')
-
-            end_date = pd.to_datetime(end_date_str).date() if end_date_str else timezone.now().date()
-            start_date = pd.to_datetime(start_date_str).date() if start_date_str else (end_date - timedelta(days=730))
+class ChunkedUploadView(APIView):
+    """
+    Start a resumable upload: ``POST {file_name, total_chunks, total_size}``.
+    """
+    def post(self, request):
+        serializer = ChunkedUploadInitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        chunked.purge_expired()
+        upload = serializer.save()
+        return Response(chunked_upload_status(upload), status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadDetailView(APIView):
+    """
+    Report which chunks have arrived, so an interrupted client knows what to resend.
+    """
+    def get(self, request, pk):
+        upload = get_object_or_404(ChunkedUpload, pk=pk, finalized_at__isnull=True)
+        return Response(chunked_upload_status(upload))
+
+
+class ChunkedUploadChunkView(APIView):
+    """
+    ``PUT`` the raw bytes of chunk ``index``. Re-sending a chunk replaces it.
+    """
+    def put(self, request, pk, index):
+        upload = get_object_or_404(ChunkedUpload, pk=pk, finalized_at__isnull=True)
+        if index >= upload.total_chunks:
+            return Response(
+                {"detail": f"Chunk index must be below {upload.total_chunks}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if content_length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                {"detail": f"Chunks may not exceed {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
 
-            # Optional filters
-            archdeaconry_id = request.query_params.get('archdeaconry')
-            parish_id = request.query_params.get('parish')
-            congregation_id = request.query_params.get('congregation')
+        # Read the body as a stream so the chunk goes straight to disk
+        try:
+            size = chunked.write_chunk(upload, index, request._request)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return Response({'index': index, 'size': size})
+
+
+class ChunkedUploadFinalizeView(APIView):
+    """
+    Assemble the chunks and ingest the file exactly like upload-workbook/ (including ``?background=true``).
+    With ``?dry_run=true`` the upload is left open, to be finalized again without it.
+    """
+    def post(self, request, pk):
+        upload = get_object_or_404(ChunkedUpload, pk=pk, finalized_at__isnull=True)
+        missing = chunked.missing_chunks(upload)
+        if missing:
+            return Response(
+                {"detail": "Upload is incomplete", "missing": missing},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-            # Base queryset
-            records = AttendanceRecord.objects.filter(sunday_date__range=(start_date, end_date)).select_related(
-                'congregation__parish__archdeaconry'
+        assembled = chunked.assemble(upload)
+        if upload.total_size is not None and assembled.size != upload.total_size:
+            assembled.close()
+            return Response(
+                {"detail": f"Assembled file is {assembled.size} bytes, expected {upload.total_size}"},
+                status=status.HTTP_409_CONFLICT,
             )
 
-            if congregation_id:
-                records = records.filter(congregation_id=congregation_id)
-            elif parish_id:
-                records = records.filter(congregation__parish_id=parish_id)
-            elif archdeaconry_id:
-                records = records.filter(congregation__parish__archdeaconry_id=archdeaconry_id)
+        try:
+            response = ingest_uploaded_files(request, [assembled])
+        finally:
+            assembled.close()
+        if query_flag(request, 'dry_run'):
+            # Only a report: the chunks stay so the upload can still be finalized for real
+            return response
+        upload.finalized_at = timezone.now()
+        upload.save(update_fields=['finalized_at', 'updated_at'])
+        chunked.discard(upload)
+        return response
+
+
+def chunked_upload_status(upload):
+    return {
+        'id': upload.pk,
+        'file_name': upload.file_name,
+        'total_chunks': upload.total_chunks,
+        'total_size': upload.total_size,
+        'max_chunk_size': settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+        'received': chunked.received_chunks(upload),
+        'missing': chunked.missing_chunks(upload),
+    }
+
+
+class UploadJobDetailView(APIView):
+    def get(self, request, pk):
+        job = get_object_or_404(UploadJob.objects.prefetch_related('files'), pk=pk)
+        return Response(UploadJobSerializer(job).data)
+
+
+def dashboard_params(params):
+    """
+    Parse the dashboard query parameters shared by the sync and async views.
+    Raises ``ValueError`` with a message for the client when one is invalid.
+    """
+    start_date_str = params.get('start_date')
+    end_date_str = params.get('end_date')
+
+    end_date = pd.to_datetime(end_date_str).date() if end_date_str else timezone.now().date()
+    start_date = pd.to_datetime(start_date_str).date() if start_date_str else (end_date - timedelta(days=730))
+
+    # Aggregates come from the rollup tables, computed in SQL unless ?backend= says otherwise
+    backend = params.get('backend') or settings.DASHBOARD_BACKEND
+    if backend not in DASHBOARD_SOURCES:
+        raise ValueError(f"backend must be one of: {', '.join(DASHBOARD_SOURCES)}")
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'backend': backend,
+        # Only the requested blocks (and what they depend on) are computed
+        'sections': parse_sections(params.get('sections')),
+        # Optional filters
+        'filters': {
+            'archdeaconry_id': params.get('archdeaconry'),
+            'parish_id': params.get('parish'),
+            'congregation_id': params.get('congregation'),
+        },
+    }
+
+
+def dashboard_etag(query):
+    return quote_etag(dashboard_fingerprint(
+        query['start_date'], query['end_date'], query['backend'], sections=query['sections'], **query['filters']
+    ))
+
+
+def dashboard_source(query):
+    return DASHBOARD_SOURCES[query['backend']](query['start_date'], query['end_date'], **query['filters'])
+
+
+def is_not_modified(if_none_match, etag):
+    return bool(if_none_match) and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*')
+
+
+def with_etag(response, etag):
+    response['ETag'] = etag
+    # Let clients keep a copy but revalidate it on every use
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-            if not records.exists():
-                return Response({"detail": "No data available"}, status=404)
-            
-            # Convert to DataFrame with proper typing
-            df = pd.DataFrame.from_records(records.values(
-                'id','sunday_date', 'sunday_school', 'adults', 'youth', 'diff_abled',
-                'total_collection', 'banked', 'unbanked',
-                congregation_name=F('congregation__name'),
-                parish_name=F('congregation__parish__name'),
-                archdeaconry_name=F('congregation__parish__archdeaconry__name')
-            ))
-            
-            # Ensure numeric columns
-            numeric_cols = ['sunday_school', 'adults', 'youth', 'diff_abled', 'total_collection', 'banked', 'unbanked']
-            df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
-            
-            # Calculate metrics
-            df['total_attendance'] = df[['sunday_school', 'adults', 'youth', 'diff_abled']].sum(axis=1)
-            df['month'] = pd.to_datetime(df['sunday_date']).dt.to_period('M')
-            
-            # 1. Overall statistics
-            overall_stats = {
-                "total_total_collection": float(df['total_collection'].sum()),
-                "avg_weekly_attendance": float(df['total_attendance'].mean()),
-                "growth_rate": self.calculate_growth_rate(df),
-                "banked_percentage": float((df['banked'].sum() / df['total_collection'].sum()) * 100),
-            }
-            
-            # 2. Time series analysis
-            time_series = df.groupby('month').agg({
-                'total_attendance': 'mean',
-                'total_collection': 'sum',
-                'sunday_school': 'mean',
-                'adults': 'mean'
-            }).reset_index()
-            time_series['month'] = time_series['month'].astype(str)
-             # Format numbers to prevent serialization issues
-            time_series['total_attendance'] = time_series['total_attendance'].round(1)
-            time_series['total_collection'] = time_series['total_collection'].round(2)
-            time_series = time_series.to_dict(orient='records')
-            
-            # 3. Hierarchy analysis
-            hierarchy_stats = df.groupby(['archdeaconry_name', 'parish_name', 'congregation_name']).agg({
-                'total_attendance': 'mean',
-                'total_collection': 'sum',
-                'id': 'count'
-            }).reset_index().to_dict(orient='records')
-            
-            # 4. Financial analysis - with fixed nlargest
-            financial_analysis = {
-                "banked_percentage": float((df['banked'].sum() / df['total_collection'].sum()) * 100),
-                "top_congregations": df.groupby('congregation_name')['total_collection']
-                                    .sum()
-                                    .sort_values(ascending=False)
-                                    .head(5)
-                                    .to_dict(),
-                "collection_trend": self.calculate_collection_trend(df)
-            }
-            
-            # 5. Attendance segmentation
-            attendance_segmentation = {
-                "sunday_school_avg": float(df['sunday_school'].mean()),
-                "adults_avg": float(df['adults'].mean()),
-                "youth_avg": float(df['youth'].mean()),
-                "diff_abled_avg": float(df['diff_abled'].mean()),
-                "segmentation_ratio": {
-                    "sunday_school": float((df['sunday_school'].sum() / df['total_attendance'].sum()) * 100),
-                    "adults": float((df['adults'].sum() / df['total_attendance'].sum()) * 100),
-                    "youth": float((df['youth'].sum() / df['total_attendance'].sum()) * 100),
-                    "diff_abled": float((df['diff_abled'].sum() / df['total_attendance'].sum()) * 100),
-                }
-            }
-            
-            return Response({
-                "overall": overall_stats,
-                "time_series": time_series,
-                "hierarchy": hierarchy_stats,
-                "financial": financial_analysis,
-                "attendance_segmentation": attendance_segmentation
-            })
+
+class DashboardAnalytics(APIView):
+    def get(self, request):
+        try:
+            try:
+                query = dashboard_params(request.query_params)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Nothing was uploaded since the client's copy was built
+            etag = dashboard_etag(query)
+            if is_not_modified(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+                return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+            cache_key = dashboard_cache_key(etag.strip('"'))
+            data = cache.get(cache_key)
+            if data is None:
+                source = dashboard_source(query)
+                data = build_dashboard(source, query['sections'])
+                if data is None:
+                    return Response({"detail": "No data available"}, status=404)
+                cache.set(cache_key, data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+            return with_etag(Response(data), etag)
             
         except Exception as e:
             logger.exception("Error in dashboard analytics")
@@ -264,100 +349,236 @@ class DashboardAnalytics(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def calculate_growth_rate(self, df):
-        df_sorted = df.sort_values(by='sunday_date')
-        if df_sorted.empty:
-            return 0.0
-        first = df_sorted.iloc[0]['total_attendance']
-        last = df_sorted.iloc[-1]['total_attendance']
-        if first == 0:
-            return 0.0
-        growth_rate = ((last - first) / first) * 100
-        return round(growth_rate, 2)
 
-    def calculate_collection_trend(self, df):
-        monthly = df.groupby('month')['total_collection'].sum().reset_index()
-        monthly['month'] = monthly['month'].astype(str)
-        return monthly.to_dict(orient='records')
+class AsyncDashboardAnalytics(View):
+    """
+    dashboard/ for ASGI servers: same parameters, caching and response, but the
+    aggregate queries a request needs run concurrently on separate connections.
+    """
+    async def get(self, request):
+        try:
+            try:
+                query = dashboard_params(request.GET)
+            except ValueError as e:
+                return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            etag = await sync_to_async(dashboard_etag)(query)
+            if is_not_modified(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+                return with_etag(HttpResponseNotModified(), etag)
+
+            cache_key = dashboard_cache_key(etag.strip('"'))
+            data = await cache.aget(cache_key)
+            if data is None:
+                source = dashboard_source(query)
+                data = await abuild_dashboard(source, query['sections'])
+                if data is None:
+                    return JsonResponse({"detail": "No data available"}, status=404)
+                await cache.aset(cache_key, data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+            return with_etag(JsonResponse(data, encoder=JSONEncoder), etag)
+
+        except Exception:
+            logger.exception("Error in async dashboard analytics")
+            return JsonResponse(
+                {"error": "An error occurred while processing analytics data"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TrendsView(APIView):
+    """
+    Period-over-period changes and rolling averages per archdeaconry, parish or
+    congregation, computed with window functions over the rollup tables.
+    """
+    def get(self, request):
+        params = request.query_params
+        try:
+            end_date_str = params.get('end_date')
+            start_date_str = params.get('start_date')
+            end_date = pd.to_datetime(end_date_str).date() if end_date_str else timezone.now().date()
+            start_date = pd.to_datetime(start_date_str).date() if start_date_str else (end_date - timedelta(days=365))
+        except (ValueError, OverflowError):
+            return Response(
+                {"detail": "start_date and end_date must be YYYY-MM-DD dates"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        period = params.get('period') or 'month'
+        if period not in ('week', 'month'):
+            return Response({"detail": "period must be week or month"}, status=status.HTTP_400_BAD_REQUEST)
+        level = params.get('level') or None
+        if level is not None and level not in LEVELS:
+            return Response(
+                {"detail": f"level must be one of: {', '.join(LEVELS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            data = build_trends(
+                period, start_date, end_date, level=level,
+                archdeaconry_id=params.get('archdeaconry'),
+                parish_id=params.get('parish'),
+                congregation_id=params.get('congregation'),
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if data is None:
+            return Response({"detail": "No data available"}, status=404)
+        return Response(data)
+
+
+class LeaderboardView(APIView):
+    """
+    Congregations ranked by the least-squares slope of their attendance or giving
+    over the last ``weeks`` Sundays, for the whole diocese or one archdeaconry or parish.
+    """
+    def get(self, request):
+        params = request.query_params
+        try:
+            end_date_str = params.get('end_date')
+            end_date = pd.to_datetime(end_date_str).date() if end_date_str else timezone.now().date()
+        except (ValueError, OverflowError):
+            return Response({"detail": "end_date must be a YYYY-MM-DD date"}, status=status.HTTP_400_BAD_REQUEST)
+
+        sort = params.get('sort') or 'attendance_slope'
+        if sort not in LEADERBOARD_SORTS:
+            return Response(
+                {"detail": f"sort must be one of: {', '.join(LEADERBOARD_SORTS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        order = params.get('order') or 'desc'
+        if order not in ('asc', 'desc'):
+            return Response({"detail": "order must be asc or desc"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            weeks = int(params.get('weeks', LEADERBOARD_WEEKS))
+            limit = int(params.get('limit', LEADERBOARD_LIMIT))
+            min_sundays = int(params.get('min_sundays', LEADERBOARD_MIN_SUNDAYS))
+        except ValueError:
+            return Response(
+                {"detail": "weeks, limit and min_sundays must be whole numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 2 <= weeks <= LEADERBOARD_MAX_WEEKS or limit < 1:
+            return Response(
+                {"detail": f"weeks must be between 2 and {LEADERBOARD_MAX_WEEKS} and limit at least 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = build_leaderboard(
+            end_date, weeks=weeks, sort=sort, descending=order == 'desc', limit=limit,
+            min_sundays=min_sundays, archdeaconry_id=params.get('archdeaconry'), parish_id=params.get('parish'),
+        )
+        if data is None:
+            return Response({"detail": "No data available"}, status=404)
+        return Response(data)
 
 
 # views.py
+def query_ids(value):
+    """
+    Parse one id or a comma separated list of ids, ignoring anything that is not a number.
+    """
+    return {int(part) for part in str(value or '').split(',') if part.strip().isdigit()}
+
+
 class ArchdeaconryListView(APIView):
     def get(self, request):
-        archdeaconries = Archdeaconry.objects.all().values('id', 'name')
-        return Response(archdeaconries)
+        return Response(hierarchy_cache.get().archdeaconry_list)
 
 class ParishListView(APIView):
     def get(self, request):
         archdeaconry_id = request.query_params.get('archdeaconry_id')
-        queryset = Parish.objects.all()
+        parishes = hierarchy_cache.get().parish_list
         
         if archdeaconry_id:
-            queryset = queryset.filter(archdeaconry_id=archdeaconry_id)
+            archdeaconry_ids = query_ids(archdeaconry_id)
+            parishes = [p for p in parishes if p['archdeaconry_id'] in archdeaconry_ids]
             
-        parishes = queryset.values('id', 'name', 'archdeaconry_id')
         return Response(parishes)
 
 class CongregationListView(APIView):
     def get(self, request):
         parish_id = request.query_params.get('parish_id')
-        queryset = Congregation.objects.all()
+        congregations = hierarchy_cache.get().congregation_list
         
         if parish_id:
-            queryset = queryset.filter(parish_id=parish_id)
+            parish_ids = query_ids(parish_id)
+            congregations = [c for c in congregations if c['parish_id'] in parish_ids]
             
-        congregations = queryset.values('id', 'name', 'parish_id')
         return Response(congregations)
     
 class CongregationsByArchdeaconryView(APIView):
     def get(self, request):
-        parish_ids = request.query_params.get('parish_ids', '').split(',')
-        parish_ids = [id for id in parish_ids if id]  # Remove empty strings
+        parish_ids = query_ids(request.query_params.get('parish_ids', ''))
         
         if not parish_ids:
             return Response([])
             
-        congregations = Congregation.objects.filter(
-            parish_id__in=parish_ids
-        ).values('id', 'name', 'parish_id')
+        congregations = [
+            c for c in hierarchy_cache.get().congregation_list if c['parish_id'] in parish_ids
+        ]
         
         return Response(congregations)
 
+
+RECORD_COLUMNS = [
+    'id', 'sunday_date', 'sunday_school', 'adults', 'youth', 'remarks', 'diff_abled',
+    'total_collection', 'banked', 'unbanked', 'total_attendance',
+    'archdeaconry_name', 'parish_name', 'congregation_name'
+]
+
+
+RECORD_FILTERS = ['archdeaconry', 'parish', 'congregation', 'start_date', 'end_date']
+EXPORT_TYPES = ['csv', 'xlsx', *ARROW_FORMATS]
+
+
+def records_filters(params):
+    """
+    The records/ filters present in ``params``, e.g. to key stored exports.
+    """
+    return {name: str(params[name]).strip() for name in RECORD_FILTERS if params.get(name)}
+
+
+def records_queryset(params):
+    """
+    The filtered, newest-first records behind records/, shared by the sync and async views.
+    """
+    # Get filters from request
+    archdeaconry_id = params.get('archdeaconry')
+    parish_id = params.get('parish')
+    congregation_id = params.get('congregation')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+
+    # Build query
+    queryset = AttendanceRecord.objects.select_related(
+        'congregation__parish__archdeaconry'
+    ).annotate(
+        archdeaconry_name=F('congregation__parish__archdeaconry__name'),
+        parish_name=F('congregation__parish__name'),
+        congregation_name=F('congregation__name'),
+        total_attendance=F('sunday_school') + F('adults') + F('youth') + F('diff_abled')
+    ).order_by('-sunday_date')
+
+    # Apply filters
+    if congregation_id:
+        queryset = queryset.filter(congregation_id=congregation_id)
+    elif parish_id:
+        queryset = queryset.filter(congregation__parish_id=parish_id)
+    elif archdeaconry_id:
+        queryset = queryset.filter(congregation__parish__archdeaconry_id=archdeaconry_id)
+
+    if start_date:
+        queryset = queryset.filter(sunday_date__gte=start_date)
+
+    if end_date:
+        queryset = queryset.filter(sunday_date__lte=end_date)
+    return queryset
+
+
 class RecordsListView(APIView):
     def get(self, request):
-        # Get filters from request
-        archdeaconry_id = request.query_params.get('archdeaconry')
-        parish_id = request.query_params.get('parish')
-        congregation_id = request.query_params.get('congregation')
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('pageSize', 10))
+        queryset = records_queryset(request.query_params)
 
-        # Build query
-        queryset = AttendanceRecord.objects.select_related(
-            'congregation__parish__archdeaconry'
-        ).annotate(
-            archdeaconry_name=F('congregation__parish__archdeaconry__name'),
-            parish_name=F('congregation__parish__name'),
-            congregation_name=F('congregation__name'),
-            total_attendance=F('sunday_school') + F('adults') + F('youth') + F('diff_abled')
-        ).order_by('-sunday_date')
-        
-        # Apply filters
-        if congregation_id:
-            queryset = queryset.filter(congregation_id=congregation_id)
-        elif parish_id:
-            queryset = queryset.filter(congregation__parish_id=parish_id)
-        elif archdeaconry_id:
-            queryset = queryset.filter(congregation__parish__archdeaconry_id=archdeaconry_id)
-            
-        if start_date:
-            queryset = queryset.filter(sunday_date__gte=start_date)
-            
-        if end_date:
-            queryset = queryset.filter(sunday_date__lte=end_date)
-        
         # Get total count before pagination
         total_records = queryset.count()
         
@@ -366,11 +587,7 @@ class RecordsListView(APIView):
         page_obj = paginator.get_page(page)
 
         # Convert to list of dictionaries
-        records = list(page_obj.object_list.values(
-            'id', 'sunday_date', 'sunday_school', 'adults', 'youth', 'remarks', 'diff_abled',
-            'total_collection', 'banked', 'unbanked', 'total_attendance',
-            'archdeaconry_name', 'parish_name', 'congregation_name'
-        ))
+        records = list(page_obj.object_list.values(*RECORD_COLUMNS))
         
         return Response({
             'data': records,
@@ -379,3 +596,128 @@ class RecordsListView(APIView):
             'pageSize': page_size,
             'totalPages': paginator.num_pages
         })
+
+
+ANOMALY_COLUMNS = [
+    'id', 'sunday_date', 'kind', 'value', 'expected', 'score', 'created_at',
+    'archdeaconry_name', 'parish_name', 'congregation_name', 'file_name',
+]
+
+
+class AnomaliesListView(APIView):
+    """
+    Records flagged at ingestion, newest Sunday first, with the records/ filters
+    and ``?kind=attendance|collection|banked``.
+    """
+    def get(self, request):
+        params = request.query_params
+        page = int(params.get('page', 1))
+        page_size = int(params.get('pageSize', 10))
+        kind = params.get('kind')
+        if kind and kind not in AttendanceAnomaly.Kind.values:
+            return Response(
+                {"detail": f"kind must be one of: {', '.join(AttendanceAnomaly.Kind.values)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = AttendanceAnomaly.objects.annotate(
+            archdeaconry_name=F('archdeaconry__name'),
+            parish_name=F('parish__name'),
+            congregation_name=F('congregation__name'),
+            file_name=F('workbook__file_name'),
+        ).order_by('-sunday_date', 'congregation_name', 'kind')
+        if params.get('congregation'):
+            queryset = queryset.filter(congregation_id=params['congregation'])
+        elif params.get('parish'):
+            queryset = queryset.filter(parish_id=params['parish'])
+        elif params.get('archdeaconry'):
+            queryset = queryset.filter(archdeaconry_id=params['archdeaconry'])
+        if params.get('start_date'):
+            queryset = queryset.filter(sunday_date__gte=params['start_date'])
+        if params.get('end_date'):
+            queryset = queryset.filter(sunday_date__lte=params['end_date'])
+        if kind:
+            queryset = queryset.filter(kind=kind)
+
+        paginator = Paginator(queryset, page_size)
+        page_obj = paginator.get_page(page)
+        return Response({
+            'data': list(page_obj.object_list.values(*ANOMALY_COLUMNS)),
+            'total': paginator.count,
+            'page': page,
+            'pageSize': page_size,
+            'totalPages': paginator.num_pages
+        })
+
+
+class RecordsExportView(APIView):
+    """
+    All records matching the records/ filters as one download, read from a
+    server-side cursor: ``?type=csv`` (default) sends each line as it is read,
+    ``?type=xlsx`` builds the workbook in a temporary file in write-only mode
+    and then streams that. ``?type=parquet`` and ``?type=arrow`` keep the column
+    types and are written once per data generation and filter, then served from disk.
+    """
+    def get(self, request):
+        export_type = request.query_params.get('type') or 'csv'
+        if export_type not in EXPORT_TYPES:
+            return Response(
+                {"detail": f"type must be one of: {', '.join(EXPORT_TYPES)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        file_name = f"attendance-records-{timezone.now():%Y%m%d-%H%M}.{export_type}"
+
+        if export_type in ARROW_FORMATS:
+            export = arrow_export(
+                records_queryset(request.query_params), records_filters(request.query_params), export_type
+            )
+            return FileResponse(
+                export, as_attachment=True, filename=file_name,
+                content_type=ARROW_FORMATS[export_type][1],
+            )
+
+        queryset = records_queryset(request.query_params).values_list(*RECORD_COLUMNS)
+
+        if export_type == 'xlsx':
+            if queryset.count() > XLSX_MAX_ROWS:
+                return Response(
+                    {"detail": "Too many records for one worksheet; narrow the filters or use type=csv"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            rows = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            return FileResponse(write_xlsx(RECORD_COLUMNS, rows), as_attachment=True, filename=file_name)
+
+        rows = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(iter_csv(RECORD_COLUMNS, rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        # Let proxies pass lines on as they come
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class AsyncRecordsListView(View):
+    """
+    records/ for ASGI servers. The total count and the requested page are fetched
+    concurrently; only a page past the end costs a second round trip.
+    """
+    async def get(self, request):
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('pageSize', 10))
+        queryset = records_queryset(request.GET).values(*RECORD_COLUMNS)
+
+        def page_rows(number):
+            offset = (number - 1) * page_size
+            return list(queryset[offset:offset + page_size]) if number >= 1 else []
+
+        total_records, records = await gather_in_threads(queryset.count, partial(page_rows, page))
+        # Same as Paginator.get_page: at least one page, out of range numbers show the last one
+        total_pages = max(math.ceil(total_records / page_size), 1)
+        if not 1 <= page <= total_pages:
+            [records] = await gather_in_threads(partial(page_rows, total_pages))
+
+        return JsonResponse({
+            'data': records,
+            'total': total_records,
+            'page': page,
+            'pageSize': page_size,
+            'totalPages': total_pages
+        }, encoder=JSONEncoder)
@@ -0,0 +1,156 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from loguru import logger
+
+from core_apps.common.concurrency import closing_connections
+from core_apps.common.hierarchy import hierarchy_cache
+
+from .analytics import DASHBOARD_SOURCES, build_dashboard, dashboard_cache_key, dashboard_fingerprint
+
+WARM_SCOPES = ('diocese', 'archdeaconry', 'parish', 'congregation')
+WARM_WINDOWS = ('default', 'year')
+
+
+def warm_windows(names, today=None):
+    """
+    ``(start_date, end_date)`` for each named window, resolved the way dashboard/ resolves its defaults.
+    """
+    today = today or timezone.now().date()
+    windows = {
+        'default': (today - datetime.timedelta(days=730), today),
+        'year': (today.replace(month=1, day=1), today),
+    }
+    return [windows[name] for name in names]
+
+
+def warm_filters(scopes):
+    """
+    The dashboard filters for each scope: the whole diocese, or one per archdeaconry, parish or congregation.
+    """
+    hierarchy = hierarchy_cache.get()
+    filters = []
+    if 'diocese' in scopes:
+        filters.append({})
+    if 'archdeaconry' in scopes:
+        filters += [{'archdeaconry_id': str(pk)} for pk in hierarchy.archdeaconries]
+    if 'parish' in scopes:
+        filters += [{'parish_id': str(pk)} for pk in hierarchy.parishes]
+    if 'congregation' in scopes:
+        filters += [{'congregation_id': str(pk)} for pk in hierarchy.congregations]
+    return filters
+
+
+def warm_combinations(scopes=None, windows=None, limit=None):
+    """
+    ``(start_date, end_date, filters)`` for every configured scope and window,
+    coarsest scopes first and cut to ``limit`` (default DASHBOARD_WARM_MAX_COMBINATIONS).
+    Raises ``ValueError`` for unknown names.
+    """
+    scopes = [scope.strip() for scope in (scopes or settings.DASHBOARD_WARM_SCOPES) if scope.strip()]
+    windows = [window.strip() for window in (windows or settings.DASHBOARD_WARM_WINDOWS) if window.strip()]
+    unknown = (set(scopes) - set(WARM_SCOPES)) | (set(windows) - set(WARM_WINDOWS))
+    if unknown:
+        raise ValueError(f"Unknown warm-up scope(s) or window(s): {', '.join(sorted(unknown))}")
+    combinations = [
+        (start_date, end_date, filters)
+        for filters in warm_filters(scopes)
+        for start_date, end_date in warm_windows(windows)
+    ]
+    limit = settings.DASHBOARD_WARM_MAX_COMBINATIONS if limit is None else limit
+    if len(combinations) > limit:
+        # More would push the warmed dashboards out of the cache they are warmed into
+        logger.warning(
+            f"Warming {limit} of {len(combinations)} dashboards; raise DASHBOARD_WARM_MAX_COMBINATIONS "
+            f"(and DJANGO_CACHE_MAX_ENTRIES) or narrow DASHBOARD_WARM_SCOPES to warm them all"
+        )
+    return combinations[:limit]
+
+
+def warm_dashboard(start_date, end_date, filters, backend, force=False):
+    """
+    Build and cache the full dashboard for one combination, under the key
+    dashboard/ looks up. Returns ``'cached'`` when it was already there,
+    ``'empty'`` when there is no data and ``'built'`` otherwise.
+    """
+    key = dashboard_cache_key(dashboard_fingerprint(start_date, end_date, backend, **filters))
+    if not force and cache.get(key) is not None:
+        return 'cached'
+    data = build_dashboard(DASHBOARD_SOURCES[backend](start_date, end_date, **filters))
+    if data is None:
+        return 'empty'
+    cache.set(key, data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return 'built'
+
+
+def warm_dashboard_cache(combinations=None, workers=None, backend=None, force=False):
+    """
+    Precompute the dashboards for ``combinations`` (default: the configured ones)
+    on a pool of at most ``workers`` threads. Combinations whose data did not
+    change since they were cached are skipped. Returns a summary of the run.
+    """
+    combinations = warm_combinations() if combinations is None else combinations
+    backend = backend or settings.DASHBOARD_BACKEND
+    started = time.perf_counter()
+    summary = {'combinations': len(combinations), 'built': 0, 'cached': 0, 'empty': 0, 'failed': 0}
+
+    with ThreadPoolExecutor(max_workers=max(workers or settings.DASHBOARD_WARM_WORKERS, 1)) as pool:
+        futures = [
+            pool.submit(closing_connections(partial(warm_dashboard, *combination, backend=backend, force=force)))
+            for combination in combinations
+        ]
+        for future in futures:
+            try:
+                summary[future.result()] += 1
+            except Exception:
+                logger.exception("Dashboard warm-up failed for one combination")
+                summary['failed'] += 1
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+class WarmingScheduler:
+    """
+    Runs ``warm_dashboard_cache`` in a background thread of this process, one run
+    at a time. Uploads finishing while a run is in progress queue one more run;
+    further requests are folded into it, since it will see their data too.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queued = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dashboard-warming')
+
+    def request(self):
+        with self._lock:
+            if self._queued:
+                return None
+            self._queued = True
+        return self._executor.submit(closing_connections(self._run))
+
+    def _run(self):
+        with self._lock:
+            self._queued = False
+        try:
+            summary = warm_dashboard_cache()
+            logger.info(f"Dashboard cache warmed: {summary}")
+        except Exception:
+            logger.exception("Dashboard warm-up failed")
+
+
+warming_scheduler = WarmingScheduler()
+
+
+def schedule_dashboard_warming():
+    """
+    Warm the dashboard cache in the background once the current transaction
+    commits, if ``DASHBOARD_WARM_AFTER_UPLOAD`` is on. Nothing runs if it rolls back.
+    """
+    if settings.DASHBOARD_WARM_AFTER_UPLOAD:
+        transaction.on_commit(warming_scheduler.request)
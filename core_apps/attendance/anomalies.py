@@ -0,0 +1,124 @@
+import math
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AttendanceAnomaly, CongregationBaseline
+
+Kind = AttendanceAnomaly.Kind
+
+BULK_BATCH_SIZE = 1000
+BASELINE_FIELDS = [
+    'sundays', 'last_sunday', 'attendance_mean', 'attendance_variance', 'collection_mean', 'collection_variance',
+]
+# Fields a record needs for the check, e.g. to read back merged records with ``only()``
+RECORD_FIELDS = [
+    'workbook_id', 'archdeaconry_id', 'parish_id', 'congregation_id', 'sunday_date',
+    'sunday_school', 'adults', 'youth', 'diff_abled', 'total_collection', 'banked',
+]
+
+
+def fold(mean, variance, sundays, value, span):
+    """
+    One step of an exponentially weighted mean and variance over about ``span``
+    Sundays. Until that many are in, each Sunday weighs ``1 / n`` so the first
+    values give a plain mean and variance instead of being dominated by the first.
+    """
+    alpha = max(1 / (sundays + 1), 2 / (span + 1))
+    diff = value - mean
+    increment = alpha * diff
+    return mean + increment, (1 - alpha) * (variance + diff * increment)
+
+
+def spread(mean, variance):
+    """
+    The standard deviation scores are measured in, floored at a fraction of the mean
+    so a congregation reporting the same figures every week is not flagged for a small change.
+    """
+    return max(math.sqrt(variance), settings.ANOMALY_MIN_SPREAD * abs(mean), 1.0)
+
+
+def check_record(record, baseline, anomalies):
+    """
+    Append the anomalies of ``record`` to ``anomalies`` and, if it is a newer
+    Sunday than the baseline has seen, fold it in. Returns whether ``baseline`` changed.
+    """
+    threshold = settings.ANOMALY_THRESHOLD
+    ready = baseline.sundays >= settings.ANOMALY_MIN_SUNDAYS
+    newer = baseline.sundays == 0 or record.sunday_date > baseline.last_sunday
+    flag = {
+        'workbook_id': record.workbook_id, 'archdeaconry_id': record.archdeaconry_id,
+        'parish_id': record.parish_id, 'congregation_id': record.congregation_id,
+        'sunday_date': record.sunday_date,
+    }
+
+    collection = float(record.total_collection)
+    if record.banked > record.total_collection:
+        anomalies.append(AttendanceAnomaly(kind=Kind.BANKED, value=float(record.banked), expected=collection, **flag))
+
+    values = {
+        Kind.ATTENDANCE: float(record.sunday_school + record.adults + record.youth + record.diff_abled),
+        Kind.COLLECTION: collection,
+    }
+    for kind, value in values.items():
+        mean = getattr(baseline, f'{kind}_mean')
+        variance = getattr(baseline, f'{kind}_variance')
+        scale = spread(mean, variance)
+        score = (value - mean) / scale
+        if ready and abs(score) > threshold:
+            anomalies.append(AttendanceAnomaly(kind=kind, value=value, expected=mean, score=round(score, 2), **flag))
+        if newer:
+            # Outliers enter clipped to the threshold: a typo barely moves the baseline,
+            # while a lasting change still shifts it within a few Sundays
+            if ready:
+                value = mean + max(-threshold, min(threshold, score)) * scale
+            mean, variance = fold(mean, variance, baseline.sundays, value, settings.ANOMALY_BASELINE_SUNDAYS)
+            setattr(baseline, f'{kind}_mean', mean)
+            setattr(baseline, f'{kind}_variance', variance)
+    if newer:
+        baseline.sundays += 1
+        baseline.last_sunday = record.sunday_date
+    return newer
+
+
+def detect_anomalies(records):
+    """
+    Check freshly written attendance records (at most one per congregation and
+    Sunday) against their congregations' stored baselines, replace the flags of
+    those Sundays and fold newer Sundays into the baselines. Each record costs
+    O(1) work and the whole call a fixed number of queries, whatever the history.
+    Must run in the transaction that wrote the records. Returns the number of flags.
+    """
+    records = sorted(records, key=lambda record: record.sunday_date)
+    if not records:
+        return 0
+    baselines = CongregationBaseline.objects.in_bulk(
+        {record.congregation_id for record in records}, field_name='congregation_id'
+    )
+    anomalies, changed = [], {}
+    for record in records:
+        baseline = baselines.get(record.congregation_id)
+        if baseline is None:
+            baseline = baselines[record.congregation_id] = CongregationBaseline(
+                congregation_id=record.congregation_id, last_sunday=record.sunday_date
+            )
+        if check_record(record, baseline, anomalies):
+            changed[record.congregation_id] = baseline
+
+    congregations_by_date = {}
+    for record in records:
+        congregations_by_date.setdefault(record.sunday_date, set()).add(record.congregation_id)
+    AttendanceAnomaly.objects.filter(reduce(or_, (
+        Q(sunday_date=day, congregation_id__in=congregations) for day, congregations in congregations_by_date.items()
+    ))).delete()
+    AttendanceAnomaly.objects.bulk_create(anomalies, batch_size=BULK_BATCH_SIZE)
+    CongregationBaseline.objects.bulk_create(
+        changed.values(),
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['congregation'],
+        update_fields=BASELINE_FIELDS,
+    )
+    return len(anomalies)
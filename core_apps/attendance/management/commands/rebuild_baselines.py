@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core_apps.attendance.anomalies import RECORD_FIELDS, detect_anomalies
+from core_apps.attendance.models import AttendanceAnomaly, AttendanceRecord, CongregationBaseline
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every congregation baseline and anomaly flag by replaying AttendanceRecord "
+        "one Sunday at a time, as ingestion would have. Use after importing history out of "
+        "order, deleting records or changing the ANOMALY_* settings."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        flagged = sundays = 0
+        with transaction.atomic():
+            AttendanceAnomaly.objects.all().delete()
+            CongregationBaseline.objects.all().delete()
+            records = AttendanceRecord.objects.order_by('sunday_date', 'congregation_id').only(*RECORD_FIELDS)
+            batch = []
+            for record in records.iterator(chunk_size=CHUNK_SIZE):
+                if batch and record.sunday_date != batch[0].sunday_date:
+                    flagged += detect_anomalies(batch)
+                    sundays += 1
+                    batch = []
+                batch.append(record)
+            if batch:
+                flagged += detect_anomalies(batch)
+                sundays += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {sundays} Sunday(s) and flagged {flagged} anomal{'y' if flagged == 1 else 'ies'} "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,61 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min, Q
+
+from core_apps.attendance.models import AttendanceRecord, AttendanceRollup
+from core_apps.attendance.rollups import month_end, month_start, replace_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the weekly and monthly attendance rollups from AttendanceRecord, "
+        "one month at a time. Use after deleting records or restoring a backup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date to rebuild, YYYY-MM-DD (default: earliest record)")
+        parser.add_argument('--end', help="Last date to rebuild, YYYY-MM-DD (default: latest record)")
+
+    def handle(self, *args, **options):
+        bounds = AttendanceRecord.objects.aggregate(first=Min('sunday_date'), last=Max('sunday_date'))
+        try:
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else bounds['first']
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else bounds['last']
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        if start is None or end is None:
+            # No records at all: nothing may be left behind
+            deleted, _ = AttendanceRollup.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"No attendance records; removed {deleted} rollup row(s)."))
+            return
+
+        # Rollups outside the records' range have no records left behind them; only
+        # an explicit --start or --end keeps the rows on its side
+        Period = AttendanceRollup.Period
+        stale = Q()
+        if not options['start']:
+            stale |= Q(period=Period.WEEK, period_start__lt=start) | Q(
+                period=Period.MONTH, period_start__lt=month_start(start)
+            )
+        if not options['end']:
+            stale |= Q(period_start__gt=end)
+        deleted = AttendanceRollup.objects.filter(stale).delete()[0] if stale else 0
+
+        written = 0
+        month = month_start(start)
+        while month <= end:
+            # Whole months, each in its own transaction, keep memory and lock times bounded
+            with transaction.atomic():
+                written += replace_rollups(AttendanceRollup.Period.WEEK, max(month, start), min(month_end(month), end))
+                written += replace_rollups(AttendanceRollup.Period.MONTH, month, month_end(month))
+            month = month_end(month) + datetime.timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} rollup row(s) from {start} to {end} and removed {deleted} outside it "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('level', models.CharField(choices=[('archdeaconry', 'Archdeaconry'), ('parish', 'Parish'), ('congregation', 'Congregation')], max_length=12)),
+                ('node_id', models.BigIntegerField()),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('sunday_school', models.PositiveBigIntegerField(default=0)),
+                ('adults', models.PositiveBigIntegerField(default=0)),
+                ('diff_abled', models.PositiveBigIntegerField(default=0)),
+                ('youth', models.PositiveBigIntegerField(default=0)),
+                ('total_collection', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('banked', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('unbanked', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('archdeaconry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='common.archdeaconry')),
+                ('congregation', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='common.congregation')),
+                ('parish', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='common.parish')),
+            ],
+            options={
+                'ordering': ['period', 'level', 'period_start'],
+                'indexes': [models.Index(fields=['period', 'level', 'period_start'], name='attendance__period_accd65_idx'), models.Index(fields=['period', 'archdeaconry', 'period_start'], name='attendance__period_5776b0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'level', 'node_id', 'period_start'), name='unique_attendance_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0007_chunked_uploads'),
+        ('attendance', '0002_attendance_rollups'),
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CongregationBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sundays', models.PositiveIntegerField(default=0)),
+                ('last_sunday', models.DateField()),
+                ('attendance_mean', models.FloatField(default=0)),
+                ('attendance_variance', models.FloatField(default=0)),
+                ('collection_mean', models.FloatField(default=0)),
+                ('collection_variance', models.FloatField(default=0)),
+                ('congregation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='baseline', to='common.congregation')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sunday_date', models.DateField()),
+                ('kind', models.CharField(choices=[('attendance', 'Attendance far from baseline'), ('collection', 'Collection far from baseline'), ('banked', 'Banked exceeds total collection')], max_length=10)),
+                ('value', models.FloatField()),
+                ('expected', models.FloatField()),
+                ('score', models.FloatField(null=True)),
+                ('archdeaconry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='common.archdeaconry')),
+                ('congregation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='common.congregation')),
+                ('parish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='common.parish')),
+                ('workbook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='analyzer.uploadedworkbook')),
+            ],
+            options={
+                'ordering': ['-sunday_date', 'congregation', 'kind'],
+                'indexes': [models.Index(fields=['sunday_date'], name='attendance__sunday__ad2da0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('congregation', 'sunday_date', 'kind'), name='unique_attendance_anomaly')],
+            },
+        ),
+    ]
@@ -46,3 +46,108 @@ class AttendanceRecord(TimeStampedModel):
 
     def __str__(self):
         return f"{self.congregation.name} @ {self.sunday_date}"
+
+
+class AttendanceRollup(models.Model):
+    """
+    Pre-aggregated sums of AttendanceRecord per week or month, at congregation,
+    parish or archdeaconry level. ``node_id`` is the id of the congregation, parish
+    or archdeaconry the row sums up; weekly rows cover the records of one Sunday.
+    Kept up to date by ingestion and rebuilt with ``rebuild_rollups``.
+    """
+    class Period(models.TextChoices):
+        WEEK = 'week', 'Week'
+        MONTH = 'month', 'Month'
+
+    class Level(models.TextChoices):
+        ARCHDEACONRY = 'archdeaconry', 'Archdeaconry'
+        PARISH = 'parish', 'Parish'
+        CONGREGATION = 'congregation', 'Congregation'
+
+    period = models.CharField(max_length=5, choices=Period.choices)
+    period_start = models.DateField()
+    level = models.CharField(max_length=12, choices=Level.choices)
+    node_id = models.BigIntegerField()
+    archdeaconry = models.ForeignKey(Archdeaconry, related_name='attendance_rollups', on_delete=models.CASCADE)
+    parish = models.ForeignKey(Parish, related_name='attendance_rollups', null=True, on_delete=models.CASCADE)
+    congregation = models.ForeignKey(
+        Congregation, related_name='attendance_rollups', null=True, on_delete=models.CASCADE
+    )
+    record_count = models.PositiveIntegerField(default=0)
+    sunday_school = models.PositiveBigIntegerField(default=0)
+    adults = models.PositiveBigIntegerField(default=0)
+    diff_abled = models.PositiveBigIntegerField(default=0)
+    youth = models.PositiveBigIntegerField(default=0)
+    total_collection = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    banked = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    unbanked = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period', 'level', 'period_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'level', 'node_id', 'period_start'], name='unique_attendance_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'level', 'period_start']),
+            models.Index(fields=['period', 'archdeaconry', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.node_id} {self.period} of {self.period_start}"
+
+
+class CongregationBaseline(models.Model):
+    """
+    A congregation's recent normal: exponentially weighted mean and variance of
+    its attendance and collection per Sunday, updated in O(1) as each newer Sunday
+    is ingested. Ingestion checks new records against it; see ``anomalies.py``.
+    """
+    congregation = models.OneToOneField(Congregation, related_name='baseline', on_delete=models.CASCADE)
+    # Sundays folded in so far and the latest of them
+    sundays = models.PositiveIntegerField(default=0)
+    last_sunday = models.DateField()
+    attendance_mean = models.FloatField(default=0)
+    attendance_variance = models.FloatField(default=0)
+    collection_mean = models.FloatField(default=0)
+    collection_variance = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Baseline of congregation {self.congregation_id} to {self.last_sunday}"
+
+
+class AttendanceAnomaly(TimeStampedModel):
+    """
+    An attendance record flagged at ingestion: figures far from the congregation's
+    baseline, or banked money exceeding the collection. Re-uploading the Sunday
+    replaces its flags.
+    """
+    class Kind(models.TextChoices):
+        ATTENDANCE = 'attendance', 'Attendance far from baseline'
+        COLLECTION = 'collection', 'Collection far from baseline'
+        BANKED = 'banked', 'Banked exceeds total collection'
+
+    workbook = models.ForeignKey(UploadedWorkbook, related_name='anomalies', on_delete=models.CASCADE)
+    archdeaconry = models.ForeignKey(Archdeaconry, related_name='anomalies', on_delete=models.CASCADE)
+    parish = models.ForeignKey(Parish, related_name='anomalies', on_delete=models.CASCADE)
+    congregation = models.ForeignKey(Congregation, related_name='anomalies', on_delete=models.CASCADE)
+    sunday_date = models.DateField()
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    value = models.FloatField()
+    # The baseline mean (or, for banked, the total collection) the value was compared with
+    expected = models.FloatField()
+    # Standard deviations from the baseline mean; None for rule-based flags
+    score = models.FloatField(null=True)
+
+    class Meta:
+        ordering = ['-sunday_date', 'congregation', 'kind']
+        constraints = [
+            models.UniqueConstraint(fields=['congregation', 'sunday_date', 'kind'], name='unique_attendance_anomaly'),
+        ]
+        indexes = [
+            models.Index(fields=['sunday_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} anomaly of congregation {self.congregation_id} @ {self.sunday_date}"
@@ -0,0 +1,142 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from core_apps.common.generations import bump_generation
+
+from .models import AttendanceRecord, AttendanceRollup
+
+Period = AttendanceRollup.Period
+Level = AttendanceRollup.Level
+
+SUM_FIELDS = ['sunday_school', 'adults', 'diff_abled', 'youth', 'total_collection', 'banked', 'unbanked']
+# The record column that identifies the node a rollup row sums up, per level
+LEVEL_NODE = {
+    Level.CONGREGATION: 'congregation_id',
+    Level.PARISH: 'parish_id',
+    Level.ARCHDEACONRY: 'archdeaconry_id',
+}
+BULK_BATCH_SIZE = 1000
+# Bumped whenever attendance figures change, so cached reports can tell they are stale
+ATTENDANCE_GENERATION = 'attendance'
+# Bumped after writes whose updated_at cannot be trusted to follow commit order
+ATTENDANCE_RELOAD_GENERATION = 'attendance-reload'
+
+
+def invalidate_attendance(reload=False):
+    """
+    Mark every cached report built from attendance data stale once the current transaction commits.
+    With ``reload``, in-process copies of the records are also told to reload them
+    whole instead of fetching the rows updated since they last looked: records
+    written in a long transaction are stamped long before they become visible.
+    """
+    def bump():
+        if reload:
+            bump_generation(ATTENDANCE_RELOAD_GENERATION)
+        bump_generation(ATTENDANCE_GENERATION)
+    transaction.on_commit(bump)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(day):
+    return (month_start(day) + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+
+
+def aggregate_records(records, period):
+    """
+    Congregation-level sums of ``records`` per week (Sunday) or month, in one GROUP BY query.
+    """
+    period_start = TruncMonth('sunday_date') if period == Period.MONTH else F('sunday_date')
+    return (
+        records.order_by()
+        .annotate(period_start=period_start)
+        .values('period_start', 'congregation_id', 'parish_id', 'archdeaconry_id')
+        .annotate(record_count=Count('id'), **{field: Sum(field) for field in SUM_FIELDS})
+    )
+
+
+def build_rollups(period, rows):
+    """
+    Roll congregation-level rows up to parishes and archdeaconries and return
+    unsaved AttendanceRollup instances for all three levels.
+    """
+    totals = {}
+    for row in rows:
+        for level, node in LEVEL_NODE.items():
+            key = (level, row[node], row['period_start'])
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = {
+                    'archdeaconry_id': row['archdeaconry_id'],
+                    'parish_id': row['parish_id'] if level != Level.ARCHDEACONRY else None,
+                    'congregation_id': row['congregation_id'] if level == Level.CONGREGATION else None,
+                    'record_count': 0,
+                    **{field: 0 for field in SUM_FIELDS},
+                }
+            entry['record_count'] += row['record_count']
+            for field in SUM_FIELDS:
+                entry[field] += row[field] or 0
+    return [
+        AttendanceRollup(period=period, level=level, node_id=node_id, period_start=start, **entry)
+        for (level, node_id, start), entry in totals.items()
+    ]
+
+
+def replace_rollups(period, start_date, end_date, **filters):
+    """
+    Recompute the ``period`` rollups whose period starts between ``start_date`` and
+    ``end_date`` from the records they cover. Month ranges must start on the 1st and
+    end on a month end. ``filters`` (e.g. ``archdeaconry_id``) narrow both sides.
+    Returns the number of rollup rows written.
+    """
+    rows = aggregate_records(
+        AttendanceRecord.objects.filter(sunday_date__range=(start_date, end_date), **filters), period
+    )
+    rollups = build_rollups(period, rows)
+    with transaction.atomic():
+        AttendanceRollup.objects.filter(
+            period=period, period_start__range=(start_date, end_date), **filters
+        ).delete()
+        AttendanceRollup.objects.bulk_create(rollups, batch_size=BULK_BATCH_SIZE)
+        invalidate_attendance()
+    return len(rollups)
+
+
+def refresh_rollups(archdeaconry_id, dates):
+    """
+    Bring the weekly and monthly rollups of one archdeaconry up to date after its
+    records for ``dates`` were written. Only the affected Sundays and months are
+    recomputed, so the cost follows the size of the upload rather than the table.
+    """
+    dates = set(dates)
+    if not dates:
+        return
+    with transaction.atomic():
+        replace_rollups(Period.WEEK, min(dates), max(dates), archdeaconry_id=archdeaconry_id)
+        replace_rollups(
+            Period.MONTH, month_start(min(dates)), month_end(max(dates)), archdeaconry_id=archdeaconry_id
+        )
+
+
+def rollup_window(start_date, end_date):
+    """
+    A filter matching the rollups that together cover exactly ``start_date`` to
+    ``end_date``: monthly rows for the whole months in the range and weekly rows
+    for the days before and after them.
+    """
+    first_full = start_date if start_date.day == 1 else month_end(start_date) + datetime.timedelta(days=1)
+    last_full = month_start(end_date) if end_date == month_end(end_date) else (
+        month_start(end_date) - datetime.timedelta(days=1)
+    ).replace(day=1)
+    if first_full > last_full:
+        return Q(period=Period.WEEK, period_start__range=(start_date, end_date))
+    return (
+        Q(period=Period.MONTH, period_start__range=(first_full, last_full))
+        | Q(period=Period.WEEK, period_start__range=(start_date, first_full - datetime.timedelta(days=1)))
+        | Q(period=Period.WEEK, period_start__range=(month_end(last_full) + datetime.timedelta(days=1), end_date))
+    )
@@ -1,3 +1,135 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.db.models import Sum
 from django.test import TestCase
 
-# Create your tests here.
+from core_apps.analyzer.ingestion import upsert_sheet
+from core_apps.analyzer.models import UploadedWorkbook
+from core_apps.common.hierarchy import hierarchy_cache
+
+from .models import AttendanceAnomaly, AttendanceRecord, AttendanceRollup, CongregationBaseline
+from .rollups import rollup_window
+
+
+def sheet_rows(count, adults=20):
+    return [
+        (idx, {
+            'parish_name': f"Parish {idx % 2}", 'cong_name': f"Congregation {idx}",
+            'sunday_school': 10, 'youth': 5, 'adults': adults, 'diff_abled': 1,
+            'total_collection': 1000, 'banked': 800, 'unbanked': 200, 'remarks': '',
+        })
+        for idx in range(count)
+    ]
+
+
+def rollup_values():
+    return sorted(AttendanceRollup.objects.values_list(
+        'period', 'period_start', 'level', 'node_id', 'record_count', 'adults', 'total_collection'
+    ))
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        hierarchy_cache.clear()
+        self.upload = UploadedWorkbook.objects.create(file_name='jan.xlsx')
+
+    def test_ingestion_keeps_rollups_in_step_with_rebuild(self):
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 1, 26), sheet_rows(4))
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 2, 2), sheet_rows(4))
+        # Re-uploading a Sunday replaces its figures rather than adding to them
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 1, 26), sheet_rows(3, adults=50))
+
+        month = AttendanceRollup.objects.get(
+            period='month', level='archdeaconry', period_start=datetime.date(2025, 1, 1)
+        )
+        self.assertEqual((month.record_count, month.adults), (4, 3 * 50 + 20))
+        self.assertEqual(AttendanceRollup.objects.filter(period='week', level='parish').count(), 4)
+
+        incremental = rollup_values()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(rollup_values(), incremental)
+
+    def test_rebuild_removes_rollups_without_records(self):
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 1, 26), sheet_rows(4))
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 2, 2), sheet_rows(4))
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 3, 2), sheet_rows(4))
+        AttendanceRecord.objects.exclude(sunday_date=datetime.date(2025, 2, 2)).delete()
+
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(
+            set(AttendanceRollup.objects.values_list('period_start', flat=True)),
+            {datetime.date(2025, 2, 2), datetime.date(2025, 2, 1)},
+        )
+
+        # An explicit range leaves the rows outside it alone
+        upsert_sheet(self.upload, 'MUTIRA', datetime.date(2025, 1, 26), sheet_rows(4))
+        AttendanceRecord.objects.filter(sunday_date=datetime.date(2025, 1, 26)).delete()
+        call_command('rebuild_rollups', '--start', '2025-02-01', stdout=io.StringIO())
+        self.assertTrue(AttendanceRollup.objects.filter(period_start=datetime.date(2025, 1, 26)).exists())
+
+    def test_window_covers_range_exactly(self):
+        for day in (datetime.date(2025, 1, 5), datetime.date(2025, 1, 26), datetime.date(2025, 2, 2),
+                    datetime.date(2025, 3, 2), datetime.date(2025, 3, 30)):
+            upsert_sheet(self.upload, 'MUTIRA', day, sheet_rows(2))
+
+        for start, end in [
+            (datetime.date(2025, 1, 10), datetime.date(2025, 3, 20)),
+            (datetime.date(2025, 1, 1), datetime.date(2025, 3, 31)),
+            (datetime.date(2025, 2, 1), datetime.date(2025, 2, 28)),
+            (datetime.date(2025, 1, 20), datetime.date(2025, 2, 10)),
+        ]:
+            expected = AttendanceRecord.objects.filter(sunday_date__range=(start, end)).aggregate(total=Sum('adults'))
+            actual = AttendanceRollup.objects.filter(rollup_window(start, end), level='archdeaconry').aggregate(
+                total=Sum('adults')
+            )
+            self.assertEqual(actual, expected, (start, end))
+
+
+def baseline_values():
+    return sorted(CongregationBaseline.objects.values_list(
+        'congregation_id', 'sundays', 'last_sunday', 'attendance_mean', 'collection_mean', 'collection_variance'
+    ))
+
+
+class AnomalyTests(TestCase):
+    def setUp(self):
+        hierarchy_cache.clear()
+        self.upload = UploadedWorkbook.objects.create(file_name='jan.xlsx')
+        self.sundays = [datetime.date(2025, 1, 5) + datetime.timedelta(weeks=week) for week in range(6)]
+
+    def test_typos_are_flagged_against_the_baseline(self):
+        for week, day in enumerate(self.sundays[:5]):
+            rows = sheet_rows(2, adults=20 + week)
+            rows[0][1]['total_collection'] = 5000 + 100 * week
+            upsert_sheet(self.upload, 'MUTIRA', day, rows)
+        self.assertFalse(AttendanceAnomaly.objects.exists())
+
+        rows = sheet_rows(2)
+        rows[0][1]['total_collection'] = 500000
+        rows[1][1]['banked'] = 1200
+        upsert_sheet(self.upload, 'MUTIRA', self.sundays[5], rows)
+        flags = {(a.congregation.name, a.kind): a for a in AttendanceAnomaly.objects.select_related('congregation')}
+        self.assertEqual(set(flags), {('Congregation 0', 'collection'), ('Congregation 1', 'banked')})
+        self.assertEqual(flags['Congregation 0', 'collection'].expected, 5200)
+        self.assertEqual(flags['Congregation 1', 'banked'].expected, 1000)
+
+        # The typo entered the baseline clipped, not at face value
+        baseline = CongregationBaseline.objects.get(congregation__name='Congregation 0')
+        self.assertEqual((baseline.sundays, baseline.last_sunday), (6, self.sundays[5]))
+        self.assertLess(baseline.collection_mean, 6000)
+
+        # A corrected re-upload clears the flags without counting the Sunday twice
+        rows[0][1]['total_collection'] = 5500
+        rows[1][1]['banked'] = 800
+        upsert_sheet(self.upload, 'MUTIRA', self.sundays[5], rows)
+        self.assertFalse(AttendanceAnomaly.objects.exists())
+        self.assertEqual(CongregationBaseline.objects.get(pk=baseline.pk).sundays, 6)
+
+    def test_rebuild_replays_ingestion(self):
+        for week, day in enumerate(self.sundays):
+            upsert_sheet(self.upload, 'MUTIRA', day, sheet_rows(3, adults=20 + 3 * week))
+        incremental = baseline_values()
+        call_command('rebuild_baselines', stdout=io.StringIO())
+        self.assertEqual(baseline_values(), incremental)
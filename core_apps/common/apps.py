@@ -6,3 +6,7 @@ class CommonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core_apps.common"
     verbose_name = _("Common" )
+
+    def ready(self):
+        # Connects the signals that invalidate the hierarchy cache
+        from . import hierarchy  # noqa: F401
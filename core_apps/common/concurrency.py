@@ -0,0 +1,30 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+def closing_connections(call):
+    """
+    Wrap ``call`` for a worker thread so the thread's database connections are
+    closed when it returns.
+    """
+    def run():
+        try:
+            return call()
+        finally:
+            # Worker threads outlive the request; do not leave their connections open
+            connections.close_all()
+    return run
+
+
+async def gather_in_threads(*calls):
+    """
+    Run blocking calls (typically ORM queries) concurrently and return their results
+    in order. Each call runs in its own worker thread and therefore on its own
+    database connection, which is closed when the call returns. The calls must not
+    depend on each other or on uncommitted data of the calling thread.
+    """
+    return await asyncio.gather(*(
+        sync_to_async(closing_connections(call), thread_sensitive=False)() for call in calls
+    ))
@@ -0,0 +1,34 @@
+import uuid
+
+from django.core.cache import caches
+
+GENERATION_KEY_PREFIX = 'generation'
+# A cache alias of its own, so reports filling the default cache never cull a token
+GENERATION_CACHE = 'generations'
+
+
+def _generation_key(name):
+    return f"{GENERATION_KEY_PREFIX}:{name}"
+
+
+def get_generation(name):
+    """
+    Return the current token for ``name``. In-process caches remember the token
+    they were built from and rebuild themselves once it changes.
+    """
+    cache = caches[GENERATION_CACHE]
+    key = _generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(name):
+    """
+    Replace the token for ``name`` so every process sharing the cache backend
+    sees its cached copies as stale. A fresh random token (rather than ``incr``)
+    keeps concurrent bumps from cancelling out on non-atomic backends.
+    """
+    caches[GENERATION_CACHE].set(_generation_key(name), uuid.uuid4().hex, timeout=None)
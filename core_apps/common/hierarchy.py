@@ -0,0 +1,151 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .generations import bump_generation, get_generation
+from .models import Archdeaconry, Parish, Congregation
+
+HIERARCHY_GENERATION = 'hierarchy'
+
+
+def smart_title(name: str) -> str:
+    # Split on spaces for multi-word names
+    words = name.split()
+    fixed_words = []
+    for word in words:
+        if "'" in word:
+            # Capitalize first letter, keep rest lowercase except after apostrophe
+            parts = word.split("'")
+            parts[0] = parts[0].capitalize()
+            # Keep the part after apostrophe lowercase
+            parts[1:] = [p.lower() for p in parts[1:]]
+            fixed_words.append("'".join(parts))
+        else:
+            fixed_words.append(word.capitalize())
+    return " ".join(fixed_words)
+
+
+def normalize_path(arch_name, parish_name='', cong_name=''):
+    """
+    Normalize a name path the way workbook ingestion stores names:
+    archdeaconries in upper case, parishes and congregations in smart title case.
+    """
+    return (
+        (arch_name or '').strip().upper(),
+        smart_title((parish_name or '').strip()),
+        smart_title((cong_name or '').strip()),
+    )
+
+
+class HierarchySnapshot:
+    """
+    An immutable copy of the Archdeaconry/Parish/Congregation tables,
+    indexed for name path -> ids and id -> name path lookups.
+    """
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.archdeaconries = {}
+        self.parishes = {}
+        self.congregations = {}
+        self.ids_by_path = {}
+
+        for arch_id, arch_name, parish_id, parish_name, cong_id, cong_name in rows:
+            self.archdeaconries[arch_id] = arch_name
+            self.ids_by_path[normalize_path(arch_name)] = (arch_id, None, None)
+            if parish_id is None:
+                continue
+            self.parishes[parish_id] = (parish_name, arch_id)
+            self.ids_by_path[normalize_path(arch_name, parish_name)] = (arch_id, parish_id, None)
+            if cong_id is None:
+                continue
+            self.congregations[cong_id] = (cong_name, parish_id)
+            self.ids_by_path[normalize_path(arch_name, parish_name, cong_name)] = (arch_id, parish_id, cong_id)
+
+        # Same order as the models' default ordering
+        self.archdeaconry_list = [
+            {'id': arch_id, 'name': name} for arch_id, name in sorted(self.archdeaconries.items())
+        ]
+        parish_order = sorted(self.parishes, key=lambda pk: (self.parishes[pk][1], self.parishes[pk][0]))
+        self.parish_list = [
+            {'id': pk, 'name': self.parishes[pk][0], 'archdeaconry_id': self.parishes[pk][1]}
+            for pk in parish_order
+        ]
+        parish_rank = {pk: rank for rank, pk in enumerate(parish_order)}
+        self.congregation_list = [
+            {'id': pk, 'name': name, 'parish_id': parish_id}
+            for pk, (name, parish_id) in sorted(
+                self.congregations.items(), key=lambda item: (parish_rank[item[1][1]], item[1][0])
+            )
+        ]
+
+    def lookup(self, arch_name, parish_name='', cong_name=''):
+        """
+        Return ``(arch_id, parish_id, cong_id)`` for a name path, or ``None``.
+        Shorter paths resolve with the missing levels set to ``None``.
+        """
+        return self.ids_by_path.get(normalize_path(arch_name, parish_name, cong_name))
+
+    def congregation_path(self, cong_id):
+        """
+        Return ``(arch_name, parish_name, cong_name)`` for a congregation id, or ``None``.
+        """
+        if cong_id not in self.congregations:
+            return None
+        cong_name, parish_id = self.congregations[cong_id]
+        parish_name, arch_id = self.parishes[parish_id]
+        return self.archdeaconries[arch_id], parish_name, cong_name
+
+
+class HierarchyCache:
+    """
+    Process-wide cache of the diocese hierarchy. The whole hierarchy is loaded
+    with one query and reused until the ``hierarchy`` generation changes, which
+    happens whenever an archdeaconry, parish or congregation is saved or deleted.
+    """
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        generation = get_generation(HIERARCHY_GENERATION)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.generation != generation:
+                self._snapshot = HierarchySnapshot(generation, self._load())
+            return self._snapshot
+
+    def clear(self):
+        self._snapshot = None
+
+    def _load(self):
+        # LEFT JOINs keep archdeaconries and parishes that have no children yet
+        return Archdeaconry.objects.order_by().values_list(
+            'id', 'name',
+            'parishes__id', 'parishes__name',
+            'parishes__congregations__id', 'parishes__congregations__name',
+        )
+
+
+hierarchy_cache = HierarchyCache()
+
+
+def invalidate_hierarchy():
+    """
+    Mark every process's hierarchy cache stale once the current transaction commits.
+    Call this after bulk operations, which do not send model signals.
+    """
+    transaction.on_commit(lambda: bump_generation(HIERARCHY_GENERATION))
+
+
+@receiver(post_save, sender=Archdeaconry)
+@receiver(post_save, sender=Parish)
+@receiver(post_save, sender=Congregation)
+@receiver(post_delete, sender=Archdeaconry)
+@receiver(post_delete, sender=Parish)
+@receiver(post_delete, sender=Congregation)
+def hierarchy_changed(sender, **kwargs):
+    invalidate_hierarchy()
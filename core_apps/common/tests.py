@@ -1,3 +1,60 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
 
-# Create your tests here.
+from .generations import bump_generation, get_generation
+from .hierarchy import hierarchy_cache
+from .models import Archdeaconry, Parish, Congregation
+
+
+class HierarchyCacheTests(TestCase):
+    def setUp(self):
+        hierarchy_cache.clear()
+        self.arch = Archdeaconry.objects.create(name='MUTIRA')
+        self.parish = Parish.objects.create(archdeaconry=self.arch, name='St Peter')
+        self.cong = Congregation.objects.create(parish=self.parish, name="Kiang'ombe")
+        self.empty_parish = Parish.objects.create(archdeaconry=self.arch, name='Baricho')
+
+    def test_lookups_are_served_from_one_query(self):
+        with self.assertNumQueries(1):
+            snapshot = hierarchy_cache.get()
+            hierarchy_cache.get()
+
+        self.assertEqual(
+            snapshot.lookup(' mutira ', 'st peter', "KIANG'OMBE"),
+            (self.arch.id, self.parish.id, self.cong.id),
+        )
+        self.assertEqual(snapshot.lookup('MUTIRA', 'Baricho'), (self.arch.id, self.empty_parish.id, None))
+        self.assertIsNone(snapshot.lookup('MUTIRA', 'St Peter', 'Unknown'))
+        self.assertEqual(snapshot.congregation_path(self.cong.id), ('MUTIRA', 'St Peter', "Kiang'ombe"))
+        self.assertEqual([p['name'] for p in snapshot.parish_list], ['Baricho', 'St Peter'])
+
+    def test_saving_a_model_invalidates_the_cache(self):
+        hierarchy_cache.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Congregation.objects.create(parish=self.empty_parish, name='Kiamutugu')
+
+        self.assertIsNotNone(hierarchy_cache.get().lookup('MUTIRA', 'Baricho', 'Kiamutugu'))
+
+    def test_list_endpoints_use_the_cache(self):
+        hierarchy_cache.get()
+        with self.assertNumQueries(0):
+            parishes = self.client.get(f'/api/v1/analyzer/parishes/?archdeaconry_id={self.arch.id}').json()
+            congregations = self.client.get(f'/api/v1/analyzer/congregations/?parish_id={self.parish.id}').json()
+
+        self.assertEqual(len(parishes), 2)
+        self.assertEqual(congregations, [{'id': self.cong.id, 'name': "Kiang'ombe", 'parish_id': self.parish.id}])
+
+
+class GenerationTests(SimpleTestCase):
+    def test_tokens_survive_a_culled_report_cache(self):
+        locmem = 'django.core.cache.backends.locmem.LocMemCache'
+        with override_settings(CACHES={
+            'default': {'BACKEND': locmem, 'LOCATION': 'reports', 'OPTIONS': {'MAX_ENTRIES': 10}},
+            'generations': {'BACKEND': locmem, 'LOCATION': 'generations'},
+        }):
+            token = get_generation('reports')
+            for index in range(50):
+                cache.set(f'report:{index}', index)
+            self.assertEqual(get_generation('reports'), token)
+            bump_generation('reports')
+            self.assertNotEqual(get_generation('reports'), token)